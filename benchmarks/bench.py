@@ -0,0 +1,138 @@
+from __future__ import annotations
+import gc
+import os
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+class Measurement:
+    """
+    Timing (in seconds per call) and peak traced memory (in bytes) of one benchmark case
+    """
+    def __init__(self, name: str, source: str, bars: int, times: list, peak_memory: int):
+        self.name = name
+        self.source = source
+        self.bars = bars
+        self.times = np.array(times)
+        self.peak_memory = peak_memory
+
+    @property
+    def best(self) -> float:
+        return float(self.times.min())
+
+    @property
+    def median(self) -> float:
+        return float(np.median(self.times))
+
+    @property
+    def spread(self) -> float:
+        """
+        (median - best) / best, a rough measure of the noise of the measurement
+        """
+        return (self.median - self.best) / self.best if self.best > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {'name': self.name,
+                'source': self.source,
+                'bars': self.bars,
+                'best': self.best,
+                'median': self.median,
+                'spread': self.spread,
+                'peak_memory': self.peak_memory}
+
+    def __repr__(self):
+        return f'{self.name:<32} {self.bars:>9} {format_time(self.best):>10} {format_time(self.median):>10} ' \
+               f'{self.spread:>7.1%} {format_bytes(self.peak_memory):>10}'
+
+
+def measure(name: str, source: str, bars: int, func, repeat: int = 5, min_time: float = 0.2) -> Measurement:
+    """
+    Times func like timeit: one warm-up call (numba compilation, caches), then repeat rounds with the garbage collector
+    disabled. A round runs func as often as needed to take at least min_time, the time per call of every round is kept.
+    The peak memory is traced during a separate call, so tracing does not distort the timing.
+
+    :param name:
+    :param source: name of the input, used for the report only
+    :param bars: size of the input, used for the report only
+    :param func: callable without arguments
+    :param repeat: number of rounds
+    :param min_time: minimal duration of a round in seconds
+    :return:
+    """
+    func()
+
+    number = 1
+    while True:
+        elapsed = _time_round(func, number)
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    times = [elapsed / number] + [_time_round(func, number) / number for _ in range(repeat - 1)]
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Measurement(name, source, bars, times, peak_memory)
+
+
+def _time_round(func, number: int) -> float:
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        t1 = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - t1
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def synthetic_bars(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Random walk OHLC bars with the columns used in this project (Date, Open, High, Low, Close)
+
+    :param n: number of bars
+    :param seed:
+    :return:
+    """
+    rng = np.random.default_rng(seed)
+    close = 1000 + np.cumsum(rng.normal(0, 1, n))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    return pd.DataFrame({'Date': pd.date_range('2000-01-01', periods=n, freq='5min'),
+                         'Open': open_,
+                         'High': np.maximum(open_, close) + rng.random(n),
+                         'Low': np.minimum(open_, close) - rng.random(n),
+                         'Close': close})
+
+
+def csv_bars(file_name: str = 'btc-usd_1d.csv') -> pd.DataFrame:
+    """
+    OHLC bars of a csv file in the data folder
+
+    :param file_name:
+    :return:
+    """
+    return pd.read_csv(os.path.join(DATA_DIR, file_name))
+
+
+def format_time(seconds: float) -> str:
+    for unit, factor in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= factor:
+            return f'{seconds / factor:.2f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
+
+
+def format_bytes(n_bytes: int) -> str:
+    for unit, factor in [('GB', 1 << 30), ('MB', 1 << 20), ('kB', 1 << 10)]:
+        if n_bytes >= factor:
+            return f'{n_bytes / factor:.1f} {unit}'
+    return f'{n_bytes} B'
@@ -0,0 +1,222 @@
+"""
+Benchmarks of every stage of the analysis pipeline, on data/btc-usd_1d.csv and on synthetic series of growing size.
+Runs offline, e.g.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 1000 10000 --cases hi lo worker --json benchmark.json
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import numpy as np
+import pandas as pd
+from benchmarks.bench import measure, synthetic_bars, csv_bars
+from models.functions import hi, lo, next_hi, next_lo
+from models.MonoWave import MonoWaveUp, MonoWaveDown
+from models.MonoWaveTable import MonoWaveTable
+from models.WaveAnalyzer import WaveAnalyzer
+from models.WaveBatch import WaveBatch
+from models.WaveOptions import WaveOptionsGenerator5, WaveOptionsGeneratorWithRange
+from models.WavePattern import WavePattern
+from models.WaveRules import Impulse, LeadingDiagonal
+from models.WaveScore import WaveScore
+import screener
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+N_CALLS = 1_000  # calls per round of the cases of single functions, e.g. hi()
+N_CANDIDATES = 1_000  # impulse candidates for the rule and score cases
+
+
+class Case:
+    """
+    A benchmark case: setup(df) prepares the input and returns the callable to time. Series with more than max_bars
+    bars are skipped (e.g. tables with one entry per bar and skip), unless the caps are disabled.
+    """
+    def __init__(self, name: str, setup, max_bars: int = None):
+        self.name = name
+        self.setup = setup
+        self.max_bars = max_bars
+
+
+def call_indices(df: pd.DataFrame) -> np.array:
+    return np.linspace(0, len(df) - 2, N_CALLS).astype(np.int64)
+
+
+def arrays(df: pd.DataFrame):
+    return df['Low'].to_numpy(dtype=float), df['High'].to_numpy(dtype=float), df['Date'].to_numpy()
+
+
+def setup_function(function):
+    def setup(df: pd.DataFrame):
+        lows, highs, _ = arrays(df)
+        indices = call_indices(df)
+
+        if function in (hi, lo):
+            return lambda: [function(lows, highs, idx) for idx in indices]
+        prices = highs if function is next_hi else lows
+        return lambda: [function(lows, highs, idx, prices[idx]) for idx in indices]
+    return setup
+
+
+def setup_monowaves(table: bool):
+    def setup(df: pd.DataFrame):
+        lows, highs, dates = arrays(df)
+        indices = call_indices(df)
+        monowave_table = MonoWaveTable(lows, highs, up_to=10) if table else None
+
+        def build():
+            for idx in indices:
+                MonoWaveUp(lows, highs, dates, idx, 3, monowave_table)
+                MonoWaveDown(lows, highs, dates, idx, 3, monowave_table)
+        return build
+    return setup
+
+
+def setup_table(df: pd.DataFrame):
+    lows, highs, _ = arrays(df)
+    return lambda: MonoWaveTable(lows, highs, up_to=10)
+
+
+def setup_wave_options(df: pd.DataFrame):
+    return lambda: WaveOptionsGeneratorWithRange(up_to=screener.WAVE_UP_TO, with_range=screener.WITH_RANGE).to_array()
+
+
+def candidates(df: pd.DataFrame) -> list:
+    """
+    The first N_CANDIDATES impulses without checking any rule
+    """
+    wa = WaveAnalyzer(screener.find_minimums(df.copy()))
+    return [waves for _, waves in wa.find_impulsive_waves(WaveOptionsGenerator5(5), compiled=True)[:N_CANDIDATES]]
+
+
+def setup_check_rule(df: pd.DataFrame):
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+    patterns = [WavePattern(waves) for waves in candidates(df)]
+    return lambda: [pattern.check_rule(rule) for pattern in patterns for rule in rules]
+
+
+def setup_check_rule_batch(df: pd.DataFrame):
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+    all_waves = candidates(df)
+    return lambda: WaveBatch.from_waves(all_waves).check_rules(rules)
+
+
+def setup_wave_score(df: pd.DataFrame):
+    scores = [WaveScore(waves) for waves in candidates(df)]
+    return lambda: [score.value() for score in scores]
+
+
+def setup_find_minimums(df: pd.DataFrame):
+    return lambda: screener.find_minimums(df.copy())
+
+
+def setup_find_impulsive_waves(df: pd.DataFrame):
+    data = screener.find_minimums(df.copy())
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+    generator = WaveOptionsGeneratorWithRange(up_to=screener.WAVE_UP_TO, with_range=screener.WITH_RANGE)
+    return lambda: WaveAnalyzer(data).find_impulsive_waves(generator, rules, compiled=True)
+
+
+def setup_recent_impulsive_waves(df: pd.DataFrame):
+    data = screener.find_minimums(df.copy())
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+    generator = WaveOptionsGeneratorWithRange(up_to=screener.WAVE_UP_TO, with_range=screener.WITH_RANGE)
+    end_window = screener.age_window(len(data))
+    return lambda: WaveAnalyzer(data).search_impulsive_waves(generator, rules, unique=True, end_window=end_window)
+
+
+def setup_best_impulsive_waves(df: pd.DataFrame):
+    data = screener.find_minimums(df.copy())
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+    generator = WaveOptionsGeneratorWithRange(up_to=screener.WAVE_UP_TO, with_range=screener.WITH_RANGE)
+    return lambda: WaveAnalyzer(data).best_impulsive_waves(generator, screener.LIMIT, rules)
+
+
+def setup_worker(df: pd.DataFrame):
+    def work():
+        # the lines printed for every hit would be timed (and flood the report)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return screener.worker({'ticker': 'benchmark', 'data': df.copy(), 'plot': False})
+    return work
+
+
+CASES = [Case('hi', setup_function(hi)),
+         Case('lo', setup_function(lo)),
+         Case('next_hi', setup_function(next_hi)),
+         Case('next_lo', setup_function(next_lo)),
+         Case('MonoWave', setup_monowaves(table=False)),
+         Case('MonoWave (table)', setup_monowaves(table=True), max_bars=100_000),
+         Case('MonoWaveTable', setup_table, max_bars=100_000),
+         Case('WaveOptions', setup_wave_options),
+         Case('check_rule', setup_check_rule, max_bars=100_000),
+         Case('WaveBatch.check_rules', setup_check_rule_batch, max_bars=100_000),
+         Case('WaveScore.value', setup_wave_score, max_bars=100_000),
+         Case('find_minimums', setup_find_minimums),
+         Case('find_impulsive_waves', setup_find_impulsive_waves, max_bars=100_000),
+         Case('recent_impulsive_waves', setup_recent_impulsive_waves, max_bars=100_000),
+         Case('best_impulsive_waves', setup_best_impulsive_waves, max_bars=100_000),
+         Case('worker', setup_worker, max_bars=100_000)]
+
+
+def inputs(sizes: list):
+    yield 'btc-usd_1d.csv', csv_bars()
+    for size in sizes:
+        yield f'synthetic {size:.0e}', synthetic_bars(size)
+
+
+def run(sizes: list = None, case_names: list = None, repeat: int = 5, min_time: float = 0.2,
+        uncapped: bool = False) -> list:
+    """
+    Runs the benchmark cases on all inputs and prints one line per measurement
+
+    :param sizes: number of bars of the synthetic series
+    :param case_names: names of the cases to run, all if None
+    :param repeat: see bench.measure()
+    :param min_time: see bench.measure()
+    :param uncapped: also run cases on series with more than Case.max_bars bars
+    :return: list of Measurements
+    """
+    cases = [case for case in CASES if case_names is None or case.name in case_names]
+    measurements = list()
+
+    print(f'{"case":<32} {"bars":>9} {"best":>10} {"median":>10} {"spread":>7} {"peak mem":>10}')
+    for source, df in inputs(SIZES if sizes is None else sizes):
+        print(f'--- {source}')
+        for case in cases:
+            if case.max_bars is not None and len(df) > case.max_bars and not uncapped:
+                continue
+            if case.name == 'WaveOptions' and source != 'btc-usd_1d.csv':
+                # does not depend on the bars
+                continue
+            try:
+                measurement = measure(case.name, source, len(df), case.setup(df), repeat, min_time)
+            except Exception as e:
+                print(f'{case.name:<32} {len(df):>9} failed: {e!r}')
+                continue
+            print(measurement)
+            measurements.append(measurement)
+
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the analysis pipeline')
+    parser.add_argument('--sizes', type=int, nargs='*', default=SIZES, help='bars of the synthetic series')
+    parser.add_argument('--cases', nargs='*', default=None, help=f'cases to run: {[case.name for case in CASES]}')
+    parser.add_argument('--repeat', type=int, default=5, help='timing rounds per case')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimal duration of a round in seconds')
+    parser.add_argument('--uncapped', action='store_true', help='ignore the maximal number of bars of the cases')
+    parser.add_argument('--json', default=None, help='write the measurements to this file')
+    args = parser.parse_args()
+
+    measurements = run(args.sizes, args.cases, args.repeat, args.min_time, args.uncapped)
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump([measurement.to_dict() for measurement in measurements], f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,7 +8,7 @@ import pandas as pd
 import numpy as np
 
 df = pd.read_csv(r'data\btc-usd_1d.csv')
-idx_start = np.argmin(np.array(list(df['Low'])))
+idx_start = np.argmin(df['Low'].to_numpy())
 
 wa = WaveAnalyzer(df=df, verbose=False)
 wave_options_impulse = WaveOptionsGenerator5(up_to=15)  # generates WaveOptions up to [15, 15, 15, 15, 15]
@@ -29,12 +29,10 @@ print(f"will run up to {wave_options_impulse.number / 1e6}M combinations.")
 
 wavepatterns_up = set()
 
-# loop over all combinations of wave options [i,j,k,l,m] for impulsive waves sorted from small, e.g.  [0,1,...] to
-# large e.g. [3,2, ...]
-for new_option_impulse in wave_options_impulse.options_sorted:
-
-    waves_up = wa.find_5_impulsive_waves(idx_start=idx_start, wave_config=new_option_impulse.values)
-
+# all combinations of wave options [i,j,k,l,m] for impulsive waves sorted from small, e.g.  [0,1,...] to
+# large e.g. [3,2, ...], searched from idx_start only
+for new_option_impulse, waves_up in wa.find_impulsive_waves(wave_options_impulse, compiled=True,
+                                                            idx_starts=[idx_start]):
     if waves_up:
         wavepattern_up = WavePattern(waves_up, verbose=True)
 
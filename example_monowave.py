@@ -1,12 +1,12 @@
 from models.MonoWave import MonoWaveDown, MonoWaveUp
 from models.helpers import plot_monowave
-import numpy as np
 import pandas as pd
 
 df = pd.read_csv(r'data\btc-usd_1d.csv')
-lows = np.array(list(df['Low']))
-highs = np.array(list(df['High']))
-dates = np.array(list(df['Date']))
+# views on the columns, no copies
+lows = df['Low'].to_numpy()
+highs = df['High'].to_numpy()
+dates = df['Date'].to_numpy()
 
 # find a monowave down starting from the low at the 3rd index
 mw_up = MonoWaveUp(lows=lows, highs=highs, dates=dates, idx_start=3, skip=5)
@@ -1,9 +1,8 @@
-import yfinance as yf
+from models.BarStore import BarStore
+from models.BarSources import YahooSource
 
-from models.helpers import convert_yf_data
+# the store in data/bars keeps the history, later runs only download the bars since the last stored one
+store = BarStore('data/bars', YahooSource())
+df = store.get('BTC-USD', '1d')
 
-df = yf.download(tickers='BTC-USD',
-                 interval="1d",
-                 start="2017-12-01")
-
-convert_yf_data(df).to_csv(r'data\btc-usd_1d_2017.csv', sep=",", index=False)
+df[df['Date'] >= '2017-12-01'].to_csv(r'data\btc-usd_1d_2017.csv', sep=",", index=False)
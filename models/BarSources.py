@@ -0,0 +1,108 @@
+from __future__ import annotations
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close']
+
+
+class BarSource:
+    """
+    Base class of the sources of OHLC bars of a BarStore. fetch() has to be implemented for every inherited source.
+    """
+    def fetch(self, symbol: str, timeframe: str, since: datetime = None, until: datetime = None,
+              count: int = None) -> pd.DataFrame:
+        """
+        Bars with since <= Date < until (open ended if None), only the last count bars if count is set
+
+        :param symbol:
+        :param timeframe: e.g. 'M5' or '1d', as used by the source
+        :param since:
+        :param until:
+        :param count:
+        :return: DataFrame with the columns Date, Open, High, Low, Close, ordered by Date
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def select(bars: pd.DataFrame, since: datetime = None, until: datetime = None, count: int = None) -> pd.DataFrame:
+        """
+        Bars of a DataFrame in the range of fetch()
+
+        :param bars: ordered by Date
+        :param since:
+        :param until:
+        :param count:
+        :return:
+        """
+        dates = bars['Date'].to_numpy()
+        idx_from = 0 if since is None else np.searchsorted(dates, np.datetime64(since), side='left')
+        idx_to = len(dates) if until is None else np.searchsorted(dates, np.datetime64(until), side='left')
+        if count is not None:
+            idx_from = max(idx_from, idx_to - count)
+        return bars.iloc[idx_from:idx_to][COLUMNS].reset_index(drop=True)
+
+
+class CsvSource(BarSource):
+    """
+    Bars from csv files {directory}/{symbol}_{timeframe}.csv with the columns Date, Open, High, Low, Close, e.g. to use
+    the store without MetaTrader or network. Counts the fetched bars.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.fetched = 0
+
+    def fetch(self, symbol: str, timeframe: str, since: datetime = None, until: datetime = None,
+              count: int = None) -> pd.DataFrame:
+        bars = pd.read_csv(os.path.join(self.directory, f'{symbol}_{timeframe}.csv'), parse_dates=['Date'])
+        bars = self.select(bars, since, until, count)
+        self.fetched += len(bars)
+        return bars
+
+
+class RoboForexSource(BarSource):
+    """
+    Bars of a MetaTrader 5 terminal, the timeframe is the name of a MetaTrader timeframe, e.g. 'M5' for
+    mt5.TIMEFRAME_M5
+    """
+    def __init__(self, roboforex_data):
+        self.roboforex_data = roboforex_data
+
+    def fetch(self, symbol: str, timeframe: str, since: datetime = None, until: datetime = None,
+              count: int = None) -> pd.DataFrame:
+        import MetaTrader5 as mt5
+
+        mt5_timeframe = getattr(mt5, f'TIMEFRAME_{timeframe}')
+        date_to = datetime.now() if until is None else until
+        if since is None:
+            rates = self.roboforex_data.get_bars(symbol=symbol, timeframe=mt5_timeframe, date_from=date_to,
+                                                 count=count)
+        else:
+            rates = self.roboforex_data.get_bars_range(symbol=symbol, timeframe=mt5_timeframe, date_from=since,
+                                                       date_to=date_to)
+        if rates is None or len(rates) == 0:
+            return pd.DataFrame({column: [] for column in COLUMNS}).astype({'Date': 'datetime64[ns]'})
+
+        bars = pd.DataFrame({'Date': [datetime.fromtimestamp(x) for x in rates['time']],
+                             'Open': rates['open'],
+                             'High': rates['high'],
+                             'Low': rates['low'],
+                             'Close': rates['close']})
+        return self.select(bars, since, until, count)
+
+
+class YahooSource(BarSource):
+    """
+    Bars of yahoo finance, the timeframe is a yfinance interval, e.g. '1d'
+    """
+    def fetch(self, symbol: str, timeframe: str, since: datetime = None, until: datetime = None,
+              count: int = None) -> pd.DataFrame:
+        import yfinance as yf
+        from models.helpers import convert_yf_data
+
+        if since is None:
+            df = yf.download(tickers=symbol, interval=timeframe, period='max', end=until)
+        else:
+            df = yf.download(tickers=symbol, interval=timeframe, start=since, end=until)
+        return self.select(convert_yf_data(df), since, until, count)
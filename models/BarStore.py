@@ -0,0 +1,118 @@
+from __future__ import annotations
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from models.BarSources import BarSource, COLUMNS
+
+
+class BarStore:
+    """
+    Local store of OHLC bars keyed by (symbol, timeframe). Every column is a .npy file in
+    {directory}/{symbol}/{timeframe}/, so the bars are memory-mapped straight from disk instead of parsed.
+
+    get() only fetches the bars missing in the store from the source: the tail since the last stored bar (which is
+    fetched again, as it may not have been complete) and older bars if the store does not reach back far enough.
+    """
+    def __init__(self, directory: str, source: BarSource = None):
+        self.directory = directory
+        self.source = source
+
+    def path(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.directory, symbol, timeframe)
+
+    def load(self, symbol: str, timeframe: str, mmap: bool = True) -> dict:
+        """
+        Stored bars as arrays
+
+        :param symbol:
+        :param timeframe:
+        :param mmap: memory-map the files (read only) instead of reading them
+        :return: dict of column name to array, None if nothing is stored
+        """
+        path = self.path(symbol, timeframe)
+        if not os.path.exists(os.path.join(path, 'Date.npy')):
+            return None
+        return {column: np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r' if mmap else None)
+                for column in COLUMNS}
+
+    def save(self, symbol: str, timeframe: str, bars: pd.DataFrame):
+        """
+        Replaces the stored bars. The files are written next to the old ones and moved into place, so readers never
+        see half written files.
+
+        :param symbol:
+        :param timeframe:
+        :param bars: DataFrame with the columns Date, Open, High, Low, Close, ordered by Date
+        :return:
+        """
+        path = self.path(symbol, timeframe)
+        os.makedirs(path, exist_ok=True)
+        for column in COLUMNS:
+            values = bars[column].to_numpy(dtype='datetime64[ns]' if column == 'Date' else float)
+            with open(os.path.join(path, f'{column}.tmp.npy'), 'wb') as f:
+                np.save(f, values)
+        for column in COLUMNS:
+            os.replace(os.path.join(path, f'{column}.tmp.npy'), os.path.join(path, f'{column}.npy'))
+
+    def update(self, symbol: str, timeframe: str, count: int = None, until: datetime = None) -> int:
+        """
+        Fetches the bars missing for get(symbol, timeframe, count, until) from the source
+
+        :param symbol:
+        :param timeframe:
+        :param count: number of bars needed before until, all available bars if None
+        :param until: end (exclusive) of the bars needed, now if None
+        :return: number of fetched bars
+        """
+        stored = self.load(symbol, timeframe, mmap=False)
+        if stored is None:
+            bars = self.source.fetch(symbol, timeframe, until=until, count=count)
+            self.save(symbol, timeframe, bars)
+            return len(bars)
+
+        dates = stored['Date']
+        parts = [pd.DataFrame(stored)]
+        n_fetched = 0
+
+        if until is None or dates[-1] < np.datetime64(until):
+            tail = self.source.fetch(symbol, timeframe, since=pd.Timestamp(dates[-1]).to_pydatetime(), until=until)
+            unchanged = len(tail) > 0 and tail['Date'].iloc[0] == dates[-1] and \
+                all(tail[column].iloc[0] == stored[column][-1] for column in COLUMNS[1:])
+            if len(tail) > unchanged:
+                # the last stored bar is replaced, it may have been incomplete
+                parts = [parts[0][parts[0]['Date'] < tail['Date'].iloc[0]], tail]
+                n_fetched += len(tail) - unchanged
+
+        dates = np.concatenate([part['Date'].to_numpy(dtype='datetime64[ns]') for part in parts])
+        n_before = len(dates) if until is None else int(np.searchsorted(dates, np.datetime64(until), side='left'))
+        if count is not None and n_before < count:
+            head = self.source.fetch(symbol, timeframe, until=pd.Timestamp(dates[0]).to_pydatetime(),
+                                     count=count - n_before)
+            if len(head):
+                parts.insert(0, head)
+                n_fetched += len(head)
+
+        if n_fetched:
+            self.save(symbol, timeframe, pd.concat(parts, ignore_index=True))
+        return n_fetched
+
+    def get(self, symbol: str, timeframe: str, count: int = None, until: datetime = None,
+            update: bool = True) -> pd.DataFrame:
+        """
+        The last count bars before until, fetching missing bars from the source first
+
+        :param symbol:
+        :param timeframe:
+        :param count: all bars if None
+        :param until: end (exclusive) of the bars, now if None
+        :param update: fetch missing bars (needs a source)
+        :return: DataFrame with the columns Date, Open, High, Low, Close, None if nothing is stored
+        """
+        if update and self.source is not None:
+            self.update(symbol, timeframe, count, until)
+
+        stored = self.load(symbol, timeframe)
+        if stored is None:
+            return None
+        return BarSource.select(pd.DataFrame(stored), until=until, count=count)
@@ -0,0 +1,208 @@
+from __future__ import annotations
+import time
+from multiprocessing import get_context
+from multiprocessing.connection import wait
+import pandas as pd
+from models.ResultBuffer import ResultBuffer
+
+
+class TickerResult:
+    """
+    Outcome of the analysis of one ticker: status is 'done', 'failed' (exception or crash of the worker, see error) or
+    'timeout'
+    """
+    def __init__(self, ticker: str, status: str, result=None, error: str = None, elapsed: float = 0.0):
+        self.ticker = ticker
+        self.status = status
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        error = '' if self.error is None else f': {self.error}'
+        return f'{self.ticker} {self.status} after {self.elapsed:.2f}s{error}'
+
+
+class _Worker:
+    """
+    A worker process with its own pipe, so it can be terminated (e.g. on a timeout) without affecting the others
+    """
+    def __init__(self, context, analyze):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_work, args=(analyze, child_connection), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.ticker = None
+        self.started = None
+
+    def send(self, ticker: str, data: pd.DataFrame):
+        # plain arrays pickle faster than a DataFrame
+        self.connection.send((ticker, {name: data[name].to_numpy() for name in data.columns}))
+        self.ticker = ticker
+        self.started = time.perf_counter()
+
+    def stop(self):
+        if self.process.is_alive() and self.ticker is None:
+            try:
+                self.connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+
+class BatchScreener:
+    """
+    Runs an analysis function for many tickers in worker processes.
+
+    The tickers are scheduled dynamically: a worker gets the next ticker as soon as it has finished its last one, so a
+    few long running tickers do not hold up the rest. A worker running longer than timeout on a ticker is terminated
+    and replaced. The results are streamed back in the order they are finished, e.g. to plot them in the parent process
+    while the workers go on.
+
+    analyze(ticker, data) has to be a module level function (it is pickled to the workers), data is the DataFrame of the
+    ticker.
+    """
+    def __init__(self, analyze, processes: int = 2, timeout: float = None, verbose: bool = True):
+        self.analyze = analyze
+        self.processes = processes
+        self.timeout = timeout
+        self.verbose = verbose
+
+        self.counts = {'done': 0, 'failed': 0, 'timeout': 0}
+        self.elapsed = 0.0
+
+    @property
+    def tickers_per_second(self) -> float:
+        n = sum(self.counts.values())
+        return n / self.elapsed if self.elapsed > 0 else 0.0
+
+    def run(self, tasks):
+        """
+        Analyzes the tickers and yields a TickerResult as soon as a ticker is finished. The tasks are consumed lazily,
+        so they can be fetched while the first tickers are analyzed.
+
+        With processes <= 1 the tickers are analyzed in this process (e.g. for debugging), without timeouts.
+
+        :param tasks: iterable of (ticker, data)
+        :return: generator of TickerResults
+        """
+        self.counts = {'done': 0, 'failed': 0, 'timeout': 0}
+        started = time.perf_counter()
+        try:
+            if self.processes <= 1:
+                yield from self.__run_here(tasks)
+            else:
+                yield from self.__run_pool(iter(tasks))
+        finally:
+            self.elapsed = time.perf_counter() - started
+            if self.verbose:
+                print(self.report())
+
+    def screen(self, tasks, on_result=None) -> ResultBuffer:
+        """
+        Runs all tasks and merges the ResultBuffers returned by analyze()
+
+        :param tasks: iterable of (ticker, data)
+        :param on_result: optional callable getting every TickerResult, e.g. to plot it
+        :return:
+        """
+        report = ResultBuffer()
+        for ticker_result in self.run(tasks):
+            if ticker_result.status == 'done' and ticker_result.result is not None:
+                report.extend(ticker_result.result)
+            if on_result is not None:
+                on_result(ticker_result)
+
+        return report
+
+    def report(self) -> str:
+        n = sum(self.counts.values())
+        return f'{n} tickers in {self.elapsed:.2f}s ({self.tickers_per_second:.2f} tickers/s): ' + \
+            ', '.join(f'{count} {status}' for status, count in self.counts.items())
+
+    def __run_here(self, tasks):
+        for ticker, data in tasks:
+            started = time.perf_counter()
+            try:
+                ticker_result = TickerResult(ticker, 'done', self.analyze(ticker, data))
+            except Exception as e:
+                ticker_result = TickerResult(ticker, 'failed', error=repr(e))
+            ticker_result.elapsed = time.perf_counter() - started
+            yield self.__count(ticker_result)
+
+    def __run_pool(self, tasks):
+        context = get_context()
+        workers = [_Worker(context, self.analyze) for _ in range(self.processes)]
+        try:
+            for worker in workers:
+                self.__assign(worker, tasks)
+
+            while True:
+                busy = [worker for worker in workers if worker.ticker is not None]
+                if not busy:
+                    break
+
+                ready = wait([worker.connection for worker in busy] + [worker.process.sentinel for worker in busy],
+                             timeout=self.__next_timeout(busy))
+                now = time.perf_counter()
+
+                for worker in busy:
+                    elapsed = now - worker.started
+                    if worker.connection in ready or worker.process.sentinel in ready:
+                        try:
+                            status, result, error = worker.connection.recv()
+                        except (EOFError, OSError):
+                            status, result, error = 'failed', None, f'worker exited with {worker.process.exitcode}'
+                    elif self.timeout is not None and elapsed > self.timeout:
+                        status, result, error = 'timeout', None, None
+                    else:
+                        continue
+
+                    ticker_result = TickerResult(worker.ticker, status, result, error, elapsed)
+                    worker.ticker = None
+                    if status == 'timeout' or not worker.process.is_alive():
+                        worker.kill()
+                        workers[workers.index(worker)] = worker = _Worker(context, self.analyze)
+
+                    yield self.__count(ticker_result)
+                    self.__assign(worker, tasks)
+        finally:
+            for worker in workers:
+                worker.stop()
+
+    def __assign(self, worker: _Worker, tasks):
+        task = next(tasks, None)
+        if task is not None:
+            worker.send(*task)
+
+    def __next_timeout(self, busy: list):
+        if self.timeout is None:
+            return None
+        return max(0.0, min(worker.started for worker in busy) + self.timeout - time.perf_counter())
+
+    def __count(self, ticker_result: TickerResult) -> TickerResult:
+        self.counts[ticker_result.status] += 1
+        if self.verbose and ticker_result.status != 'done':
+            print(ticker_result)
+        return ticker_result
+
+
+def _work(analyze, connection):
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+
+        ticker, columns = task
+        try:
+            connection.send(('done', analyze(ticker, pd.DataFrame(columns)), None))
+        except Exception as e:
+            connection.send(('failed', None, repr(e)))
+    connection.close()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import numpy as np
+from models.MonoWave import MonoWave, MonoWaveUp, MonoWaveDown
+from models.WaveAnalyzer import WaveAnalyzer
+from models.WaveOptions import WaveOptionsGenerator5
+from models.WavePattern import WavePattern
+from models.WaveRules import Impulse, Correction
+from models.kernels import START, OPTION, WAVE5_END
+
+IMPULSE_LABELS = [(MonoWaveUp, '1'), (MonoWaveDown, '2'), (MonoWaveUp, '3'), (MonoWaveDown, '4'), (MonoWaveUp, '5')]
+CORRECTION_LABELS = [(MonoWaveDown, 'A'), (MonoWaveUp, 'B'), (MonoWaveDown, 'C')]
+WAVE_KEYS = ['wave1', 'wave2', 'wave3', 'wave4', 'wave5']
+
+
+class DegreeEngine:
+    """
+    Builds waves of higher degrees bottom-up. Every confirmed impulse (12345) of a degree becomes a MonoWaveUp of the
+    next degree and every correction (ABC) a MonoWaveDown (MonoWave.from_wavepattern()). These waves are indexed by
+    their start bar and chained into the impulses (up, down, up, down, up) and corrections (down, up, down) of the next
+    degree, checking the rules wave by wave. The bars are not scanned again, so a degree costs about as much as the
+    number of patterns of the degree below.
+
+    Patterns spanning the same bars give the same wave of the next degree, which is built once (see components()).
+    """
+    def __init__(self, impulse_rules: list = None, correction_rules: list = None):
+        """
+
+        :param impulse_rules: WaveRules of the impulses, [Impulse] if None
+        :param correction_rules: WaveRules of the corrections, [Correction] if None
+        """
+        self.impulse_rules = [Impulse('impulse')] if impulse_rules is None else impulse_rules
+        self.correction_rules = [Correction('correction')] if correction_rules is None else correction_rules
+
+        self.__patterns = dict()  # degree: list of WavePatterns
+        self.__spans = dict()  # degree of the waves: {MonoWaveUp: {idx_start: [idx_end, ...]}, MonoWaveDown: ...}
+        self.__components = dict()  # (degree, wave_cls, idx_start, idx_end): WavePatterns of the degree below
+        self.__waves = dict()  # (degree, wave_cls, idx_start, idx_end, label): MonoWave
+
+    @classmethod
+    def from_analyzer(cls,
+                      wave_analyzer: WaveAnalyzer,
+                      wave_options_up=None,
+                      wave_options_down=None,
+                      impulse_rules: list = None,
+                      correction_rules: list = None) -> DegreeEngine:
+        """
+        DegreeEngine with the impulses and corrections of the lowest degree found by a WaveAnalyzer: the impulses of
+        the start indices, the corrections at their ends, the impulses at the ends of these corrections (added as start
+        indices, see WaveAnalyzer.add_starts()) and so on, until no new start is found
+
+        :param wave_analyzer:
+        :param wave_options_up: WaveOptions of the impulses, WaveOptionsGenerator5(10) if None. Impulses without wave5
+            are not used.
+        :param wave_options_down: WaveOptions of the corrections, see WaveAnalyzer.corrective_waves()
+        :param impulse_rules: see __init__(), Impulse and LeadingDiagonal rules only (compiled search)
+        :param correction_rules: see __init__()
+        :return:
+        """
+        engine = cls(impulse_rules, correction_rules)
+        options = WaveAnalyzer.option_array(WaveOptionsGenerator5(10) if wave_options_up is None else wave_options_up)
+        searched = np.zeros(0, dtype=np.int64)
+        corrections = set()
+
+        while True:
+            hits = wave_analyzer.search_impulsive_waves(options, engine.impulse_rules, compiled=True, unique=True)
+            hits = hits[~np.isin(hits[:, START], searched) & (hits[:, WAVE5_END] >= 0)]
+            searched = wave_analyzer.start_indices().copy()
+
+            engine.add([WavePattern(wave_analyzer.impulsive_waves(idx_start, options[option_idx].tolist()))
+                        for idx_start, option_idx in hits[:, [START, OPTION]].tolist()])
+
+            new_corrections = list()
+            for _, waves in wave_analyzer.find_corrective_waves(hits[:, WAVE5_END], wave_options_down,
+                                                                engine.correction_rules):
+                pattern = WavePattern(waves)
+                if pattern not in corrections:
+                    corrections.add(pattern)
+                    new_corrections.append(pattern)
+            engine.add(new_corrections)
+
+            new_starts = np.setdiff1d(np.array([pattern.idx_end for pattern in new_corrections], dtype=np.int64),
+                                      searched)
+            if len(new_starts) == 0:
+                return engine
+            wave_analyzer.add_starts(new_starts)
+
+    def add(self, wave_patterns: list):
+        """
+        Adds confirmed impulses (5 waves) and corrections (3 waves), e.g. of the lowest degree. Their degree is the one
+        of their waves.
+
+        :param wave_patterns:
+        :return:
+        """
+        for wave_pattern in wave_patterns:
+            waves = list(wave_pattern.waves.values())
+            if len(waves) == 5 and waves[4] is not None:
+                wave_cls = MonoWaveUp
+            elif len(waves) == 3:
+                wave_cls = MonoWaveDown
+            else:
+                raise ValueError('Only impulses of 5 waves and corrections of 3 waves can be added.')
+
+            self.__patterns.setdefault(wave_pattern.degree, list()).append(wave_pattern)
+            key = (wave_pattern.degree + 1, wave_cls, wave_pattern.idx_start, wave_pattern.idx_end)
+            components = self.__components.get(key)
+            if components is None:
+                self.__components[key] = components = list()
+                spans = self.__spans.setdefault(wave_pattern.degree + 1, {MonoWaveUp: dict(), MonoWaveDown: dict()})
+                spans[wave_cls].setdefault(wave_pattern.idx_start, list()).append(wave_pattern.idx_end)
+            components.append(wave_pattern)
+
+    def build(self, max_degree: int) -> dict:
+        """
+        Builds the impulses and corrections of all degrees up to max_degree, each degree from the one below
+
+        :param max_degree:
+        :return: {degree: list of WavePatterns}
+        """
+        for degree in range(min(self.__patterns, default=1) + 1, max_degree + 1):
+            if degree not in self.__patterns and degree in self.__spans:
+                patterns = self.__chain(degree, IMPULSE_LABELS, self.impulse_rules) + \
+                    self.__chain(degree, CORRECTION_LABELS, self.correction_rules)
+                self.__patterns[degree] = list()
+                self.add(patterns)
+
+        return {degree: patterns for degree, patterns in self.__patterns.items() if degree <= max_degree}
+
+    def patterns(self, degree: int) -> list:
+        """
+        The impulses and corrections of a degree, call build() first for the higher degrees
+
+        :param degree:
+        :return:
+        """
+        return self.__patterns.get(degree, list())
+
+    def components(self, wave: MonoWave) -> list:
+        """
+        The WavePatterns of the degree below making up a wave of a higher degree
+
+        :param wave:
+        :return:
+        """
+        return self.__components.get((wave.degree, type(wave), wave.idx_start, wave.idx_end), list())
+
+    def __wave(self, degree: int, wave_cls, idx_start: int, idx_end: int, label: str) -> MonoWave:
+        key = (degree, wave_cls, idx_start, idx_end, label)
+        wave = self.__waves.get(key)
+        if wave is None:
+            components = self.__components[(degree, wave_cls, idx_start, idx_end)]
+            wave = self.__waves[key] = MonoWave.from_wavepattern(components[0], label)
+        return wave
+
+    def __chain(self, degree: int, labels: list, rules: list) -> list:
+        """
+        All patterns of consecutive waves of the degree (e.g. up, down, up, down, up) fulfilling at least one rule
+
+        :param degree:
+        :param labels: wave class and label of every wave, IMPULSE_LABELS or CORRECTION_LABELS
+        :param rules:
+        :return:
+        """
+        spans = self.__spans[degree]
+        patterns = list()
+
+        def extend(waves: list, rules_left: list):
+            depth = len(waves)
+            if depth == len(labels):
+                patterns.append(WavePattern(waves))
+                return
+
+            wave_cls, label = labels[depth]
+            for idx_end in spans[wave_cls].get(waves[-1].idx_end, ()):
+                wave = self.__wave(degree, wave_cls, waves[-1].idx_end, idx_end, label)
+                wave_rules = WaveAnalyzer.check_stage(rules_left, dict(zip(WAVE_KEYS, waves + [wave])), depth + 1)
+                if wave_rules != []:
+                    extend(waves + [wave], wave_rules)
+
+        wave_cls, label = labels[0]
+        for idx_start, idx_ends in spans[wave_cls].items():
+            for idx_end in idx_ends:
+                wave = self.__wave(degree, wave_cls, idx_start, idx_end, label)
+                wave_rules = WaveAnalyzer.check_stage(rules, {'wave1': wave}, 1)
+                if wave_rules != []:
+                    extend([wave], wave_rules)
+
+        return patterns
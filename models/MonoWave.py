@@ -1,32 +1,43 @@
 from __future__ import annotations
 import numpy as np
-from models.functions import hi, lo, next_hi, next_lo
+from models.functions import hi, lo, next_hi, next_lo, as_array, PRICE_DTYPES
+from models.MonoWaveTable import MonoWaveTable
 
 class MonoWave:
+    """
+    Base class of a MonoWave. The attributes are __slots__ (no instance dict), as millions of instances are created
+    while analyzing a chart. lows_arr / highs_arr / dates_arr are references to the data arrays of the chart, not
+    copies.
+    """
+    __slots__ = ('lows_arr', 'highs_arr', 'dates_arr', 'skip_n', 'idx_start', 'idx_end', 'count', 'degree', 'label',
+                 'date_start', 'date_end', 'low', 'high', 'low_idx', 'high_idx')
+
     def __init__(self,
                  lows: np.array,
                  highs: np.array,
                  dates: np.array,
                  idx_start: int,
-                 skip: int = 0):
+                 skip: int = 0,
+                 table: MonoWaveTable = None):
 
         self.lows_arr = lows
         self.highs_arr = highs
         self.dates_arr = dates
         self.skip_n = skip
         self.idx_start = idx_start
-        self.idx_end = int
+        self.idx_end = None
 
-        self.count = int  # the count of the monowave, e.g. 1, 2, A, B, etc
+        self.count = None  # the count of the monowave, e.g. 1, 2, A, B, etc
         self.degree = 1  # 1 = lowest timeframe level, 2 as soon as a e.g. 12345 is found etc.
+        self.label = None
 
-        self.date_start = str
-        self.date_end = str
+        self.date_start = None
+        self.date_end = None
 
-        self.low = float
-        self.high = float
-        self.low_idx = int
-        self.high_idx = int
+        self.low = None
+        self.high = None
+        self.low_idx = None
+        self.high_idx = None
 
     @property
     def labels(self) -> str:
@@ -41,83 +52,96 @@ class MonoWave:
         return self.idx_end - self.idx_start
 
     @classmethod
-    def from_wavepattern(cls, wave_pattern):
-        lows = highs = dates = np.zeros(10)  # dummy arrays to init class
-
-        if len(wave_pattern.waves.keys()) == 5:
-            low = wave_pattern.waves.get('wave1').low
-            low_idx = wave_pattern.waves.get('wave1').low_idx
-            high = wave_pattern.waves.get('wave5').high
-            high_idx = wave_pattern.waves.get('wave5').high_idx
-            date_start = wave_pattern.waves.get('wave1').date_start
-            date_end = wave_pattern.waves.get('wave5').date_end
-
-            monowave_up = cls(lows, highs, dates, 0)
-
-            monowave_up.low, monowave_up.low_idx, monowave_up.high, monowave_up.high_idx = low, low_idx, high, high_idx
-            monowave_up.date_start, monowave_up.date_end = date_start, date_end
-
-            monowave_up.degree = wave_pattern.waves.get('wave1').degree + 1
-            return monowave_up
-
-        elif len(wave_pattern.waves.keys()) == 3:
-            low = wave_pattern.waves.get('wave3').low
-            low_idx = wave_pattern.waves.get('wave3').low_idx
-            high = wave_pattern.waves.get('wave1').high
-            high_idx = wave_pattern.waves.get('wave1').high_idx
-            date_start = wave_pattern.waves.get('wave1').date_start
-            date_end = wave_pattern.waves.get('wave3').date_end
-
-            monowave_down = cls(lows, highs, dates, 0)
-            monowave_down.low, monowave_down.low_idx, monowave_down.high, monowave_down.high_idx = low, low_idx, high, high_idx
-            monowave_down.date_start, monowave_down.date_end = date_start, date_end
-
-            monowave_down.degree = wave_pattern.waves.get('wave1').degree + 1
-
-            return monowave_down
+    def from_wavepattern(cls, wave_pattern, label: str = None):
+        """
+        The MonoWave of the next higher degree spanning a WavePattern: a MonoWaveUp from the low at the start of wave1
+        to the high at the end of wave5 of an impulse, a MonoWaveDown from the high at the start of waveA to the low at
+        the end of waveC of a correction
 
+        :param wave_pattern: WavePattern of 5 waves (wave5 must exist) or 3 waves
+        :param label: label of the new wave, e.g. '1' or 'A'
+        :return: MonoWaveUp or MonoWaveDown
+        """
+        waves = list(wave_pattern.waves.values())
+        if len(waves) == 5 and waves[4] is not None:
+            wave_cls = MonoWaveUp
+        elif len(waves) == 3:
+            wave_cls = MonoWaveDown
         else:
             raise ValueError('WavePattern other than 3 or 5 waves implemented, yet.')
 
+        first, last = waves[0], waves[-1]
+        monowave = wave_cls.__new__(wave_cls)
+        MonoWave.__init__(monowave, None, None, None, first.idx_start)
+        monowave.idx_end = last.idx_end
+        monowave.date_start, monowave.date_end = first.date_start, last.date_end
+        if wave_cls is MonoWaveUp:
+            monowave.low, monowave.low_idx = first.low, first.low_idx
+            monowave.high, monowave.high_idx = last.high, last.high_idx
+        else:
+            monowave.high, monowave.high_idx = first.high, first.high_idx
+            monowave.low, monowave.low_idx = last.low, last.low_idx
+
+        monowave.degree = first.degree + 1
+        monowave.label = label
+        return monowave
+
 
 class MonoWaveUp(MonoWave):
     """
     Describes a upwards movement, which can have [skip_n] smaller downtrends
     """
+    __slots__ = ()
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        self.high, self.high_idx = self.find_end()
-        self.low = self.lows_arr[self.idx_start]
+    def __init__(self,
+                 lows: np.array,
+                 highs: np.array,
+                 dates: np.array,
+                 idx_start: int,
+                 skip: int = 0,
+                 table: MonoWaveTable = None):
+        if not isinstance(lows, np.ndarray):
+            lows, highs, dates = as_array(lows, PRICE_DTYPES), as_array(highs, PRICE_DTYPES), as_array(dates)
+        super().__init__(lows, highs, dates, idx_start, skip, table)
+
+        self.high, self.high_idx = self.find_end(lows, highs, table)
+        self.low = lows[self.idx_start]
         self.low_idx = self.idx_start
         self.idx_end = self.high_idx
-        self.date_start = self.dates_arr[self.idx_start]
-        self.date_end = self.dates_arr[self.high_idx]
+        self.date_start = dates[self.idx_start]
+        if self.high_idx is not None:
+            self.date_end = dates[self.high_idx]
 
-    def find_end(self):
+    def find_end(self, lows: np.array = None, highs: np.array = None, table: MonoWaveTable = None):
         """
         Finds the end of this MonoWave
 
-        :param idx_start:
+        :param lows: lows_arr if None
+        :param highs: highs_arr if None
+        :param table: lookup table of the MonoWave ends of lows / highs, the arrays are scanned if None
         :return:
         """
-        high, high_idx = hi(self.lows_arr, self.highs_arr, self.idx_start)
-        low_at_start = self.lows_arr[self.idx_start]
+        lows = self.lows_arr if lows is None else lows
+        highs = self.highs_arr if highs is None else highs
+        if table is not None:
+            return table.end(MonoWaveTable.UP, self.idx_start, self.skip_n)
+
+        high, high_idx = hi(lows, highs, self.idx_start)
+        low_at_start = lows[self.idx_start]
 
         if high is None:
             return None, None
 
         for _ in range(self.skip_n):
 
-            act_high, act_high_idx = next_hi(self.lows_arr, self.highs_arr, high_idx, high)
+            act_high, act_high_idx = next_hi(lows, highs, high_idx, high)
             if act_high is None:
                 return None, None
 
             if act_high > high:
                 high = act_high
                 high_idx = act_high_idx
-                if np.min(self.lows_arr[self.idx_start:act_high_idx] < low_at_start):
+                if np.min(lows[self.idx_start:act_high_idx] < low_at_start):
                     return None, None
 
         return high, high_idx
@@ -132,16 +156,26 @@ class MonoWaveUp(MonoWave):
 
 
 class MonoWaveDown(MonoWave):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    __slots__ = ()
 
-        self.low, self.low_idx = self.find_end()
-        self.high = self.highs_arr[self.idx_start]
+    def __init__(self,
+                 lows: np.array,
+                 highs: np.array,
+                 dates: np.array,
+                 idx_start: int,
+                 skip: int = 0,
+                 table: MonoWaveTable = None):
+        if not isinstance(lows, np.ndarray):
+            lows, highs, dates = as_array(lows, PRICE_DTYPES), as_array(highs, PRICE_DTYPES), as_array(dates)
+        super().__init__(lows, highs, dates, idx_start, skip, table)
+
+        self.low, self.low_idx = self.find_end(lows, highs, table)
+        self.high = highs[self.idx_start]
         self.high_idx = self.idx_start
 
-        self.date_start = self.dates_arr[self.idx_start]
+        self.date_start = dates[self.idx_start]
         if self.low is not None:
-            self.date_end = self.dates_arr[self.low_idx]
+            self.date_end = dates[self.low_idx]
             self.idx_end = self.low_idx
         else:
             self.date_end = None
@@ -155,33 +189,40 @@ class MonoWaveDown(MonoWave):
     def points(self):
         return self.high, self.low
 
-    def find_end(self):
+    def find_end(self, lows: np.array = None, highs: np.array = None, table: MonoWaveTable = None):
         """
         Finds the end of this MonoWave (downwards)
 
+        :param lows: lows_arr if None
+        :param highs: highs_arr if None
+        :param table: lookup table of the MonoWave ends of lows / highs, the arrays are scanned if None
         :return:
         """
+        lows = self.lows_arr if lows is None else lows
+        highs = self.highs_arr if highs is None else highs
+        if table is not None:
+            return table.end(MonoWaveTable.DOWN, self.idx_start, self.skip_n)
 
-        low, low_idx = lo(self.lows_arr, self.highs_arr, self.idx_start)
-        high_at_start = self.highs_arr[self.idx_start]
+        low, low_idx = lo(lows, highs, self.idx_start)
+        high_at_start = highs[self.idx_start]
         if low is None:
             return None, None
 
         for _ in range(self.skip_n):
-            act_low, act_low_idx = next_lo(self.lows_arr, self.highs_arr, low_idx, low)
+            act_low, act_low_idx = next_lo(lows, highs, low_idx, low)
             if act_low is None:
                 return None, None
 
             if act_low < low:
                 low = act_low
                 low_idx = act_low_idx
-                if np.max(self.highs_arr[self.idx_start:act_low_idx]) > high_at_start:
+                if np.max(highs[self.idx_start:act_low_idx]) > high_at_start:
                     return None, None
 
             # TODO what to do if no more minima can be found?
             # if act_low > low:
             #    return None, None
-        #if low > np.min(self.lows_arr[low_idx:]):
+        #if low > np.min(lows[low_idx:]):
         #    return None, None
         #else:
         return low, low_idx
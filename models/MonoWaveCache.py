@@ -0,0 +1,49 @@
+from __future__ import annotations
+from collections import OrderedDict
+from models.MonoWave import MonoWave
+
+
+class MonoWaveCache:
+    """
+    Bounded cache of MonoWaves, evicting the least recently used one once maxsize is reached.
+
+    The cached MonoWaves are shared between all WavePatterns using them and must not be changed.
+    """
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__waves = OrderedDict()
+
+    def __len__(self):
+        return len(self.__waves)
+
+    def __contains__(self, key):
+        return key in self.__waves
+
+    def get(self, key) -> MonoWave:
+        """
+        Returns the cached MonoWave for key or None
+
+        :param key:
+        :return:
+        """
+        wave = self.__waves.get(key)
+        if wave is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.__waves.move_to_end(key)
+        return wave
+
+    def put(self, key, wave: MonoWave):
+        self.__waves[key] = wave
+        self.__waves.move_to_end(key)
+        if len(self.__waves) > self.maxsize:
+            self.__waves.popitem(last=False)
+
+    def clear(self):
+        self.__waves.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,139 @@
+from __future__ import annotations
+import numpy as np
+from models.functions import extend_monowave_ends, NO_END
+from models.RangeIndex import RangeIndex
+from models.WaveOptions import MAX_UP_TO
+
+
+class MonoWaveTable:
+    """
+    Lookup table mapping every (direction, idx_start, skip) of a series to the end index and the extreme price of the
+    MonoWave, e.g. the table for MonoWaveUp(lows, highs, dates, idx_start=3, skip=2) is at [UP, 3, 2].
+
+    The table is built once per series, so building a MonoWave becomes a lookup instead of a scan over the bars. For
+    appended bars, extend() only continues the scans which ran off the end of the data.
+
+    The table is dense: every bar, direction and skip has an int32 end and a price in the dtype of the lows / highs,
+    i.e. 2 * n * up_to * 12 bytes for float64 prices (8 for float32), e.g. about 430 MB for 1e6 bars and the 18 skips of
+    the screener. up_to only grows to the skips asked for (see ensure()), at most MAX_UP_TO.
+    """
+    UP = 0
+    DOWN = 1
+
+    def __init__(self,
+                 lows: np.array,
+                 highs: np.array,
+                 up_to: int = 10,
+                 range_index: RangeIndex = None):
+
+        self.__lows = lows
+        self.__highs = highs
+        self.__range_index = RangeIndex(lows, highs) if range_index is None else range_index
+        self.__up_to = 0
+        self.__price_dtype = np.result_type(lows.dtype, highs.dtype, np.float32)
+        self.ends = np.empty((2, 0, 0), dtype=np.int32)
+        self.prices = np.empty((2, 0, 0), dtype=self.__price_dtype)
+
+        self.build(up_to)
+
+    @property
+    def up_to(self) -> int:
+        return self.__up_to
+
+    @property
+    def open_skip(self) -> np.array:
+        """
+        (2, n) first skip of every (direction, idx_start) whose end may still change if bars are appended (the scan
+        ran off the end of the data), up_to if all ends of the start are final
+
+        :return:
+        """
+        return self.__open_skip[:, :len(self.__lows)]
+
+    def build(self, up_to: int):
+        """
+        (Re-)builds the table for skips in [0, up_to)
+
+        :param up_to:
+        :return:
+        """
+        if up_to > MAX_UP_TO:
+            raise ValueError(f'The table covers skips up to {MAX_UP_TO - 1}, got up_to {up_to}.')
+
+        n = len(self.__lows)
+        self.__ends = np.empty((2, n, up_to), dtype=np.int32)
+        self.__prices = np.empty((2, n, up_to), dtype=self.__price_dtype)
+        self.__open_skip = np.zeros((2, n), dtype=np.int64)
+        self.__base = np.empty((2, n))
+        self.__base_idx = np.zeros((2, n), dtype=np.int64)
+        self.__scan = np.empty((2, n))
+        self.__scan_idx = np.zeros((2, n), dtype=np.int64)
+        self.__reached = np.zeros((2, n), dtype=bool)
+        self.__open_up = np.empty(0, dtype=np.int64)
+        self.__open_down = np.empty(0, dtype=np.int64)
+        self.__up_to = up_to
+
+        self.__extend(0)
+
+    def extend(self, lows: np.array, highs: np.array):
+        """
+        Updates the table for appended bars. Only the starts whose MonoWaves ran off the end of the data so far and
+        the new starts are scanned, the scans continue where they stopped. The RangeIndex of the table has to be
+        extended first.
+
+        :param lows: all lows, including the ones the table was built for
+        :param highs:
+        :return:
+        """
+        n_old = len(self.__lows)
+        self.__lows, self.__highs = lows, highs
+        n = len(lows)
+
+        if n > self.__ends.shape[1]:
+            capacity = max(n, 2 * self.__ends.shape[1])
+            for name in ['ends', 'prices', 'open_skip', 'base', 'base_idx', 'scan', 'scan_idx', 'reached']:
+                attr = f'_MonoWaveTable__{name}'
+                old = getattr(self, attr)
+                new = np.empty((2, capacity) + old.shape[2:], dtype=old.dtype)
+                new[:, :n_old] = old[:, :n_old]
+                setattr(self, attr, new)
+
+        self.__extend(n_old)
+
+    def __extend(self, idx_from: int):
+        self.__open_up, self.__open_down = extend_monowave_ends(
+            self.__lows, self.__highs, idx_from, self.__ends, self.__prices, self.__open_skip, self.__base,
+            self.__base_idx, self.__scan, self.__scan_idx, self.__reached, self.__open_up, self.__open_down,
+            self.__range_index.max_highs, self.__range_index.log2)
+
+        n = len(self.__lows)
+        self.ends = self.__ends[:, :n]
+        self.prices = self.__prices[:, :n]
+
+    def ensure(self, up_to: int):
+        """
+        Grows the table to exactly up_to if skips in [0, up_to) are not covered, yet (the table is rebuilt, so ask for
+        the largest skip at once, e.g. the largest skip of the WaveOptions of a search)
+
+        :param up_to: at most MAX_UP_TO
+        :return:
+        """
+        if up_to > self.__up_to:
+            self.build(up_to)
+
+    def end(self, direction: int, idx_start: int, skip: int = 0):
+        """
+        Returns the extreme price and the index of the end of a MonoWave. The table grows if skip is not covered, yet.
+
+        :param direction: MonoWaveTable.UP or MonoWaveTable.DOWN
+        :param idx_start:
+        :param skip:
+        :return: price, idx_end or None, None if the MonoWave has no end in the data
+        """
+        self.ensure(skip + 1)
+
+        idx_end = self.ends[direction, idx_start, skip]
+        if idx_end == NO_END:
+            return None, None
+
+        return float(self.prices[direction, idx_start, skip]), int(idx_end)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+import numpy as np
+from models.functions import log2_table, extend_sparse_table, range_min, range_max
+
+
+class RangeIndex:
+    """
+    Range minimum of the lows / range maximum of the highs of a series. Both sparse tables are built once in
+    O(n log n), afterwards every query, e.g. min(lows[idx_from:idx_to]), is answered in O(1) without scanning or
+    allocating.
+
+    extend() updates both tables for appended bars in O(k log n) for k new bars; the tables have spare capacity, which
+    doubles when it is used up.
+    """
+    def __init__(self,
+                 lows: np.array,
+                 highs: np.array):
+
+        self.__n = 0
+        self.log2 = log2_table(0)
+        self.min_lows = np.empty((1, 0), dtype=lows.dtype)
+        self.max_highs = np.empty((1, 0), dtype=highs.dtype)
+
+        self.extend(lows, highs)
+
+    def __len__(self):
+        return self.__n
+
+    def extend(self, lows: np.array, highs: np.array):
+        """
+        Updates the tables for lows / highs, which extend the series the tables were built for
+
+        :param lows: all lows, including the ones the tables were built for
+        :param highs:
+        :return:
+        """
+        n = len(lows)
+        if n > self.min_lows.shape[1]:
+            capacity = max(n, 2 * self.min_lows.shape[1])
+            levels = int(capacity).bit_length()
+            min_lows = np.empty((levels, capacity), dtype=lows.dtype)
+            max_highs = np.empty((levels, capacity), dtype=highs.dtype)
+            min_lows[:self.min_lows.shape[0], :self.__n] = self.min_lows[:, :self.__n]
+            max_highs[:self.max_highs.shape[0], :self.__n] = self.max_highs[:, :self.__n]
+            self.min_lows, self.max_highs = min_lows, max_highs
+            self.log2 = log2_table(capacity)
+
+        extend_sparse_table(self.min_lows, lows, self.__n, True)
+        extend_sparse_table(self.max_highs, highs, self.__n, False)
+        self.__n = n
+
+    def min_low(self, idx_from: int, idx_to: int) -> float:
+        """
+        Same as np.min(lows[idx_from:idx_to]), idx_to has to be larger than idx_from
+
+        :param idx_from:
+        :param idx_to:
+        :return:
+        """
+        return range_min(self.min_lows, self.log2, idx_from, idx_to)
+
+    def max_high(self, idx_from: int, idx_to: int) -> float:
+        """
+        Same as np.max(highs[idx_from:idx_to]), idx_to has to be larger than idx_from
+
+        :param idx_from:
+        :param idx_to:
+        :return:
+        """
+        return range_max(self.max_highs, self.log2, idx_from, idx_to)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+WAVE_COLUMNS = ['idx_start', 'wave1_end', 'wave2_end', 'wave3_end', 'wave4_end', 'wave5_end']
+
+
+class ResultBuffer:
+    """
+    Columnar buffer of the waves found by the screener: one row per (ticker, timeframe, rule, WaveOptions) with the
+    scores and the boundaries of the waves. The columns are preallocated arrays which double their capacity when full,
+    so adding a row is amortized O(1) (unlike DataFrame.append, which copies the whole frame). Tickers, rule names and
+    timeframes are stored as codes into a list of categories.
+
+    The buffer is converted once at the end, to a DataFrame (to_frame()) or to Parquet / Arrow files (needs pyarrow).
+    """
+    def __init__(self, capacity: int = 64, n_waves: int = 5):
+        self.__n = 0
+        self.__categories = {'ticker': dict(), 'rule': dict(), 'timeframe': dict()}
+        self.__columns = {'ticker': np.empty(capacity, dtype=np.int32),
+                          'rule': np.empty(capacity, dtype=np.int32),
+                          'timeframe': np.empty(capacity, dtype=np.int32),
+                          'new_option_impulse': np.empty((capacity, n_waves), dtype=np.int16),
+                          'proportion_score': np.empty(capacity),
+                          'data_size': np.empty(capacity, dtype=np.int64),
+                          'wave_end': np.empty(capacity, dtype=np.int64),
+                          'age_score': np.empty(capacity),
+                          'waves': np.empty((capacity, n_waves + 1), dtype=np.int64)}
+
+    def __len__(self):
+        return self.__n
+
+    @property
+    def capacity(self) -> int:
+        return len(self.__columns['ticker'])
+
+    def add(self,
+            ticker: str,
+            rule: str,
+            option: list,
+            proportion_score: float,
+            data_size: int,
+            wave_end: int,
+            age_score: float,
+            waves_key: tuple,
+            timeframe: str = ''):
+        """
+        Adds a row
+
+        :param ticker:
+        :param rule: name of the WaveRule
+        :param option: WaveOptions.values, None for a missing wave
+        :param proportion_score: WaveScore.value()
+        :param data_size: number of bars of the ticker
+        :param wave_end: index of the end of the WavePattern
+        :param age_score: wave_end / data_size
+        :param waves_key: WavePattern.key, start index and end index of every wave
+        :param timeframe: timeframe of the bars, e.g. '1h' (see TimeframePipeline)
+        :return:
+        """
+        if self.__n == self.capacity:
+            self.__grow(max(1, 2 * self.capacity))
+
+        row = self.__n
+        columns = self.__columns
+        columns['ticker'][row] = self.__code('ticker', ticker)
+        columns['rule'][row] = self.__code('rule', rule)
+        columns['timeframe'][row] = self.__code('timeframe', timeframe)
+        columns['new_option_impulse'][row] = [-1 if skip is None else skip for skip in option]
+        columns['proportion_score'][row] = proportion_score
+        columns['data_size'][row] = data_size
+        columns['wave_end'][row] = wave_end
+        columns['age_score'][row] = age_score
+        columns['waves'][row] = [-1 if idx is None else idx for idx in waves_key]
+        self.__n += 1
+
+    def extend(self, other: ResultBuffer):
+        """
+        Appends all rows of other, e.g. the rows of another ticker
+
+        :param other:
+        :return:
+        """
+        n = self.__n + len(other)
+        if n > self.capacity:
+            self.__grow(max(n, 2 * self.capacity))
+
+        for name, values in other.columns().items():
+            if name in self.__categories:
+                categories = other.categories(name)
+                values = np.array([self.__code(name, category) for category in categories], dtype=np.int32)[values] \
+                    if len(values) else values
+            self.__columns[name][self.__n:n] = values
+        self.__n = n
+
+    def columns(self) -> dict:
+        """
+        Views of the filled part of the columns, tickers, rules and timeframes as codes (see categories())
+
+        :return:
+        """
+        return {name: values[:self.__n] for name, values in self.__columns.items()}
+
+    def categories(self, name: str) -> list:
+        """
+        Values of the codes of a column, e.g. categories('ticker')[code]
+
+        :param name: 'ticker', 'rule' or 'timeframe'
+        :return:
+        """
+        return list(self.__categories[name])
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        One DataFrame with a row per result: ticker, rule, timeframe, new_option_impulse (WaveOptions.values),
+        proportion_score, data_size, wave_end, age_score and the start / end indices of the waves (missing waves are
+        <NA>)
+
+        :return:
+        """
+        columns = self.columns()
+        frame = {name: pd.Categorical.from_codes(columns[name], self.categories(name))
+                 for name in self.__categories}
+        frame['new_option_impulse'] = [[None if skip < 0 else skip for skip in values]
+                                       for values in columns['new_option_impulse'].tolist()]
+        for name in ['proportion_score', 'data_size', 'wave_end', 'age_score']:
+            frame[name] = columns[name]
+        for column, values in zip(WAVE_COLUMNS, columns['waves'].T):
+            frame[column] = pd.array(np.where(values < 0, None, values), dtype='Int64')
+
+        return pd.DataFrame(frame)
+
+    def to_arrow(self):
+        """
+        pyarrow.Table with the columns of to_frame(); tickers, rules and timeframes are dictionary encoded,
+        new_option_impulse is a fixed size list
+
+        :return:
+        """
+        import pyarrow as pa
+
+        columns = self.columns()
+        arrays = {name: pa.DictionaryArray.from_arrays(columns[name], self.categories(name))
+                  for name in self.__categories}
+        options = columns['new_option_impulse']
+        arrays['new_option_impulse'] = pa.FixedSizeListArray.from_arrays(
+            pa.array(options.reshape(-1), mask=options.reshape(-1) < 0), options.shape[1])
+        for name in ['proportion_score', 'data_size', 'wave_end', 'age_score']:
+            arrays[name] = pa.array(columns[name])
+        for column, values in zip(WAVE_COLUMNS, columns['waves'].T):
+            arrays[column] = pa.array(values, mask=values < 0)
+
+        return pa.table(arrays)
+
+    def write_parquet(self, path: str):
+        """
+        Writes the results to a Parquet file (needs pyarrow)
+
+        :param path:
+        :return:
+        """
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), path)
+
+    def write_arrow(self, path: str):
+        """
+        Writes the results to an Arrow IPC (Feather v2) file (needs pyarrow)
+
+        :param path:
+        :return:
+        """
+        import pyarrow.feather as feather
+        feather.write_feather(self.to_arrow(), path)
+
+    def __code(self, name: str, value: str) -> int:
+        return self.__categories[name].setdefault(value, len(self.__categories[name]))
+
+    def __grow(self, capacity: int):
+        for name, values in self.__columns.items():
+            grown = np.empty((capacity, ) + values.shape[1:], dtype=values.dtype)
+            grown[:self.__n] = values[:self.__n]
+            self.__columns[name] = grown
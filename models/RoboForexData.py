@@ -24,3 +24,7 @@ class RoboForexData:
     def get_bars(self, symbol, timeframe, date_from, count):
         rates = mt5.copy_rates_from(symbol, timeframe, date_from, count)
         return rates
+
+    def get_bars_range(self, symbol, timeframe, date_from, date_to):
+        rates = mt5.copy_rates_range(symbol, timeframe, date_from, date_to)
+        return rates
@@ -0,0 +1,90 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from models.functions import resample_ohlc, as_array, PRICE_DTYPES
+from models.WaveAnalyzer import WaveAnalyzer
+
+
+class TimeframePipeline:
+    """
+    Bars of one ticker in several timeframes, resampled from the finest bars only: e.g. 5m bars are fetched once and
+    resampled to 15m, the 15m bars to 1h and the 1h bars to 4h (one compiled pass per level over the bars of the level
+    before). The WaveAnalyzer of every timeframe (MonoWaveTable, extrema, search cache) is built on first use and kept.
+
+    Every timeframe has to be a multiple of the previous one.
+    """
+    def __init__(self, df: pd.DataFrame, timeframes: list, window: int = 12, **analyzer_kwargs):
+        """
+
+        :param df: finest bars with the columns Date, Open, High, Low, Close
+        :param timeframes: pandas offsets, from fine to coarse, e.g. ['5min', '15min', '1h', '4h']
+        :param window: window of the local minimums of every timeframe, see WaveAnalyzer
+        :param analyzer_kwargs: passed to WaveAnalyzer.from_arrays(), e.g. workers
+        """
+        periods = [pd.Timedelta(timeframe).value for timeframe in timeframes]
+        for coarse, fine in zip(periods[1:], periods[:-1]):
+            if coarse <= fine or coarse % fine != 0:
+                raise ValueError(f'Every timeframe has to be a multiple of the previous one, got {timeframes}.')
+
+        self.timeframes = list(timeframes)
+        self.window = window
+        self.analyzer_kwargs = analyzer_kwargs
+        self.__bars = dict()
+        self.__analyzers = dict()
+
+        bars = (as_array(df['Date']).astype('datetime64[ns]').view(np.int64),
+                as_array(df['Open'], PRICE_DTYPES),
+                as_array(df['High'], PRICE_DTYPES),
+                as_array(df['Low'], PRICE_DTYPES),
+                as_array(df['Close'], PRICE_DTYPES),
+                np.arange(len(df), dtype=np.int64))
+        for timeframe, period in zip(self.timeframes, periods):
+            bars = resample_ohlc(*bars, period)
+            self.__bars[timeframe] = bars
+
+    def frame(self, timeframe: str) -> pd.DataFrame:
+        """
+        Bars of the timeframe with the columns Date, Open, High, Low, Close
+
+        :param timeframe:
+        :return:
+        """
+        times, opens, highs, lows, closes, _ = self.__bars[timeframe]
+        return pd.DataFrame({'Date': times.view('datetime64[ns]'),
+                             'Open': opens,
+                             'High': highs,
+                             'Low': lows,
+                             'Close': closes})
+
+    def first_index(self, timeframe: str) -> np.array:
+        """
+        Index of the first finest bar of every bar of the timeframe, e.g. to map a wave found on 4h bars to 5m bars
+
+        :param timeframe:
+        :return:
+        """
+        return self.__bars[timeframe][5]
+
+    def close(self):
+        """
+        Stops the process pools of the WaveAnalyzers (workers > 1), see WaveAnalyzer.close()
+
+        :return:
+        """
+        for wa in self.__analyzers.values():
+            wa.close()
+
+    def analyzer(self, timeframe: str) -> WaveAnalyzer:
+        """
+        WaveAnalyzer of the bars of the timeframe, built on first use
+
+        :param timeframe:
+        :return:
+        """
+        wa = self.__analyzers.get(timeframe)
+        if wa is None:
+            times, _, highs, lows, _, _ = self.__bars[timeframe]
+            wa = WaveAnalyzer.from_arrays(lows, highs, times.view('datetime64[ns]'), window=self.window,
+                                          **self.analyzer_kwargs)
+            self.__analyzers[timeframe] = wa
+        return wa
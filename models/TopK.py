@@ -0,0 +1,82 @@
+from __future__ import annotations
+import heapq
+import numpy as np
+
+
+class TopK:
+    """
+    Keeps the k items with the highest scores of a stream, e.g. the best charts of a ticker. Only k items are held in a
+    min-heap, so memory and sorting do not depend on the number of pushed items. Of items with the same score the one
+    pushed first wins, the same as a stable sort of all items by descending score.
+    """
+    def __init__(self, k: int):
+        self.k = k
+        self.__heap = list()  # (score, -seq, item), the worst item is at the top
+        self.__seq = 0
+
+    def __len__(self):
+        return len(self.__heap)
+
+    @property
+    def threshold(self) -> float:
+        """
+        Score an item has to exceed to be kept, -inf while less than k items are kept
+
+        :return:
+        """
+        if self.k <= 0:
+            return np.inf
+        return self.__heap[0][0] if len(self.__heap) == self.k else -np.inf
+
+    def push(self, score: float, item) -> bool:
+        """
+        Adds an item
+
+        :param score:
+        :param item:
+        :return: True if the item is kept (for now)
+        """
+        entry = (score, -self.__seq, item)
+        self.__seq += 1
+        if len(self.__heap) < self.k:
+            heapq.heappush(self.__heap, entry)
+            return True
+        if self.k > 0 and score > self.__heap[0][0]:
+            heapq.heapreplace(self.__heap, entry)
+            return True
+        return False
+
+    def extend(self, scores: np.array, items: list = None):
+        """
+        Adds many items at once. Only the k best of them are pushed to the heap (found with a partial sort), the others
+        can not be kept anyway.
+
+        :param scores: (N, ) scores
+        :param items: N items, the positions in scores if None
+        :return:
+        """
+        scores = np.asarray(scores, dtype=float)
+        candidates = np.arange(len(scores))
+        if len(scores) > self.k:
+            # ties at the k-th best score are kept, the heap decides by the order of pushing
+            kth = scores[np.argpartition(-scores, self.k - 1)[self.k - 1]] if self.k > 0 else np.inf
+            candidates = np.flatnonzero(scores >= max(kth, self.threshold))
+
+        for position in candidates.tolist():
+            self.push(scores[position], position if items is None else items[position])
+
+    def items(self) -> list:
+        """
+        The kept items, best first
+
+        :return:
+        """
+        return [item for _, _, item in sorted(self.__heap, key=lambda entry: (-entry[0], -entry[1]))]
+
+    def scores(self) -> list:
+        """
+        The scores of items()
+
+        :return:
+        """
+        return [score for score, _, _ in sorted(self.__heap, key=lambda entry: (-entry[0], -entry[1]))]
@@ -1,11 +1,22 @@
 from models.MonoWave import MonoWaveUp, MonoWaveDown
-from models.WaveOptions import WaveOptionsGenerator5, WaveOptionsGenerator3
+from models.MonoWaveTable import MonoWaveTable
+from models.MonoWaveCache import MonoWaveCache
+from models.RangeIndex import RangeIndex
+from models.WaveOptions import WaveOptions, WaveOptionsGenerator, WaveOptionsGenerator5, WaveOptionsGenerator3, \
+    MAX_UP_TO
 from models.WaveCycle import WaveCycle
 from models.WavePattern import WavePattern
-from models.WaveRules import Impulse, Correction, TDWave
+from models.WaveRules import Impulse, Correction, TDWave, LeadingDiagonal
+from models.functions import local_extrema, local_minimums, as_array, PRICE_DTYPES
+from models.kernels import impulse_search, impulse_best_first, sibling_subsumed, last_wave_reach, IMPULSE, \
+    LEADING_DIAGONAL, START, OPTION, WAVE1_END, WAVE2_END, WAVE3_END, WAVE4_END, WAVE5_END, RULES
+from models.parallel import SearchPool
 import numpy as np
 import pandas as pd
 
+WAVE_KEYS = ['wave1', 'wave2', 'wave3', 'wave4', 'wave5']
+IMPULSE_WAVES = [(MonoWaveUp, '1'), (MonoWaveDown, '2'), (MonoWaveUp, '3'), (MonoWaveDown, '4'), (MonoWaveUp, '5')]
+
 
 class WaveAnalyzer:
     """
@@ -13,22 +24,150 @@ class WaveAnalyzer:
     """
     def __init__(self,
                  df: pd.DataFrame,
-                 verbose: bool = False):
+                 verbose: bool = False,
+                 cache_size: int = 100_000,
+                 workers: int = 1,
+                 window: int = 12):
+        """
 
+        :param df: OHLC data with the columns Date, Low, High and optionally Minimum (start of the impulsive waves)
+        :param verbose:
+        :param cache_size: maximal number of cached MonoWaves
+        :param workers: number of processes searching the WaveOptions of find_impulsive_waves() in parallel
+        :param window: window of the local minimums used as start of the impulsive waves if df has no column Minimum,
+            see functions.local_extrema()
+        """
         self.df = df
-        self.lows = np.array(list(self.df['Low']))
-        self.highs = np.array(list(self.df['High']))
-        self.dates = np.array(list(self.df['Date']))
+        self.__setup(self.df['Low'], self.df['High'], self.df['Date'], verbose, cache_size, workers, window)
+        self.minimum = self.df['Minimum'].to_numpy(dtype=bool) if 'Minimum' in self.df \
+            else self.local_minimums(window)
+
+    @classmethod
+    def from_arrays(cls,
+                    lows: np.array,
+                    highs: np.array,
+                    dates: np.array = None,
+                    minimum: np.array = None,
+                    verbose: bool = False,
+                    cache_size: int = 100_000,
+                    workers: int = 1,
+                    window: int = 12):
+        """
+        WaveAnalyzer without a dataframe, using the arrays as they are (e.g. views on shared memory, np.memmaps of a
+        BarStore or Arrow columns), see functions.as_array()
+
+        :param lows: float64 or float32 array
+        :param highs:
+        :param dates: the index is used as date if None
+        :param minimum: boolean array, True for the start indices of the impulsive waves. The local minimums of the
+            window are used if None.
+        :param verbose:
+        :param cache_size:
+        :param workers:
+        :param window:
+        :return:
+        """
+        wa = cls.__new__(cls)
+        wa.df = None
+        wa.__setup(lows, highs, np.arange(len(lows)) if dates is None else dates, verbose, cache_size, workers, window)
+        wa.minimum = wa.local_minimums(window) if minimum is None else minimum
+        return wa
+
+    def __setup(self, lows: np.array, highs: np.array, dates: np.array, verbose: bool, cache_size: int, workers: int,
+                window: int):
+        # no copies of contiguous float64 / float32 columns, see functions.as_array()
+        self.lows = as_array(lows, PRICE_DTYPES)
+        self.highs = as_array(highs, PRICE_DTYPES)
+        self.dates = as_array(dates)
         self.verbose = verbose
+        self.workers = workers
+        self.window = window
 
         self.impulse_rules = list()
         self.correction_rules = list()
 
         self.__waveoptions_up: WaveOptionsGenerator5
         self.__waveoptions_down: WaveOptionsGenerator3
+        self.__monowave_table = None
+        self.__range_index = None
+        self.__monowave_cache = MonoWaveCache(cache_size)
+        self.__buffers = dict()
+        self.__search_cache = None
+        self.__extrema = dict()
+        self.__starts = None
+        self.__corrections = dict()
+        self.__reach = None
+        self.__search_pool = None
 
         self.set_combinatorial_limits()
 
+    def append(self, lows: np.array, highs: np.array, dates: np.array = None, window: int = None):
+        """
+        Appends new bars. The RangeIndex and the MonoWaveTable are updated instead of rebuilt (only MonoWaves which ran
+        off the end of the data are scanned again), and the next compiled search_impulsive_waves() with the same
+        WaveOptions and rules only repeats the starts whose result may have changed: new starts and starts whose
+        search used MonoWave ends which were not final.
+
+        After the first append() the data is held in lows / highs / dates / minimum, the dataframe is not updated. The
+        process pool of the parallel search is stopped, see close().
+
+        :param lows: lows of the new bars
+        :param highs: highs of the new bars
+        :param dates: dates of the new bars, the index is used if None
+        :param window: window of the local minimums (start of the impulsive waves), self.window if None
+        :return:
+        """
+        n_old = len(self.lows)
+        if dates is None:
+            if not np.issubdtype(self.dates.dtype, np.integer):
+                raise ValueError('The dates of the new bars are needed, as the dates are not the index.')
+            dates = np.arange(n_old, n_old + len(lows))
+
+        self.lows = self.__append_values('lows', self.lows, lows)
+        self.highs = self.__append_values('highs', self.highs, highs)
+        self.dates = self.__append_values('dates', self.dates, dates)
+        self.minimum = self.__append_values('minimum', self.minimum, np.zeros(len(lows), dtype=bool))
+
+        # the window of the last bars reaches into the new ones
+        window = self.window if window is None else window
+        idx_from = max(0, n_old - window + 1)
+        self.minimum[idx_from:] = local_minimums(self.lows, window, idx_from)
+        self.__extrema.clear()
+        self.__starts = None
+        self.__corrections.clear()
+        self.__reach = None
+        self.close()
+
+        if self.__range_index is not None:
+            self.__range_index.extend(self.lows, self.highs)
+        if self.__monowave_table is not None:
+            self.__monowave_table.extend(self.lows, self.highs)
+        self.__monowave_cache.clear()
+
+    def __append_values(self, name: str, values: np.array, new_values: np.array) -> np.array:
+        """
+        values + new_values in a buffer with spare capacity, which doubles when it is used up
+        """
+        buffer = self.__buffers.get(name)
+        n_old, n = len(values), len(values) + len(new_values)
+        if buffer is None or len(buffer) < n:
+            buffer = np.empty(max(n, 2 * n_old), dtype=np.result_type(values, np.asarray(new_values)))
+            buffer[:n_old] = values
+            self.__buffers[name] = buffer
+
+        buffer[n_old:n] = new_values
+        return buffer[:n]
+
+    def close(self):
+        """
+        Stops the worker processes of the parallel search (workers > 1), if any. A later search starts them again.
+
+        :return:
+        """
+        if self.__search_pool is not None:
+            self.__search_pool.close()
+            self.__search_pool = None
+
     def get_absolute_low(self):
         """
         find the absolute low in the dataframe. Can be used to start the wave analysis from this low.
@@ -48,76 +187,654 @@ class WaveAnalyzer:
         self.__waveoptions_up = WaveOptionsGenerator5(n_up)
         self.__waveoptions_down = WaveOptionsGenerator3(n_down)
 
+    @property
+    def monowave_table(self) -> MonoWaveTable:
+        """
+        Lookup table of all MonoWave ends of the data. Built on first use and grows if larger skips are requested.
+
+        :return:
+        """
+        if self.__monowave_table is None:
+            up_to = max(self.__waveoptions_up.up_to, self.__waveoptions_down.up_to)
+            self.__monowave_table = MonoWaveTable(self.lows, self.highs, up_to, self.range_index)
+        return self.__monowave_table
+
+    @property
+    def range_index(self) -> RangeIndex:
+        """
+        O(1) range minimum of the lows / range maximum of the highs, built on first use
+
+        :return:
+        """
+        if self.__range_index is None:
+            self.__range_index = RangeIndex(self.lows, self.highs)
+        return self.__range_index
+
+    @property
+    def monowave_cache(self) -> MonoWaveCache:
+        return self.__monowave_cache
+
+    def get_monowave(self, wave_cls, idx_start: int, skip: int = 0, label: str = None):
+        """
+        Returns the MonoWave of type wave_cls (MonoWaveUp or MonoWaveDown) starting at idx_start with skip. MonoWaves are
+        cached per (direction, idx_start, skip, label) and shared between all calls, so they must not be changed. The end
+        is looked up in the MonoWaveTable if it covers skip, otherwise the bars are scanned (a single wave does not
+        grow the table, the searches grow it to the largest skip of their WaveOptions).
+
+        :param wave_cls: MonoWaveUp or MonoWaveDown
+        :param idx_start:
+        :param skip:
+        :param label: e.g. '1' or 'A'
+        :return:
+        """
+        key = (wave_cls, idx_start, skip, label)
+        wave = self.__monowave_cache.get(key)
+
+        if wave is None:
+            table = self.monowave_table
+            wave = wave_cls(lows=self.lows, highs=self.highs, dates=self.dates, idx_start=idx_start, skip=skip,
+                            table=table if skip < table.up_to else None)
+            wave.label = label
+            self.__monowave_cache.put(key, wave)
+
+        return wave
+
     def find_5_impulsive_waves(self,
-                               wave_config: list = None):
+                               wave_config: list = None,
+                               rules: list = None):
         """
         Tries to find 5 consecutive waves (up, down, up, down, up) to build an impulsive 12345 wave
 
         :param idx_start: index in dataframe to start from
         :param wave_config: WaveOptions
+        :param rules: optional WaveRules. The conditions of the rules are checked as soon as the waves they need are
+            built and only waves fulfilling at least one of the rules are returned
         :return: list of the 5 MonoWaves in case they are found.
 
                 False otherwise
         """
 
-        new_df = self.df.reset_index()
-        all_inx_start = new_df[new_df['Minimum']].index.to_numpy()
         result = []
 
-        for idx_start in all_inx_start:
+        for idx_start in self.start_indices():
             if wave_config is None:
                 wave_config = [0, 0, 0, 0, 0]
 
-            wave1 = MonoWaveUp(lows=self.lows, highs=self.highs, dates=self.dates, idx_start=idx_start, skip=wave_config[0])
-            wave1.label = '1'
+            wave1 = self.get_monowave(MonoWaveUp, idx_start, wave_config[0], '1')
             wave1_end = wave1.idx_end
             if wave1_end is None:
                 if self.verbose: print("Wave 1 has no End in Data")
                 continue
 
-            wave2 = MonoWaveDown(lows=self.lows, highs=self.highs, dates=self.dates, idx_start=wave1_end, skip=wave_config[1])
-            wave2.label = '2'
+            waves = {'wave1': wave1}
+            rules_left = self.check_stage(rules, waves, 1)
+            if rules_left == []:
+                if self.verbose: print("Wave 1 violates all rules")
+                continue
+
+            wave2 = self.get_monowave(MonoWaveDown, wave1_end, wave_config[1], '2')
             wave2_end = wave2.idx_end
             if wave2_end is None:
                 if self.verbose: print("Wave 2 has no End in Data")
                 continue
 
-            wave3 = MonoWaveUp(lows=self.lows, highs=self.highs, dates=self.dates, idx_start=wave2_end, skip=wave_config[2])
-            wave3.label = '3'
+            waves['wave2'] = wave2
+            rules_left = self.check_stage(rules_left, waves, 2)
+            if rules_left == []:
+                if self.verbose: print("Wave 1 and Wave 2 violate all rules")
+                continue
+
+            wave3 = self.get_monowave(MonoWaveUp, wave2_end, wave_config[2], '3')
             wave3_end = wave3.idx_end
             if wave3_end is None:
                 if self.verbose: print("Wave 3 has no End in Data")
                 continue
 
-            wave4 = MonoWaveDown(lows=self.lows, highs=self.highs, dates=self.dates, idx_start=wave3_end, skip=wave_config[3])
-            wave4.label = '4'
+            waves['wave3'] = wave3
+            rules_left = self.check_stage(rules_left, waves, 3)
+            if rules_left == []:
+                if self.verbose: print("Wave 1 to Wave 3 violate all rules")
+                continue
+
+            wave4 = self.get_monowave(MonoWaveDown, wave3_end, wave_config[3], '4')
             wave4_end = wave4.idx_end
 
             if wave4_end is None:
                 if self.verbose: print("Wave 4 has no End in Data")
                 continue
 
-            if wave2.low_idx != wave4.low_idx and wave2.low > np.min(self.lows[wave2.low_idx:wave4.low_idx]):
+            if not self.wave4_is_valid(wave2, wave4):
+                continue
+
+            waves['wave4'] = wave4
+            rules_left = self.check_stage(rules_left, waves, 4)
+            if rules_left == []:
+                if self.verbose: print("Wave 1 to Wave 4 violate all rules")
                 continue
 
             if wave_config[4] is not None:
-                wave5 = MonoWaveUp(lows=self.lows, highs=self.highs, dates=self.dates, idx_start=wave4_end, skip=wave_config[4])
-                wave5.label = '5'
+                wave5 = self.get_monowave(MonoWaveUp, wave4_end, wave_config[4], '5')
                 wave5_end = wave5.idx_end
                 if wave5_end is None:
                     if self.verbose: print("Wave 5 has no End in Data")
                     continue
 
-                if wave4.low_idx != wave5.high_idx and wave4.low > np.min(self.lows[wave4.low_idx:wave5.high_idx]):
+                if not self.wave5_is_valid(wave4, wave5):
                     if self.verbose: print('Low of Wave 4 higher than a low between Wave 4 and Wave 5')
                     continue
             else:
                 wave5 = None
 
+            waves['wave5'] = wave5
+            rules_left = self.check_stage(rules_left, waves, 5)
+            if rules_left == []:
+                if self.verbose: print("Wave 1 to Wave 5 violate all rules")
+                continue
+
             result.append([wave1, wave2, wave3, wave4, wave5])
 
         return result
 
+    def find_impulsive_waves(self,
+                             wave_options: list,
+                             rules: list = None,
+                             compiled: bool = False,
+                             unique: bool = False,
+                             end_window: tuple = None,
+                             idx_starts: np.array = None):
+        """
+        Finds 5 consecutive waves (up, down, up, down, up) for every WaveOptions. The result is the same as calling
+        find_5_impulsive_waves() for each of the WaveOptions, but the WaveOptions are walked as a prefix tree: e.g. wave1
+        and wave2 of [3,1,*,*,*] are built once for all WaveOptions with this prefix and the whole subtree is dropped as
+        soon as a wave has no end or the waves built so far violate all rules.
+
+        :param wave_options: a WaveOptionsGenerator or a list of WaveOptions, e.g. WaveOptionsGenerator5.options_sorted
+        :param rules: optional WaveRules, only waves fulfilling at least one of them are returned
+        :param compiled: search with the compiled kernel, see search_impulsive_waves(). MonoWaves are only built for
+            the hits. Only Impulse and LeadingDiagonal rules are supported.
+        :param unique: only return the first WaveOptions of waves with the same boundaries (see WavePattern.key), e.g.
+            [1,2,3,4,5] and [1,2,3,4,10] give the same waves if there is no 6th high after wave4
+        :param end_window: (first, last) index, only waves whose last wave (wave5, wave4 if there is no wave5) ends
+            within are returned, see search_impulsive_waves()
+        :param idx_starts: start indices of wave1, start_indices() if None
+        :return: list of (WaveOptions, [wave1, wave2, wave3, wave4, wave5]) ordered by wave_options and start index
+        """
+        if compiled or self.workers > 1:
+            hits = self.search_impulsive_waves(wave_options, rules, compiled, unique, end_window, idx_starts)
+            if isinstance(wave_options, WaveOptionsGenerator):
+                options = wave_options.to_array()
+                wave_options = {option_idx: WaveOptions(*[None if skip < 0 else skip
+                                                          for skip in options[option_idx].tolist()])
+                                for option_idx in np.unique(hits[:, OPTION]).tolist()}
+            return [(wave_options[option_idx], self.impulsive_waves(idx_start, wave_options[option_idx].values))
+                    for idx_start, option_idx in hits[:, [START, OPTION]].tolist()]
+
+        values = self.option_values(wave_options)
+        hits = self.__walk_options(values, rules, end_window, idx_starts)
+        if unique:
+            keys = set()
+            hits = [hit for hit in hits if not (self.waves_key(hit[2]) in keys or keys.add(self.waves_key(hit[2])))]
+
+        if isinstance(wave_options, WaveOptionsGenerator):
+            return [(WaveOptions(*values[option_idx]), waves) for option_idx, _, waves, _ in hits]
+        return [(wave_options[option_idx], waves) for option_idx, _, waves, _ in hits]
+
+    def search_impulsive_waves(self, wave_options, rules: list = None, compiled: bool = True, unique: bool = False,
+                               end_window: tuple = None, idx_starts: np.array = None) -> np.array:
+        """
+        find_impulsive_waves() returning the hits as a compact int array instead of MonoWaves. With compiled=True the
+        whole search runs in models.kernels.impulse_search() on the MonoWaveTable, without building any MonoWave. With
+        workers > 1 the WaveOptions are split across a process pool (models.parallel.SearchPool), which is started by
+        the first search and kept for the next ones until close().
+
+        :param wave_options: a WaveOptionsGenerator, a list of WaveOptions or an (N, 5) array of their values
+        :param rules: optional WaveRules, only waves fulfilling at least one are returned. The compiled search supports
+            Impulse and LeadingDiagonal rules only.
+        :param compiled:
+        :param unique: only return the first hit of waves with the same boundaries, see unique_hits(). The compiled
+            search does not walk WaveOptions whose MonoWave is the same as the one of the previous skip (no more highs
+            / lows to skip), if the previous skip covers all their remaining options.
+        :param end_window: (first, last) index, only hits whose last wave (wave5, wave4 if there is no wave5) ends
+            within are returned, e.g. (n - 50, n - 1) for the waves ending in the last 50 bars. The search is pruned:
+            starts and prefixes of WaveOptions which can not reach the first index (see last_wave_reach()) and waves
+            ending after the last index are not walked, so most of the history is never searched.
+        :param idx_starts: start indices of wave1, e.g. a single bar which is no local minimum, start_indices() if
+            None
+        :return: (M, 8) int64 array with the columns of models.kernels (START, OPTION, WAVE1_END, ..., WAVE5_END, RULES),
+            ordered by OPTION (index into wave_options) and START. WAVE5_END is -1 if there is no wave5, bit r of RULES
+            is set if the waves fulfill rules[r].
+        """
+        options = self.option_array(wave_options)
+        if idx_starts is not None:
+            idx_starts = np.unique(np.asarray(idx_starts, dtype=np.int64))
+
+        if self.workers > 1:
+            if self.__search_pool is None or self.__search_pool.closed:
+                self.__search_pool = SearchPool(self.lows, self.highs, self.workers)
+            hits = self.__search_pool.search(options, self.start_indices() if idx_starts is None else idx_starts,
+                                             rules, compiled, unique, end_window)
+        elif compiled:
+            hits = self.__search_compiled(options, rules, unique, end_window, idx_starts)
+        else:
+            hits = self.__search_tree(options, rules, end_window, idx_starts)
+
+        hits = hits[np.lexsort((hits[:, START], hits[:, OPTION]))]
+        return self.unique_hits(hits) if unique else hits
+
+    @staticmethod
+    def unique_hits(hits: np.array) -> np.array:
+        """
+        The first hit (in the order of hits) of every set of waves with the same boundaries, see WavePattern.key
+
+        :param hits: see search_impulsive_waves()
+        :return:
+        """
+        _, first = np.unique(hits[:, [START, WAVE1_END, WAVE2_END, WAVE3_END, WAVE4_END, WAVE5_END]], axis=0,
+                             return_index=True)
+        return hits[np.sort(first)]
+
+    @staticmethod
+    def waves_key(waves: list) -> tuple:
+        """
+        Boundaries of consecutive waves, the same as WavePattern(waves).key
+
+        :param waves:
+        :return:
+        """
+        return (waves[0].idx_start, ) + tuple(None if wave is None else wave.idx_end for wave in waves)
+
+    def wave_lengths(self, hits: np.array, wave_options) -> np.array:
+        """
+        Lengths of the waves of hits of search_impulsive_waves(), the same as the length of the MonoWaves of
+        impulsive_waves() but looked up in the MonoWaveTable without building them
+
+        :param hits: see search_impulsive_waves()
+        :param wave_options: the wave_options of the search
+        :return: (M, 5) float array, nan if there is no wave5
+        """
+        skips = self.option_array(wave_options)[hits[:, OPTION]].astype(np.int64)
+        starts = hits[:, [START, WAVE1_END, WAVE2_END, WAVE3_END, WAVE4_END]]
+        exists = skips >= 0
+        skips, starts = np.where(exists, skips, 0), np.where(exists, starts, 0)
+
+        # an up wave goes from the low at its start to its high, a down wave from the high at its start to its low
+        table = self.monowave_table
+        if len(skips):
+            table.ensure(int(skips.max()) + 1)
+        lengths = np.empty(skips.shape)
+        lengths[:, 0::2] = table.prices[MonoWaveTable.UP, starts[:, 0::2], skips[:, 0::2]] - self.lows[starts[:, 0::2]]
+        lengths[:, 1::2] = self.highs[starts[:, 1::2]] - table.prices[MonoWaveTable.DOWN, starts[:, 1::2],
+                                                                      skips[:, 1::2]]
+        lengths = np.abs(lengths)
+        lengths[~exists] = np.nan
+        return lengths
+
+    def best_impulsive_waves(self, wave_options, k: int, rules: list = None, min_proportion: float = 0.0,
+                             min_age: float = 0.0) -> np.array:
+        """
+        The k best hits of search_impulsive_waves(wave_options, rules, unique=True) by proportion score * age score
+        (WaveScore.values() of wave_lengths() and the end of the last wave / number of bars), as screener.py ranks
+        them. The result is the same as picking them from all hits with TopK, but the search is a branch and bound,
+        see models.kernels.impulse_best_first(): the prefixes of the WaveOptions with the highest bound of their scores
+        are expanded first and the search stops as soon as k hits beat the bound of every prefix left.
+
+        :param wave_options: a WaveOptionsGenerator, a list of WaveOptions or an (N, 5) array of their values
+        :param k: number of hits
+        :param rules: optional WaveRules, see search_impulsive_waves()
+        :param min_proportion: only hits with a higher proportion score are returned
+        :param min_age: only hits with a higher age score are returned
+        :return: (M <= k, 8) hits as search_impulsive_waves(), best first
+        """
+        options = self.option_array(wave_options)
+        rule_flags, rule_mask = self.__rule_flags(rules)
+
+        order = np.lexsort(options.T[::-1])
+        sorted_options = np.ascontiguousarray(options[order])
+        subsumed = sibling_subsumed(sorted_options, order)
+        if len(options):
+            self.monowave_table.ensure(int(options.max()) + 1)
+
+        table = self.monowave_table
+        hits, _ = impulse_best_first(self.lows, self.highs, table.ends, table.prices, self.range_index.min_lows,
+                                     self.range_index.log2, self.start_indices(), sorted_options, order, rule_mask,
+                                     subsumed, k, min_proportion, min_age)
+        hits[:, OPTION] = order[hits[:, OPTION]]
+        hits[:, RULES] = self.__rule_bits(hits, rule_flags)
+        return hits
+
+    @staticmethod
+    def __rule_flags(rules: list) -> tuple:
+        """
+        Flags of the rules for the compiled search
+
+        :param rules:
+        :return: list of the flag of every rule and the flags of all rules
+        """
+        rule_flags = list()
+        rule_mask = 0
+        for rule in rules or list():
+            if type(rule) is Impulse:
+                rule_flags.append(IMPULSE)
+            elif type(rule) is LeadingDiagonal:
+                rule_flags.append(LEADING_DIAGONAL)
+            else:
+                raise ValueError(f'The compiled search only supports Impulse and LeadingDiagonal rules, got {rule}.')
+            rule_mask |= rule_flags[-1]
+
+        return rule_flags, rule_mask
+
+    @staticmethod
+    def __rule_bits(hits: np.array, rule_flags: list) -> np.array:
+        """
+        Bit r set if the hit fulfills rules[r], from the flags of the compiled search
+        """
+        rule_bits = np.zeros(len(hits), dtype=np.int64)
+        for r, flag in enumerate(rule_flags):
+            rule_bits |= ((hits[:, RULES] & flag) != 0).astype(np.int64) << r
+        return rule_bits
+
+    def __search_compiled(self, options: np.array, rules: list, unique: bool = False,
+                          end_window: tuple = None, idx_starts: np.array = None) -> np.array:
+        rule_flags, rule_mask = self.__rule_flags(rules)
+
+        # the kernel walks options with the same prefix consecutively, the hits refer to the original order
+        order = np.lexsort(options.T[::-1])
+        sorted_options = np.ascontiguousarray(options[order])
+        if unique:
+            subsumed = sibling_subsumed(sorted_options, order)
+        else:
+            subsumed = np.zeros(sorted_options.T.shape, dtype=bool)
+        if len(options):
+            self.monowave_table.ensure(int(options.max()) + 1)
+
+        # starts whose last search only used final MonoWave ends have the same hits, see append()
+        key = (hash(options.tobytes()), options.shape, rule_mask, unique, end_window)
+        end_min, end_max, reach, starts = self.__end_window_starts(options, end_window, idx_starts)
+        searched = np.ones(len(starts), dtype=bool)
+        kept_hits = np.empty((0, RULES + 1), dtype=np.int64)
+        if self.__search_cache is not None and self.__search_cache[0] == key:
+            _, last_starts, last_hits, last_touched = self.__search_cache
+            searched = ~np.isin(starts, last_starts[~last_touched])
+            kept_hits = last_hits[np.isin(last_hits[:, START], starts[~searched])]
+
+        table = self.monowave_table
+        hits, touched = impulse_search(self.lows, self.highs, table.ends, table.prices, table.open_skip,
+                                       self.range_index.min_lows, self.range_index.log2, starts[searched],
+                                       sorted_options, rule_mask, subsumed, reach, end_min, end_max)
+        hits[:, OPTION] = order[hits[:, OPTION]]
+
+        hits = np.concatenate((kept_hits, hits))
+        all_touched = np.zeros(len(starts), dtype=bool)
+        all_touched[searched] = touched
+        self.__search_cache = (key, starts, hits.copy(), all_touched)
+
+        hits[:, RULES] = self.__rule_bits(hits, rule_flags)
+        return hits
+
+    def __search_tree(self, options: np.array, rules: list, end_window: tuple = None,
+                      idx_starts: np.array = None) -> np.array:
+        hits = self.__walk_options([[None if skip < 0 else skip for skip in values] for values in options.tolist()],
+                                   rules, end_window, idx_starts)
+
+        rows = np.full((len(hits), RULES + 1), -1, dtype=np.int64)
+        for row, (option_idx, _, waves, rules_left) in enumerate(hits):
+            rows[row, START] = waves[0].idx_start
+            rows[row, OPTION] = option_idx
+            rows[row, WAVE1_END:WAVE5_END + 1] = [-1 if wave is None else wave.idx_end for wave in waves]
+            rows[row, RULES] = sum(1 << r for r, rule in enumerate(rules or list())
+                                   if any(rule is rule_left for rule_left in rules_left))
+
+        return rows
+
+    def __walk_options(self, option_values: list, rules: list, end_window: tuple = None,
+                       idx_starts: np.array = None) -> list:
+        """
+        Walks the prefix tree of the WaveOptions for every start index
+
+        :param option_values: see option_values()
+        :param rules:
+        :param end_window: see search_impulsive_waves()
+        :param idx_starts: start indices, start_indices() if None
+        :return: list of (option_idx, position of the start index, waves, fulfilled rules) ordered by option_idx and
+            position
+        """
+        option_tree = self.build_option_tree(option_values)
+        options = np.array([[-1 if skip is None else skip for skip in values] for values in option_values],
+                           dtype=np.int64).reshape(-1, 5)
+        if len(options):
+            self.monowave_table.ensure(min(int(options.max()) + 1, MAX_UP_TO))
+        window = self.__end_window_starts(options, end_window, idx_starts)
+        window_starts = set(window[3].tolist())
+        hits = list()
+
+        for position, idx_start in enumerate((self.start_indices() if idx_starts is None else idx_starts).tolist()):
+            if idx_start in window_starts:
+                self.__walk_option_tree(option_tree, idx_start, list(), hits, position, rules, window)
+
+        hits.sort(key=lambda hit: (hit[0], hit[1]))
+        return hits
+
+    def last_wave_reach(self, n_skips: int) -> np.array:
+        """
+        Latest end of the last wave of the impulses continuing a wave, see models.kernels.last_wave_reach(). Cached
+        until bars are appended.
+
+        :param n_skips: skips 0 to n_skips - 1 of the MonoWaveTable are used
+        :return: (6, n) int64 array
+        """
+        if self.__reach is None or self.__reach[0] != n_skips:
+            self.monowave_table.ensure(n_skips)
+            self.__reach = (n_skips, last_wave_reach(self.monowave_table.ends, n_skips))
+        return self.__reach[1]
+
+    def __end_window_starts(self, options: np.array, end_window: tuple, idx_starts: np.array = None) -> tuple:
+        """
+        Bounds of the end of the last wave and the start indices which can reach them with the WaveOptions
+
+        :param options: (N, 5) values of the WaveOptions
+        :param end_window: see search_impulsive_waves()
+        :param idx_starts: start indices, start_indices() if None
+        :return: (end_min, end_max, reach, starts), end_min is 0 (no pruning) and reach empty without end_window
+        """
+        starts = self.start_indices() if idx_starts is None else idx_starts
+        if end_window is None or len(options) == 0:
+            return 0, len(self.lows), np.empty((6, 0), dtype=np.int64), starts
+
+        end_min, end_max = int(end_window[0]), int(end_window[1])
+        reach = self.last_wave_reach(int(options.max()) + 1)
+        starts = starts[(starts <= end_max) & (reach[0, starts] >= end_min)]
+        return max(end_min, 0), end_max, reach, starts
+
+    def impulsive_waves(self, idx_start: int, skips: list) -> list:
+        """
+        Builds the waves of an impulse found by search_impulsive_waves()
+
+        :param idx_start: start of wave1
+        :param skips: [i, j, k, l, m] of the WaveOptions, m may be None
+        :return: [wave1, wave2, wave3, wave4, wave5], wave5 is None if m is None
+        """
+        waves = list()
+        for (wave_cls, label), skip in zip(IMPULSE_WAVES, skips):
+            if skip is None:
+                waves.append(None)
+                continue
+            waves.append(self.get_monowave(wave_cls, idx_start, skip, label))
+            idx_start = waves[-1].idx_end
+
+        return waves
+
+    @staticmethod
+    def option_array(wave_options) -> np.array:
+        """
+        (N, 5) array of the values of a WaveOptionsGenerator or a list of WaveOptions, -1 for missing skips
+
+        :param wave_options: a WaveOptionsGenerator, a list of WaveOptions or an array, which is returned as it is
+        :return:
+        """
+        if isinstance(wave_options, np.ndarray):
+            return wave_options
+        if isinstance(wave_options, WaveOptionsGenerator):
+            return wave_options.to_array()
+        return np.array([[-1 if skip is None else skip for skip in values]
+                         for values in WaveAnalyzer.option_values(wave_options)], dtype=np.int64).reshape(-1, 5)
+
+    @staticmethod
+    def option_values(wave_options) -> list:
+        """
+        Values [i, j, k, l, m] of a WaveOptionsGenerator or a list of WaveOptions, None for missing skips
+
+        :param wave_options:
+        :return:
+        """
+        if isinstance(wave_options, WaveOptionsGenerator):
+            return [[None if skip < 0 else skip for skip in values] for values in wave_options.to_array().tolist()]
+        return [[wave_option.i, wave_option.j, wave_option.k, wave_option.l, wave_option.m]
+                for wave_option in wave_options]
+
+    @staticmethod
+    def build_option_tree(option_values: list) -> dict:
+        """
+        Builds a prefix tree of WaveOptions: {i: {j: {k: {l: {m: index of the WaveOptions in option_values}}}}}. The
+        skips of every node are sorted ascending with None (no wave5) first.
+
+        :param option_values: list of [i, j, k, l, m], see option_values()
+        :return:
+        """
+        tree = dict()
+        for option_idx, values in enumerate(option_values):
+            node = tree
+            for skip in values[:4]:
+                node = node.setdefault(skip, dict())
+            node.setdefault(values[4], option_idx)
+
+        def sort_node(node):
+            if not isinstance(node, dict):
+                return node
+            skips = sorted(node.keys(), key=lambda skip: -1 if skip is None else skip)
+            return {skip: sort_node(node[skip]) for skip in skips}
+
+        return sort_node(tree)
+
+    def __walk_option_tree(self, node: dict, idx_start: int, waves: list, hits: list, position: int, rules: list,
+                           window: tuple):
+        depth = len(waves)
+        wave_cls, label = IMPULSE_WAVES[depth]
+        end_min, end_max, reach, _ = window
+
+        for skip, child in node.items():
+            if skip is None:
+                wave = None
+                if waves[-1].idx_end < end_min:
+                    continue
+            else:
+                wave = self.get_monowave(wave_cls, idx_start, skip, label)
+                if wave.idx_end is None or wave.idx_end > end_max:
+                    # larger skips have no end either (or a later one)
+                    break
+                if end_min > 0 and reach[depth + 1, wave.idx_end] < end_min:
+                    continue
+
+            if depth == 3 and not self.wave4_is_valid(waves[1], wave):
+                continue
+
+            if depth == 4 and wave is not None and not self.wave5_is_valid(waves[3], wave):
+                continue
+
+            rules_left = self.check_stage(rules, dict(zip(WAVE_KEYS, waves + [wave])), depth + 1)
+            if rules_left == []:
+                continue
+
+            if depth == 4:
+                hits.append((child, position, waves + [wave], rules_left))
+            else:
+                self.__walk_option_tree(child, wave.idx_end, waves + [wave], hits, position, rules_left, window)
+
+    @staticmethod
+    def check_stage(rules: list, waves: dict, stage: int):
+        """
+        Checks the conditions of the rules which only need the waves up to wave[stage]
+
+        :param rules: WaveRules, may be None
+        :param waves: {'wave1': MonoWave, ...}
+        :param stage:
+        :return: the rules still fulfilled, None if rules is None
+        """
+        if rules is None:
+            return None
+
+        return [rule for rule in rules if rule.check_stage(waves, stage)]
+
+    def wave4_is_valid(self, wave2, wave4) -> bool:
+        """
+        The end of wave2 has to be the lowest low up to the end of wave4
+
+        :param wave2:
+        :param wave4:
+        :return:
+        """
+        return wave2.low_idx == wave4.low_idx or wave2.low <= self.range_index.min_low(wave2.low_idx, wave4.low_idx)
+
+    def wave5_is_valid(self, wave4, wave5) -> bool:
+        """
+        The end of wave4 has to be the lowest low up to the end of wave5
+
+        :param wave4:
+        :param wave5:
+        :return:
+        """
+        return wave4.low_idx == wave5.high_idx or wave4.low <= self.range_index.min_low(wave4.low_idx, wave5.high_idx)
+
+    def start_indices(self) -> np.array:
+        """
+        Indices of the bars flagged in minimum (the column Minimum of the dataframe or the local minimums of the
+        window), used as start of the impulsive waves. Cached until bars are appended.
+
+        :return:
+        """
+        if self.__starts is None:
+            self.__starts = np.flatnonzero(self.minimum)
+        return self.__starts
+
+    def add_starts(self, idx_starts: np.array):
+        """
+        Flags more bars as start of the impulsive waves, e.g. the ends of corrections. The next compiled search with
+        the same WaveOptions and rules only searches the new starts, see search_impulsive_waves().
+
+        :param idx_starts:
+        :return:
+        """
+        minimum = np.array(self.minimum, dtype=bool)
+        minimum[idx_starts] = True
+        self.minimum = minimum
+        self.__starts = None
+
+    def extrema(self, *windows: int) -> list:
+        """
+        Indices of the both-sided local minimums of the lows and local maximums of the highs, see
+        functions.local_extrema(). All windows which are not cached yet are computed in one pass.
+
+        :param windows: window sizes
+        :return: list of (minimum indices, maximum indices), one per window
+        """
+        missing = sorted(set(windows) - set(self.__extrema))
+        if missing:
+            minimums, maximums = local_extrema(self.lows, self.highs, np.array(missing, dtype=np.int64))
+            for window, window_minimums, window_maximums in zip(missing, minimums, maximums):
+                self.__extrema[window] = (np.flatnonzero(window_minimums), np.flatnonzero(window_maximums))
+
+        return [self.__extrema[window] for window in windows]
+
+    def local_minimums(self, window: int) -> np.array:
+        """
+        Boolean flags of the local minimums of the window, see extrema()
+
+        :param window:
+        :return:
+        """
+        minimum = np.zeros(len(self.lows), dtype=bool)
+        minimum[self.extrema(window)[0][0]] = True
+        return minimum
+
     def find_corrective_wave(self,
                              idx_start: int,
                              wave_config: list = None):
@@ -132,39 +849,112 @@ class WaveAnalyzer:
         if wave_config is None:
             wave_config = [0, 0, 0]
 
-        waveA = MonoWaveDown(lows=self.lows, highs=self.highs, dates=self.dates, idx_start=idx_start, skip=wave_config[0])
-        waveA.label = 'A'
+        waveA = self.get_monowave(MonoWaveDown, idx_start, wave_config[0], 'A')
         waveA_end = waveA.idx_end
         if waveA_end is None:
             return False
 
-        waveB = MonoWaveUp(lows=self.lows, highs=self.highs, dates=self.dates, idx_start=waveA_end, skip=wave_config[1])
-        waveB.label = 'B'
+        waveB = self.get_monowave(MonoWaveUp, waveA_end, wave_config[1], 'B')
         waveB_end = waveB.idx_end
         if waveB_end is None:
             return False
 
-        waveC = MonoWaveDown(lows=self.lows, highs=self.highs, dates=self.dates, idx_start=waveB_end, skip=wave_config[2])
-        waveC.label = 'C'
+        waveC = self.get_monowave(MonoWaveDown, waveB_end, wave_config[2], 'C')
         waveC_end = waveC.idx_end
         if waveC_end is None:
             return False
 
         return [waveA, waveB, waveC]
 
+    def corrective_waves(self, idx_start: int, wave_options=None, rules: list = None) -> list:
+        """
+        All corrections (ABC: down, up, down) starting at idx_start, the same as calling find_corrective_wave() and
+        checking the rules for each of the WaveOptions. The WaveOptions are walked as a prefix tree (waveA and waveB
+        are built once for all WaveOptions sharing them) and the result is memoized per start index, so e.g. all
+        impulses ending at the same bar share one search (see next_cycle()). The memo holds an entry per start index,
+        WaveOptions and rules (by class and name) searched and grows until append() clears it.
+
+        :param idx_start: start of waveA, e.g. the end of an impulse
+        :param wave_options: a WaveOptionsGenerator3 or a list of WaveOptions, the WaveOptionsGenerator3 of
+            set_combinatorial_limits() if None
+        :param rules: optional WaveRules, e.g. [Correction('correction')], only waves fulfilling at least one of them
+            are returned
+        :return: list of (WaveOptions, [waveA, waveB, waveC]) ordered by wave_options
+        """
+        wave_options = self.__waveoptions_down if wave_options is None else wave_options
+        options = self.option_array(wave_options)[:, :3]
+        if len(options):
+            self.monowave_table.ensure(min(int(options.max()) + 1, MAX_UP_TO))
+        key = (int(idx_start), hash(options.tobytes()), options.shape,
+               tuple((type(rule), rule.name) for rule in rules or ()))
+        corrections = self.__corrections.get(key)
+        if corrections is not None:
+            return corrections
+
+        option_tree = dict()
+        for option_idx, (i, j, k) in enumerate(options.tolist()):
+            option_tree.setdefault(i, dict()).setdefault(j, dict()).setdefault(k, option_idx)
+
+        hits = list()
+        for i, node_i in sorted(option_tree.items()):
+            wave_a = self.get_monowave(MonoWaveDown, idx_start, i, 'A')
+            if wave_a.idx_end is None:
+                # larger skips have no end either
+                break
+            rules_a = self.check_stage(rules, {'wave1': wave_a}, 1)
+            if rules_a == []:
+                continue
+
+            for j, node_j in sorted(node_i.items()):
+                wave_b = self.get_monowave(MonoWaveUp, wave_a.idx_end, j, 'B')
+                if wave_b.idx_end is None:
+                    break
+                rules_b = self.check_stage(rules_a, {'wave1': wave_a, 'wave2': wave_b}, 2)
+                if rules_b == []:
+                    continue
+
+                for k, option_idx in sorted(node_j.items()):
+                    wave_c = self.get_monowave(MonoWaveDown, wave_b.idx_end, k, 'C')
+                    if wave_c.idx_end is None:
+                        break
+                    if self.check_stage(rules_b, {'wave1': wave_a, 'wave2': wave_b, 'wave3': wave_c}, 3) != []:
+                        hits.append((option_idx, [wave_a, wave_b, wave_c]))
+
+        hits.sort(key=lambda hit: hit[0])
+        if isinstance(wave_options, WaveOptionsGenerator):
+            corrections = [(WaveOptions(*options[option_idx].tolist()), waves) for option_idx, waves in hits]
+        else:
+            corrections = [(wave_options[option_idx], waves) for option_idx, waves in hits]
+
+        self.__corrections[key] = corrections
+        return corrections
+
+    def find_corrective_waves(self, idx_starts: np.array = None, wave_options=None, rules: list = None) -> list:
+        """
+        corrective_waves() for many start indices
+
+        :param idx_starts: start indices of waveA, the local maximums of self.window (see extrema()) if None
+        :param wave_options: see corrective_waves()
+        :param rules:
+        :return: list of (WaveOptions, [waveA, waveB, waveC]) ordered by start index and wave_options
+        """
+        if idx_starts is None:
+            idx_starts = self.extrema(self.window)[0][1]
+
+        return [hit for idx_start in np.unique(idx_starts).tolist()
+                for hit in self.corrective_waves(idx_start, wave_options, rules)]
+
     def find_td_wave(self, idx_start: int, wave_config: list = None):
         if wave_config is None:
             wave_config = [0, 0]
 
-        wave1 = MonoWaveUp(self.df, idx_start=idx_start, skip=wave_config[0])
-        wave1.label = '1'
+        wave1 = self.get_monowave(MonoWaveUp, idx_start, wave_config[0], '1')
         wave1_end = wave1.idx_end
         if wave1_end is None:
             if self.verbose: print("Wave 1 has no End in Data")
             return False
 
-        wave2 = MonoWaveDown(self.df, idx_start=wave1_end, skip=wave_config[1])
-        wave2.label = '2'
+        wave2 = self.get_monowave(MonoWaveDown, wave1_end, wave_config[1], '2')
         wave2_end = wave2.idx_end
         if wave2_end is None:
             if self.verbose: print("Wave 2 has no End in Data")
@@ -173,41 +963,42 @@ class WaveAnalyzer:
         return [wave1, wave2]
 
     def next_cycle(self,
-                   start_idx: int):
+                   start_idx: int = None,
+                   wave_options_up=None,
+                   wave_options_down=None):
+        """
+        Finds full cycles: an impulse (12345) followed by a correction (ABC) starting at its end
+
+        The impulses of all WaveOptions are found with one compiled search, the corrections of every end index are
+        searched once (see corrective_waves()), however many impulses end there.
 
+        :param start_idx: start of wave1 (any bar, not only a local minimum), all start_indices() if None
+        :param wave_options_up: WaveOptions of the impulses, the WaveOptionsGenerator5 of set_combinatorial_limits() if
+            None
+        :param wave_options_down: WaveOptions of the corrections, the WaveOptionsGenerator3 of
+            set_combinatorial_limits() if None
+        :return: generator of WaveCycles, ordered by the WaveOptions of the impulse and of the correction
+        """
         impulse = Impulse('impulse')
         correction = Correction('correction')
+        wave_options_up = self.__waveoptions_up if wave_options_up is None else wave_options_up
 
         wave_cycles = set()
 
-        for new_option_impulse in self.__waveoptions_up.options_sorted:
-
-            cycle_complete = False
-            waves_up = self.find_5_impulsive_waves(idx_start=start_idx,
-                                                   wave_config=new_option_impulse.values)
+        idx_starts = None if start_idx is None else [start_idx]
+        for new_option_impulse, waves_up in self.find_impulsive_waves(wave_options_up, [impulse], compiled=True,
+                                                                      unique=True, idx_starts=idx_starts):
+            wavepattern_up = WavePattern(waves_up, verbose=False)
+            if self.verbose: print('Impulse found!', new_option_impulse.values)
 
-            if waves_up:
-                wavepattern_up = WavePattern(waves_up, verbose=False)
-                if wavepattern_up.check_rule(impulse):
-                    if self.verbose: ('Impulse found!', new_option_impulse.values)
-                    end = waves_up[4].idx_end
-
-                    for new_option_correction in self.__waveoptions_down.options_sorted:
-                        waves = self.find_corrective_wave(idx_start=end, wave_config=new_option_correction.values)
-                        if waves:
-                            wavepattern = WavePattern(waves, verbose=False)
-                            if wavepattern.check_rule(correction):
-
-                                cycle_complete = True
-                                wave_cycle = WaveCycle(wavepattern_up, wavepattern)
-                                wave_cycles.add(wave_cycle)
-
-                                # if wave_cycle not in wave_cycles:
-                                if self.verbose and wave_cycle not in wave_cycles:
-                                    print('Corrrection found!', new_option_correction.values)
-                                    print('*' * 40)
-
-                    if cycle_complete:
-                        yield wave_cycle
+            for new_option_correction, waves in self.corrective_waves(wavepattern_up.idx_end, wave_options_down,
+                                                                      [correction]):
+                wave_cycle = WaveCycle(wavepattern_up, WavePattern(waves, verbose=False))
+                if wave_cycle in wave_cycles:
+                    continue
 
-        return None
+                wave_cycles.add(wave_cycle)
+                if self.verbose:
+                    print('Correction found!', new_option_correction.values)
+                    print('*' * 40)
+                yield wave_cycle
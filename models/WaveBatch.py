@@ -0,0 +1,176 @@
+from __future__ import annotations
+from models.WaveRules import WaveRule
+import numpy as np
+
+
+class WaveColumns:
+    """
+    One wave (e.g. wave1) of all candidates of a WaveBatch. Has the attributes of a MonoWave used in the conditions of
+    the WaveRules (low, high, idx_start, idx_end, length, duration) as arrays, plus the mask exists. The values of
+    not existing waves are nan / -1.
+    """
+    __slots__ = ('low', 'high', 'idx_start', 'idx_end', 'exists')
+
+    def __init__(self, low: np.array, high: np.array, idx_start: np.array, idx_end: np.array, exists: np.array):
+        self.low = low
+        self.high = high
+        self.idx_start = idx_start
+        self.idx_end = idx_end
+        self.exists = exists
+
+    @property
+    def length(self) -> np.array:
+        return np.abs(self.high - self.low)
+
+    @property
+    def duration(self) -> np.array:
+        return self.idx_end - self.idx_start
+
+
+class WaveRow:
+    """
+    Scalar view on one wave of one candidate of a WaveBatch, used for conditions which cannot be evaluated on arrays
+    """
+    __slots__ = ('low', 'high', 'idx_start', 'idx_end')
+
+    def __init__(self, low: float, high: float, idx_start: int, idx_end: int):
+        self.low = low
+        self.high = high
+        self.idx_start = idx_start
+        self.idx_end = idx_end
+
+    @property
+    def length(self) -> float:
+        return abs(self.high - self.low)
+
+    @property
+    def duration(self) -> int:
+        return self.idx_end - self.idx_start
+
+
+class WaveBatch:
+    """
+    Geometry of N candidate WavePatterns (e.g. 5 waves of an impulse) stored as arrays, to check WaveRules for all
+    candidates at once.
+
+    Every condition of a WaveRule is evaluated on the whole batch: with its 'vectorized' function if the condition has
+    one, otherwise its 'function' is called with the WaveColumns of the waves. Conditions which cannot handle arrays
+    (e.g. using `and` / `not`) and candidates with missing waves fall back to one call per candidate with scalar waves
+    (None for missing waves).
+    """
+    def __init__(self,
+                 lows: np.array,
+                 highs: np.array,
+                 idx_start: np.array,
+                 idx_end: np.array,
+                 exists: np.array = None):
+        """
+
+        :param lows: (N, n_waves) low of every wave
+        :param highs: (N, n_waves) high of every wave
+        :param idx_start: (N, n_waves) start index of every wave
+        :param idx_end: (N, n_waves) end index of every wave
+        :param exists: (N, n_waves) False for missing waves, e.g. wave5 of WaveOptions [i, j, k, l, None]
+        """
+        self.lows = np.asarray(lows, dtype=float)
+        self.highs = np.asarray(highs, dtype=float)
+        self.idx_start = np.asarray(idx_start, dtype=np.int64)
+        self.idx_end = np.asarray(idx_end, dtype=np.int64)
+        self.exists = np.ones(self.lows.shape, dtype=bool) if exists is None else np.asarray(exists, dtype=bool)
+
+        self.waves = {f'wave{i + 1}': WaveColumns(self.lows[:, i],
+                                                  self.highs[:, i],
+                                                  self.idx_start[:, i],
+                                                  self.idx_end[:, i],
+                                                  self.exists[:, i]) for i in range(self.lows.shape[1])}
+
+    def __len__(self):
+        return self.lows.shape[0]
+
+    @classmethod
+    def from_waves(cls, all_waves: list):
+        """
+        Builds a WaveBatch from lists of MonoWaves, e.g. the result of WaveAnalyzer.find_5_impulsive_waves()
+
+        :param all_waves: list of lists of MonoWaves (or None for missing waves)
+        :return:
+        """
+        n_waves = max((len(waves) for waves in all_waves), default=5)
+        shape = (len(all_waves), n_waves)
+        lows, highs = np.full(shape, np.nan), np.full(shape, np.nan)
+        idx_start, idx_end = np.full(shape, -1, dtype=np.int64), np.full(shape, -1, dtype=np.int64)
+        exists = np.zeros(shape, dtype=bool)
+
+        for row, waves in enumerate(all_waves):
+            for col, wave in enumerate(waves):
+                if wave is None:
+                    continue
+                lows[row, col], highs[row, col] = wave.low, wave.high
+                idx_start[row, col], idx_end[row, col] = wave.idx_start, wave.idx_end
+                exists[row, col] = True
+
+        return cls(lows, highs, idx_start, idx_end, exists)
+
+    def row(self, row: int) -> dict:
+        """
+        Scalar waves of one candidate, None for missing waves
+
+        :param row:
+        :return:
+        """
+        return {key: WaveRow(self.lows[row, col], self.highs[row, col], self.idx_start[row, col],
+                             self.idx_end[row, col]) if self.exists[row, col] else None
+                for col, key in enumerate(self.waves.keys())}
+
+    def check_condition(self, conditions: dict) -> np.array:
+        """
+        Evaluates one condition of a WaveRule for all candidates
+
+        :param conditions: e.g. {'waves': ['wave1', 'wave2'], 'function': ..., 'message': ...}
+        :return: boolean array, True if the condition is fulfilled
+        """
+        vectorized = conditions.get('vectorized')
+        function = conditions.get('function')
+        waves = [self.waves.get(wave) for wave in conditions.get('waves')]
+
+        if vectorized is not None:
+            return np.broadcast_to(np.asarray(vectorized(*waves), dtype=bool), (len(self),))
+
+        # candidates with missing waves are passed as None to the function, which has to be done one by one
+        scalar_rows = np.flatnonzero(~np.logical_and.reduce([wave.exists for wave in waves]))
+        try:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result = np.broadcast_to(np.asarray(function(*waves), dtype=bool), (len(self),)).copy()
+        except (ValueError, TypeError, AttributeError):
+            scalar_rows = range(len(self))
+            result = np.empty(len(self), dtype=bool)
+
+        for row in scalar_rows:
+            row_waves = self.row(row)
+            result[row] = function(*[row_waves.get(wave) for wave in conditions.get('waves')])
+        return result
+
+    def check_rule(self, waverule: WaveRule):
+        """
+        Checks the WaveRule for all candidates
+
+        :param waverule:
+        :return: mask (True if all conditions are fulfilled) and the index of the first failing condition in
+            list(waverule.conditions) for each candidate, -1 if the candidate fulfills the WaveRule
+        """
+        first_failure = np.full(len(self), -1, dtype=np.int64)
+
+        for i, conditions in enumerate(waverule.conditions.values()):
+            failed = ~self.check_condition(conditions) & (first_failure == -1)
+            first_failure[failed] = i
+
+        return first_failure == -1, first_failure
+
+    def check_rules(self, waverules: list) -> dict:
+        """
+        Checks several WaveRules for all candidates
+
+        :param waverules:
+        :return: {waverule.name: (mask, first_failure)}, see check_rule()
+        """
+        return {waverule.name: self.check_rule(waverule) for waverule in waverules}
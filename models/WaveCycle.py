@@ -13,11 +13,11 @@ class WaveCycle:
 
     @property
     def end_idx(self):
-        return self.wp_down.end_idx
+        return self.wp_down.idx_end
 
     @property
     def start_idx(self):
-        return self.wp_up.start_idx
+        return self.wp_up.idx_start
 
     def extract_waves(self):
         for key, wave in self.wp_up.waves.items():
@@ -58,11 +58,8 @@ class WaveCycle:
     #     return cls(wave_pattern_up, wave_pattern_down)
 
     def __eq__(self, other):
-        if self.wp_down.values == other.wp_down.values and self.wp_up.values == other.wp_up.values:
-            return True
-        else:
-            return False
+        return isinstance(other, WaveCycle) and self.wp_up.key == other.wp_up.key and \
+            self.wp_down.key == other.wp_down.key
 
     def __hash__(self):
-        str_to_hash = f'{self.wp_up.values}_{self.wp_down.values}'
-        return hash(str_to_hash)
+        return hash((self.wp_up.key, self.wp_down.key))
@@ -1,4 +1,8 @@
 from abc import ABC, abstractmethod
+import numpy as np
+
+MAX_UP_TO = np.iinfo(np.int8).max + 1  # the skips 0 to up_to - 1 of a WaveOptionsGenerator fit into int8
+
 
 class WaveOptions:
     """
@@ -90,9 +94,19 @@ class WaveOptions:
 
 
 class WaveOptionsGenerator(ABC):
+    """
+    Generates the canonical WaveOptions, i.e. no duplicates and no skips after a 0, e.g. [1,2,0,4,5] is not generated as
+    it is the same as [1,2,0,0,0].
+
+    The WaveOptions are built as an (N, n_waves) int8 array already sorted from small to large values (-1 denotes
+    None) and WaveOptions objects are only created while iterating over the generator, so skips go up to 127.
+    """
     def __init__(self, up_to: int):
+        if up_to > MAX_UP_TO:
+            raise ValueError(f'up_to must not exceed {MAX_UP_TO} (skips are int8), got {up_to}.')
         self.__up_to = up_to
-        self.options = self.populate()
+        self.__array = None
+        self.__options = None
 
     @property
     def up_to(self):
@@ -100,22 +114,79 @@ class WaveOptionsGenerator(ABC):
 
     @property
     def number(self):
-        return len(self.options)
+        return len(self.to_array())
 
     @abstractmethod
-    def populate(self) -> set:
+    def populate(self) -> np.array:
+        """
+        Builds the array of all WaveOptions values, sorted from small to large values. -1 denotes None.
+
+        :return:
+        """
         pass
 
+    def to_array(self) -> np.array:
+        """
+        All WaveOptions as (N, n_waves) int8 array in the order of options_sorted. -1 denotes None (e.g. for m of a
+        4-wave option)
+
+        :return:
+        """
+        if self.__array is None:
+            self.__array = self.populate()
+            self.__array.setflags(write=False)
+        return self.__array
+
+    def __iter__(self):
+        """
+        Yields the WaveOptions lazily in the order of options_sorted
+
+        :return:
+        """
+        for values in self.to_array().tolist():
+            yield WaveOptions(*[None if value < 0 else value for value in values])
+
+    def __len__(self):
+        return self.number
+
+    @property
+    def options(self) -> set:
+        if self.__options is None:
+            self.__options = set(self)
+        return self.__options
+
     @property
     def options_sorted(self):
         """
         Will sort from small to large values [0,0,0,0,0] -> [n, n, n, n, n]
         :return:
         """
-        all_options = list(self.options)
-        all_options_5 = sorted([k for k in all_options if k.m is not None])
-        all_options_4 = ([k for k in all_options if k.m is None])
-        return all_options_5 + all_options_4
+        return list(self)
+
+
+def cascade(first: np.array, rest: np.array, n_waves: int) -> np.array:
+    """
+    Builds all WaveOptions values with first[.] as first value and rest[.] for all following values, where all values
+    after a 0 are 0 as well. Sorted from small to large values if first and rest are sorted.
+
+    :param first: values for the first wave
+    :param rest: values for all following waves
+    :param n_waves:
+    :return: (N, n_waves) int8 array
+    """
+    first = np.asarray(first, dtype=np.int8)
+    if n_waves == 1:
+        return first.reshape(-1, 1)
+
+    tail = cascade(rest, rest, n_waves - 1)
+    zeros = np.zeros((1, n_waves - 1), dtype=np.int8)
+
+    blocks = list()
+    for value in first:
+        block = zeros if value == 0 else tail
+        blocks.append(np.hstack([np.full((len(block), 1), value, dtype=np.int8), block]))
+
+    return np.vstack(blocks) if blocks else np.empty((0, n_waves), dtype=np.int8)
 
 
 class WaveOptionsGenerator5(WaveOptionsGenerator):
@@ -123,93 +194,55 @@ class WaveOptionsGenerator5(WaveOptionsGenerator):
     WaveOptionsGenerator for impulsive 12345 movements
 
     """
-    def populate(self) -> set:
-        checked = set()
+    def populate(self) -> np.array:
+        values = np.arange(self.up_to)
+        return cascade(values, values, 5)
 
-        for i in range(0, self.up_to):
-            for j in range(0, self.up_to):
-                for k in range(0, self.up_to):
-                    for l in range(0, self.up_to):
-                        for m in range(0, self.up_to):
-
-                            if i == 0:
-                                j = k = l = m = 0
-                            if j == 0:
-                                k = l = m = 0
-                            if k == 0:
-                                l = m = 0
-                            if l == 0:
-                                m = 0
-                            wave_options = WaveOptions(i, j, k, l, m)
-                            checked.add(wave_options)
-        return checked
 
 class WaveOptionsGeneratorWithRange(WaveOptionsGenerator):
     """
-    WaveOptionsGenerator for impulsive N movements
+    WaveOptionsGenerator for impulsive N movements, where the skips of the waves 2 to 5 are in range +/- with_range of
+    the skip of wave 1. Contains the 5-wave options, followed by the 4-wave options [i, j, k, l, None].
 
     """
     def __init__(self, up_to: int, with_range: int):
-        self.__up_to = up_to
+        super().__init__(up_to)
         self.__range = with_range
-        self.options = self.populate()
 
-    def populate(self) -> set:
-        checked = set()
+    def populate(self) -> np.array:
+        options_5 = list()
+        options_4 = list()
 
-        for i in range(0, self.__up_to):
+        for i in range(0, self.up_to):
             start_from = i - self.__range if i - self.__range >= 0 else 0
-            up_to = i + self.__range if i + self.__range < self.__up_to else self.__up_to
-            for j in range(start_from, up_to):
-                for k in range(start_from, up_to):
-                    for l in range(start_from, up_to):
-                        for m in range(start_from, up_to):
-                            if i == 0:
-                                j = k = l = m = 0
-                            if j == 0:
-                                k = l = m = 0
-                            if k == 0:
-                                l = m = 0
-                            if l == 0:
-                                m = 0
-                            wave_options = WaveOptions(i, j, k, l, m)
-                            checked.add(wave_options)
-                        wave_options = WaveOptions(i, j, k, l)
-                        checked.add(wave_options)
-        return checked
+            up_to = i + self.__range if i + self.__range < self.up_to else self.up_to
+            values = np.arange(start_from, up_to)
+            if len(values) == 0:
+                continue
+
+            options_5.append(cascade([i], values, 5))
+            options_4.append(cascade([i], values, 4))
+
+        options_5 = np.vstack(options_5) if options_5 else np.empty((0, 5), dtype=np.int8)
+        options_4 = np.vstack(options_4) if options_4 else np.empty((0, 4), dtype=np.int8)
+        options_4 = np.hstack([options_4, np.full((len(options_4), 1), -1, dtype=np.int8)])
+
+        return np.vstack([options_5, options_4])
+
 
 class WaveOptionsGenerator2(WaveOptionsGenerator):
     """
     WaveOptions for 12 Waves
     """
-    def populate(self) -> set:
-        checked = list
-
-        for i in range(0, self.up_to):
-            for j in range(0, self.up_to):
-                if i == 0:
-                    j = 0
-
-                wave_options = WaveOptions(i, j, None, None, None)
-                checked.append(wave_options)
-        return checked
+    def populate(self) -> np.array:
+        values = np.arange(self.up_to)
+        return cascade(values, values, 2)
 
 
 class WaveOptionsGenerator3(WaveOptionsGenerator):
     """
     WaveOptions for corrective (ABC) like movements
     """
-    def populate(self) -> set:
-        checked = set()
-
-        for i in range(0, self.up_to):
-            for j in range(0, self.up_to):
-                for k in range(0, self.up_to):
-                    if i == 0:
-                        j = k = 0
-                    if j == 0:
-                        k = 0
-
-                    wave_options = WaveOptions(i, j, k, None, None)
-                    checked.add(wave_options)
-        return checked
+    def populate(self) -> np.array:
+        values = np.arange(self.up_to)
+        return cascade(values, values, 3)
@@ -22,6 +22,10 @@ class WavePattern:
 
         self.waves = __waves_dict
 
+        # canonical key: the boundary indices of the waves, None for missing waves (e.g. wave5 of [i, j, k, l, None]),
+        # see WaveAnalyzer.waves_key()
+        self.key = (waves[0].idx_start, ) + tuple(None if wave is None else wave.idx_end for wave in waves)
+
     def check_rule(self, waverule: WaveRule) -> bool:
         """
         Checks if WaveRule is valid for the WavePattern
@@ -136,11 +140,7 @@ class WavePattern:
         return labels
 
     def __eq__(self, other):
-        if all([self.waves[key].low == other.waves[key].low and self.waves[key].high == other.waves[key].high for key, value in self.waves.items() if other.waves[key] is not None and self.waves[key] is not None]):
-            return True
-        else:
-            return False
+        return isinstance(other, WavePattern) and self.key == other.key
 
     def __hash__(self):
-        hash_str = f'{self.low}{self.high}'
-        return hash(hash_str)
+        return hash(self.key)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+import numpy as np
 
 
 class WaveRule(ABC):
@@ -9,11 +10,40 @@ class WaveRule(ABC):
     def __init__(self, name: str):
         self.name = name
         self.conditions = self.set_conditions()
+        self.stages = self.set_stages()
 
     @abstractmethod
     def set_conditions(self):
         pass
 
+    def set_stages(self) -> dict:
+        """
+        Groups the conditions by the highest wave they need, e.g. {2: [conditions on wave1 and wave2], 3: [...], ...},
+        so they can be checked as soon as these waves are built.
+
+        :return:
+        """
+        stages = dict()
+        for conditions in self.conditions.values():
+            stage = max(int(wave[len('wave'):]) for wave in conditions.get('waves'))
+            stages.setdefault(stage, list()).append(conditions)
+
+        return stages
+
+    def check_stage(self, waves: dict, stage: int) -> bool:
+        """
+        Checks the conditions needing waves up to wave[stage], e.g. stage 2 only needs wave1 and wave2
+
+        :param waves: {'wave1': MonoWave, 'wave2': ...}, may contain None for a missing wave
+        :param stage:
+        :return: True if all conditions of the stage are fulfilled
+        """
+        for conditions in self.stages.get(stage, ()):
+            if not conditions.get('function')(*[waves.get(wave) for wave in conditions.get('waves')]):
+                return False
+
+        return True
+
     def __repr__(self):
         return str(self.conditions)
 
@@ -50,6 +80,9 @@ class Impulse(WaveRule):
                 "function": lambda wave1, wave3, wave5: not (
                     (wave5 is None and wave3.length < wave1.length) or (wave5 is not None and wave3.length < wave5.length and wave3.length < wave1.length)
                 ),
+                "vectorized": lambda wave1, wave3, wave5: ~(
+                    (~wave5.exists & (wave3.length < wave1.length)) | (wave5.exists & (wave3.length < wave5.length) & (wave3.length < wave1.length))
+                ),
                 "message": "Wave3 is the shortest Wave.",
             },
             "w3_2": {
@@ -87,11 +120,13 @@ class Impulse(WaveRule):
             "w5_1": {
                 "waves": ["wave3", "wave5"],
                 "function": lambda wave3, wave5: wave5 is None or wave3.high < wave5.high,
+                "vectorized": lambda wave3, wave5: ~wave5.exists | (wave3.high < wave5.high),
                 "message": "End of Wave5 is lower than End of Wave3",
             },
             "w5_2": {
                 "waves": ["wave1", "wave5"],
                 "function": lambda wave1, wave5: wave5 is None or wave5.length < 2.0 * wave1.length,
+                "vectorized": lambda wave1, wave5: ~wave5.exists | (wave5.length < 2.0 * wave1.length),
                 "message": "Wave5 is longer (value wise) than Wave1",
             },
         }
@@ -209,6 +244,12 @@ class LeadingDiagonal(WaveRule):
                 > self.slope(wave1.idx_end, wave3.idx_end, wave1.high, wave3.high)
                 and self.slope(wave1.idx_end, wave3.idx_end, wave1.high, wave3.high)
                 > 0,
+                "vectorized": lambda wave1, wave2, wave3, wave4: (self.slopes(
+                    wave2.idx_end, wave4.idx_end, wave2.low, wave4.low
+                )
+                > self.slopes(wave1.idx_end, wave3.idx_end, wave1.high, wave3.high))
+                & (self.slopes(wave1.idx_end, wave3.idx_end, wave1.high, wave3.high)
+                > 0),
                 "message": "Trend lines of Wave1-3 and Wave2-4 not forming Leading Diagonal.",
             },
             "w2_1": {
@@ -232,6 +273,9 @@ class LeadingDiagonal(WaveRule):
                 "function": lambda wave1, wave3, wave5: not (
                     (wave5 is None and wave3.length < wave1.length) or (wave5 is not None and wave3.length < wave5.length and wave3.length < wave1.length)
                 ),
+                "vectorized": lambda wave1, wave3, wave5: ~(
+                    (~wave5.exists & (wave3.length < wave1.length)) | (wave5.exists & (wave3.length < wave5.length) & (wave3.length < wave1.length))
+                ),
                 "message": "Wave3 is the shortest Wave.",
             },
             "w3_2": {
@@ -269,21 +313,25 @@ class LeadingDiagonal(WaveRule):
             "w5_1": {
                 "waves": ["wave3", "wave5"],
                 "function": lambda wave3, wave5: wave5 is None or wave3.high < wave5.high,
+                "vectorized": lambda wave3, wave5: ~wave5.exists | (wave3.high < wave5.high),
                 "message": "End of Wave5 is lower than End of Wave3",
             },
             "w5_2": {
                 "waves": ["wave1", "wave5"],
                 "function": lambda wave1, wave5: wave5 is None or wave5.length < 2.0 * wave1.length,
+                "vectorized": lambda wave1, wave5: ~wave5.exists | (wave5.length < 2.0 * wave1.length),
                 "message": "Wave5 is longer (value wise) than 2.0 x Wave1",
             },
             "w5_3": {
                 "waves": ["wave1", "wave5"],
                 "function": lambda wave1, wave5: wave5 is None or wave5.length > 0.70 * wave1.length,
+                "vectorized": lambda wave1, wave5: ~wave5.exists | (wave5.length > 0.70 * wave1.length),
                 "message": "Wave5 is shorter (value wise) than 0.70 x Wave1",
             },
             "w5_4": {
                 "waves": ["wave3", "wave5"],
                 "function": lambda wave3, wave5: wave5 is None or wave5.length < wave3.length,
+                "vectorized": lambda wave3, wave5: ~wave5.exists | (wave5.length < wave3.length),
                 "message": "Wave5 is not shorter (value wise) than Wave3",
             },
         }
@@ -316,3 +364,19 @@ class LeadingDiagonal(WaveRule):
         delta_y = y2 - y1
 
         return delta_y / delta_x if delta_x != 0 else 0
+
+    def slopes(self, x1: np.array, x2: np.array, y1: np.array, y2: np.array) -> np.array:
+        """
+        slope() for arrays of data points
+
+        :param x1:
+        :param x2:
+        :param y1:
+        :param y2:
+        :return:
+        """
+        delta_x = x2 - x1
+        delta_y = y2 - y1
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(delta_x != 0, delta_y / delta_x, 0.0)
@@ -1,4 +1,5 @@
 from typing import List
+import numpy as np
 from models.WaveAnalyzer import MonoWaveUp
 
 class WaveScore:
@@ -29,3 +30,25 @@ class WaveScore:
             score = (score_wave2 + score_wave3 + score_wave4 + score_wave5) / 4
 
         return score
+
+    @staticmethod
+    def values(lengths: np.array) -> np.array:
+        """
+        value() of many candidates at once
+
+        :param lengths: (N, 5) lengths of wave1 to wave5, nan if there is no wave5, e.g. WaveAnalyzer.wave_lengths()
+        :return: (N, ) proportion scores
+        """
+        lengths = np.asarray(lengths, dtype=float)
+        wave1, wave2, wave3, wave4, wave5 = lengths.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.stack([wave2 / (0.618 * wave1),
+                               wave3 / (1.618 * wave1 / wave3),
+                               wave4 / (0.382 * wave3),
+                               wave5 / wave1])
+            scores = np.where(scores > 1, 1 / scores, scores)
+
+        has_wave5 = ~np.isnan(wave5)
+        return np.where(has_wave5,
+                        (scores[0] + scores[1] + scores[2] + np.where(has_wave5, scores[3], 0)) / 4,
+                        (scores[0] + scores[1] + scores[2]) / 3)
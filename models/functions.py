@@ -1,6 +1,39 @@
 from numba import njit
 import numpy as np
 
+NO_END = -1  # sentinel index: the wave has no end in the data
+NO_IDX = -2  # sentinel index: the scan stopped without a new extreme
+
+
+PRICE_DTYPES = (np.float64, np.float32)
+
+
+def as_array(values, dtypes: tuple = None) -> np.array:
+    """
+    values as a contiguous NumPy array, without a copy if possible: NumPy arrays and np.memmaps are used as they are,
+    pandas Series and pyarrow arrays (without nulls, in a single chunk) are viewed. A copy is only made for values which
+    are not contiguous, have another dtype than dtypes or consist of several Arrow chunks.
+
+    :param values: np.array, np.memmap, pd.Series, pyarrow.Array / ChunkedArray or a sequence
+    :param dtypes: allowed dtypes (e.g. PRICE_DTYPES), values of other dtypes are converted to the first one. Any dtype
+        if None.
+    :return:
+    """
+    if type(values).__module__.split('.')[0] == 'pyarrow':
+        if hasattr(values, 'num_chunks'):
+            values = values.chunk(0) if values.num_chunks == 1 else values.combine_chunks()
+        try:
+            values = values.to_numpy(zero_copy_only=True)
+        except Exception:
+            values = values.to_numpy(zero_copy_only=False)
+    elif not isinstance(values, np.ndarray):
+        values = values.to_numpy() if hasattr(values, 'to_numpy') else np.asarray(values)
+
+    if dtypes is not None and values.dtype not in dtypes:
+        values = values.astype(dtypes[0])
+    return np.ascontiguousarray(values)
+
+
 @njit
 def hi(lows_arr: np.array, highs_arr: np.array, idx_start: int = 0):
     """
@@ -32,9 +65,25 @@ def next_hi(lows_arr: np.array, highs_arr: np.array, idx_start: int = 0, prev_hi
     :param prev_high:
     :return:
     """
+    high, high_idx = _next_hi(lows_arr, highs_arr, idx_start, prev_high)
+
+    if high_idx == NO_END:
+        return None, None
+    elif high_idx == NO_IDX:
+        return high, None
+
+    return high, high_idx
+
+@njit
+def _next_hi(lows_arr: np.array, highs_arr: np.array, idx_start: int, prev_high: float):
+    """
+    next_hi() with integer sentinels instead of None, so it can be used in loops of other compiled functions
 
+    :return: high, high_idx. high_idx is NO_END if there is no next high in the data and NO_IDX if the scan stopped
+        before a new high was found
+    """
     high = lows_arr[idx_start]
-    high_idx = None
+    high_idx = NO_IDX
 
     prev_high_reached = False
     for idx in range(idx_start + 1, len(highs_arr)):
@@ -56,11 +105,26 @@ def next_hi(lows_arr: np.array, highs_arr: np.array, idx_start: int = 0, prev_hi
         else:
             return high, high_idx
 
-    return None, None
+    return high, NO_END
 
 @njit
 def next_lo(lows_arr: np.array, highs_arr: np.array, idx_start: int, prev_low: float):
+    low, low_idx = _next_lo(lows_arr, highs_arr, idx_start, prev_low)
+
+    if low_idx == NO_END:
+        return None, None
+    elif low_idx == NO_IDX:
+        return low, None
+
+    return low, low_idx
+
+@njit
+def _next_lo(lows_arr: np.array, highs_arr: np.array, idx_start: int, prev_low: float):
+    """
+    next_lo() with integer sentinels instead of None, see _next_hi()
+    """
     low = highs_arr[idx_start]
+    low_idx = NO_IDX
     prev_low_reached = False
 
     for idx in range(idx_start + 1, len(lows_arr)):
@@ -82,7 +146,7 @@ def next_lo(lows_arr: np.array, highs_arr: np.array, idx_start: int, prev_low: f
         else:
             return low, low_idx
 
-    return None, None
+    return low, NO_END
 
 @njit
 def lo(lows_arr: np.array, highs_arr: np.array, idx_start):
@@ -97,4 +161,459 @@ def lo(lows_arr: np.array, highs_arr: np.array, idx_start):
         else:
             return low, low_idx
 
-    return low, low_idx
\ No newline at end of file
+    return low, low_idx
+
+@njit
+def local_extrema(lows_arr: np.array, highs_arr: np.array, windows: np.array, idx_from: int = 0):
+    """
+    Both-sided local minimums of the lows and maximums of the highs for several windows in one pass: the low at idx is
+    a local minimum if it is the minimum of the window bars ending at idx and of the window bars starting at idx, i.e.
+    the minimum of the 2 * window - 1 bars centered at idx (the same for the highs). The first and the last window - 1
+    bars are never flagged, see screener.find_minimums().
+
+    The sliding minimums / maximums are kept in monotonic queues (one per window and side), so every bar is pushed and
+    popped at most once per window.
+
+    :param lows_arr:
+    :param highs_arr:
+    :param windows: int array of window sizes
+    :param idx_from: only the flags of the bars from idx_from on are returned
+    :return: minimums, maximums: (len(windows), n - idx_from) boolean arrays
+    """
+    n = len(lows_arr)
+    n_windows = len(windows)
+    minimums = np.zeros((n_windows, max(n - idx_from, 0)), dtype=np.bool_)
+    maximums = np.zeros((n_windows, max(n - idx_from, 0)), dtype=np.bool_)
+    if n_windows == 0 or n <= idx_from:
+        return minimums, maximums
+
+    # queues of indices with increasing lows / decreasing highs, as ring buffers of at least the centered window
+    sizes = 2 * windows - 1
+    capacity = 1
+    while capacity < np.max(sizes):
+        capacity *= 2
+    mask = capacity - 1
+    min_queue = np.zeros((n_windows, capacity), dtype=np.int64)
+    max_queue = np.zeros((n_windows, capacity), dtype=np.int64)
+    min_head = np.zeros(n_windows, dtype=np.int64)
+    min_tail = np.zeros(n_windows, dtype=np.int64)
+    max_head = np.zeros(n_windows, dtype=np.int64)
+    max_tail = np.zeros(n_windows, dtype=np.int64)
+
+    for idx in range(max(0, idx_from - np.max(sizes) + 1), n):
+        for w in range(n_windows):
+            window = windows[w]
+            size = sizes[w]
+
+            # drop the bar leaving the centered window of center = idx - window + 1
+            if min_tail[w] > min_head[w] and min_queue[w, min_head[w] & mask] <= idx - size:
+                min_head[w] += 1
+            if max_tail[w] > max_head[w] and max_queue[w, max_head[w] & mask] <= idx - size:
+                max_head[w] += 1
+
+            while min_tail[w] > min_head[w] and lows_arr[min_queue[w, (min_tail[w] - 1) & mask]] > lows_arr[idx]:
+                min_tail[w] -= 1
+            min_queue[w, min_tail[w] & mask] = idx
+            min_tail[w] += 1
+            while max_tail[w] > max_head[w] and highs_arr[max_queue[w, (max_tail[w] - 1) & mask]] < highs_arr[idx]:
+                max_tail[w] -= 1
+            max_queue[w, max_tail[w] & mask] = idx
+            max_tail[w] += 1
+
+            center = idx - window + 1
+            if center >= max(window - 1, idx_from):
+                minimums[w, center - idx_from] = lows_arr[center] == lows_arr[min_queue[w, min_head[w] & mask]]
+                maximums[w, center - idx_from] = highs_arr[center] == highs_arr[max_queue[w, max_head[w] & mask]]
+
+    return minimums, maximums
+
+
+@njit
+def local_minimums(lows_arr: np.array, window: int, idx_from: int = 0):
+    """
+    True where the low is the minimum of the window bars ending at the index and of the window bars starting at the
+    index, see local_extrema()
+
+    :param lows_arr:
+    :param window:
+    :param idx_from: only the flags of lows_arr[idx_from:] are returned
+    :return:
+    """
+    minimums, _ = local_extrema(lows_arr, lows_arr, np.array([window]), idx_from)
+    return minimums[0]
+
+
+@njit
+def resample_ohlc(times: np.array,
+                  opens: np.array,
+                  highs: np.array,
+                  lows: np.array,
+                  closes: np.array,
+                  first: np.array,
+                  period: int):
+    """
+    Resamples ordered OHLC bars into bars of period (in the unit of times), aligned to multiples of period. Bars of a
+    finer timeframe which is a divisor of period can be resampled again, e.g. 5m -> 15m -> 1h -> 4h, so every level
+    only passes over the bars of the previous one.
+
+    :param times: int64 start times of the bars, e.g. datetime64[ns] viewed as int64
+    :param opens:
+    :param highs:
+    :param lows:
+    :param closes:
+    :param first: index of the first bar of the finest timeframe of every bar
+    :param period:
+    :return: times, opens, highs, lows, closes, first of the resampled bars
+    """
+    n = len(times)
+    out_times = np.empty(n, dtype=np.int64)
+    out_opens = np.empty(n)
+    out_highs = np.empty(n)
+    out_lows = np.empty(n)
+    out_closes = np.empty(n)
+    out_first = np.empty(n, dtype=np.int64)
+
+    k = -1
+    bucket = 0
+    for i in range(n):
+        time_bucket = times[i] // period
+        if k < 0 or time_bucket != bucket:
+            k += 1
+            bucket = time_bucket
+            out_times[k] = bucket * period
+            out_opens[k] = opens[i]
+            out_highs[k] = highs[i]
+            out_lows[k] = lows[i]
+            out_first[k] = first[i]
+        else:
+            out_highs[k] = max(out_highs[k], highs[i])
+            out_lows[k] = min(out_lows[k], lows[i])
+        out_closes[k] = closes[i]
+
+    k += 1
+    return out_times[:k], out_opens[:k], out_highs[:k], out_lows[:k], out_closes[:k], out_first[:k]
+
+
+@njit
+def log2_table(n: int):
+    """
+    floor(log2(length)) for every length in [0, n]
+
+    :param n:
+    :return:
+    """
+    log2 = np.zeros(n + 1, dtype=np.int64)
+    for length in range(2, n + 1):
+        log2[length] = log2[length // 2] + 1
+
+    return log2
+
+
+@njit
+def sparse_table(values: np.array, minimum: bool):
+    """
+    Sparse table of values: row k holds the min (or max) of values[i:i + 2**k] at column i
+
+    :param values:
+    :param minimum: True for a range minimum table, False for a range maximum table
+    :return:
+    """
+    n = len(values)
+    levels = 1
+    while (1 << levels) <= n:
+        levels += 1
+
+    table = np.empty((levels, n), dtype=values.dtype)
+    table[0, :] = values
+    for k in range(1, levels):
+        half = 1 << (k - 1)
+        for i in range(n - (1 << k) + 1):
+            if minimum:
+                table[k, i] = min(table[k - 1, i], table[k - 1, i + half])
+            else:
+                table[k, i] = max(table[k - 1, i], table[k - 1, i + half])
+
+    return table
+
+
+@njit
+def range_min(table: np.array, log2: np.array, idx_from: int, idx_to: int):
+    """
+    min(values[idx_from:idx_to]) of a sparse table built with minimum=True, idx_to > idx_from
+    """
+    k = log2[idx_to - idx_from]
+    return min(table[k, idx_from], table[k, idx_to - (1 << k)])
+
+
+@njit
+def range_max(table: np.array, log2: np.array, idx_from: int, idx_to: int):
+    """
+    max(values[idx_from:idx_to]) of a sparse table built with minimum=False, idx_to > idx_from
+    """
+    k = log2[idx_to - idx_from]
+    return max(table[k, idx_from], table[k, idx_to - (1 << k)])
+
+
+@njit
+def extend_sparse_table(table: np.array, values: np.array, idx_from: int, minimum: bool):
+    """
+    Fills the columns of a sparse table (see sparse_table()) which are affected by values[idx_from:], e.g. after values
+    were appended. The table needs at least floor(log2(len(values))) + 1 rows and len(values) columns.
+
+    :param table:
+    :param values:
+    :param idx_from: number of values the table was built for
+    :param minimum:
+    :return:
+    """
+    n = len(values)
+    table[0, idx_from:n] = values[idx_from:n]
+    k = 1
+    while (1 << k) <= n:
+        half = 1 << (k - 1)
+        for i in range(max(0, idx_from - (1 << k) + 1), n - (1 << k) + 1):
+            if minimum:
+                table[k, i] = min(table[k - 1, i], table[k - 1, i + half])
+            else:
+                table[k, i] = max(table[k - 1, i], table[k - 1, i + half])
+        k += 1
+
+
+@njit
+def _monowave_up_row(lows_arr, highs_arr, idx_start, idx_from, ends, prices, open_skip, base, base_idx, scan, scan_idx,
+                     reached):
+    """
+    Computes the MonoWaveUp ends of idx_start from idx_from on, see extend_monowave_ends()
+    """
+    n = len(highs_arr)
+    up_to = ends.shape[2]
+    skip = open_skip[0, idx_start]
+    high = base[0, idx_start]
+    high_idx = base_idx[0, idx_start]
+    idx = idx_from
+
+    if skip == 0:
+        # hi()
+        while idx < n and highs_arr[idx] > high:
+            high = highs_arr[idx]
+            high_idx = idx
+            idx += 1
+        ends[0, idx_start, 0] = high_idx
+        prices[0, idx_start, 0] = high
+        if idx == n:
+            base[0, idx_start] = high
+            base_idx[0, idx_start] = high_idx
+            return
+        skip = 1
+        act_high, act_high_idx, prev_high_reached, idx = lows_arr[high_idx], NO_IDX, False, high_idx + 1
+    else:
+        act_high, act_high_idx, prev_high_reached = scan[0, idx_start], scan_idx[0, idx_start], reached[0, idx_start]
+
+    while skip < up_to:
+        # _next_hi(lows_arr, highs_arr, high_idx, high)
+        while idx < n:
+            value = highs_arr[idx]
+            if value < high and not prev_high_reached:
+                pass
+            elif value > high and not prev_high_reached:
+                prev_high_reached = True
+                act_high = value
+                act_high_idx = idx
+            elif value > act_high:
+                act_high = value
+                act_high_idx = idx
+            else:
+                break
+            idx += 1
+
+        if idx == n:
+            # the scan ran off the end of the data: no end, yet
+            open_skip[0, idx_start] = skip
+            base[0, idx_start], base_idx[0, idx_start] = high, high_idx
+            scan[0, idx_start], scan_idx[0, idx_start], reached[0, idx_start] = act_high, act_high_idx, prev_high_reached
+            return
+
+        # MonoWaveUp.find_end() checks np.min(lows[idx_start:act_high_idx] < low_at_start) here, which can never
+        # be True as lows[idx_start] == low_at_start, so the check is omitted.
+        if act_high > high and act_high_idx != NO_IDX:
+            high = act_high
+            high_idx = act_high_idx
+            ends[0, idx_start, skip] = high_idx
+            prices[0, idx_start, skip] = high
+        else:
+            # same state as for the previous skip, so all larger skips end here, too
+            ends[0, idx_start, skip:] = high_idx
+            prices[0, idx_start, skip:] = high
+            break
+
+        skip += 1
+        act_high, act_high_idx, prev_high_reached, idx = lows_arr[high_idx], NO_IDX, False, high_idx + 1
+
+    open_skip[0, idx_start] = up_to
+
+
+@njit
+def _monowave_down_row(lows_arr, highs_arr, idx_start, idx_from, ends, prices, open_skip, base, base_idx, scan,
+                       scan_idx, reached, max_highs, log2):
+    """
+    Computes the MonoWaveDown ends of idx_start from idx_from on, see extend_monowave_ends()
+    """
+    n = len(lows_arr)
+    up_to = ends.shape[2]
+    skip = open_skip[1, idx_start]
+    low = base[1, idx_start]
+    low_idx = base_idx[1, idx_start]
+    idx = idx_from
+
+    if skip == 0:
+        # lo()
+        while idx < n and lows_arr[idx] < low:
+            low = lows_arr[idx]
+            low_idx = idx
+            idx += 1
+        ends[1, idx_start, 0] = low_idx
+        prices[1, idx_start, 0] = low
+        if idx == n:
+            base[1, idx_start] = low
+            base_idx[1, idx_start] = low_idx
+            return
+        skip = 1
+        act_low, act_low_idx, prev_low_reached, idx = highs_arr[low_idx], NO_IDX, False, low_idx + 1
+    else:
+        act_low, act_low_idx, prev_low_reached = scan[1, idx_start], scan_idx[1, idx_start], reached[1, idx_start]
+
+    while skip < up_to:
+        # _next_lo(lows_arr, highs_arr, low_idx, low)
+        while idx < n:
+            value = lows_arr[idx]
+            if value > low and not prev_low_reached:
+                pass
+            elif value < low and not prev_low_reached:
+                prev_low_reached = True
+                act_low = value
+                act_low_idx = idx
+            elif value < act_low:
+                act_low = value
+                act_low_idx = idx
+            else:
+                break
+            idx += 1
+
+        if idx == n:
+            open_skip[1, idx_start] = skip
+            base[1, idx_start], base_idx[1, idx_start] = low, low_idx
+            scan[1, idx_start], scan_idx[1, idx_start], reached[1, idx_start] = act_low, act_low_idx, prev_low_reached
+            return
+
+        if act_low < low and act_low_idx != NO_IDX:
+            low = act_low
+            low_idx = act_low_idx
+            if range_max(max_highs, log2, idx_start, act_low_idx) > highs_arr[idx_start]:
+                # larger skips have no end
+                break
+            ends[1, idx_start, skip] = low_idx
+            prices[1, idx_start, skip] = low
+        else:
+            ends[1, idx_start, skip:] = low_idx
+            prices[1, idx_start, skip:] = low
+            break
+
+        skip += 1
+        act_low, act_low_idx, prev_low_reached, idx = highs_arr[low_idx], NO_IDX, False, low_idx + 1
+
+    open_skip[1, idx_start] = up_to
+
+
+@njit
+def extend_monowave_ends(lows_arr: np.array,
+                         highs_arr: np.array,
+                         idx_from: int,
+                         ends: np.array,
+                         prices: np.array,
+                         open_skip: np.array,
+                         base: np.array,
+                         base_idx: np.array,
+                         scan: np.array,
+                         scan_idx: np.array,
+                         reached: np.array,
+                         open_up: np.array,
+                         open_down: np.array,
+                         max_highs: np.array,
+                         log2: np.array):
+    """
+    Builds the end of every MonoWaveUp / MonoWaveDown for every start index and every skip in [0, up_to), see
+    monowave_ends(), for the bars appended since idx_from.
+
+    Row k of a start is the state of MonoWave.find_end() after k iterations of its skip loop, so the whole row is
+    computed with a single scan per start. A row is open as long as one of its scans ran off the end of the data: its
+    ends from open_skip on are provisional and the state of the scan is kept, so appending bars continues the scan
+    instead of repeating it. All other entries are final.
+
+    :param lows_arr:
+    :param highs_arr:
+    :param idx_from: number of bars the arrays were built for
+    :param ends: (2, n, up_to) with n >= len(lows_arr), index 0 = up, 1 = down. NO_END if the wave has no end.
+    :param prices: (2, n, up_to), nan if the wave has no end
+    :param open_skip: (2, n) first skip of every row which is not final, up_to if the row is final
+    :param base: (2, n) extreme price of the last final skip (of the running scan for open_skip == 0)
+    :param base_idx: (2, n) index of base
+    :param scan: (2, n) extreme price of the running scan of open_skip
+    :param scan_idx: (2, n) index of scan
+    :param reached: (2, n) the running scan passed base
+    :param open_up: start indices of the open up rows
+    :param open_down: start indices of the open down rows
+    :param max_highs: range maximum sparse table of highs_arr, see RangeIndex
+    :param log2: see RangeIndex
+    :return: start indices of the open up / down rows
+    """
+    n = len(lows_arr)
+    open_rows = (np.empty(len(open_up) + n - idx_from, dtype=np.int64),
+                 np.empty(len(open_down) + n - idx_from, dtype=np.int64))
+    n_open = np.zeros(2, dtype=np.int64)
+
+    for direction in range(2):
+        rows = open_up if direction == 0 else open_down
+        for idx_start in range(idx_from, n):
+            ends[direction, idx_start, :] = NO_END
+            prices[direction, idx_start, :] = np.nan
+            open_skip[direction, idx_start] = 0
+            base[direction, idx_start] = lows_arr[idx_start] if direction == 0 else highs_arr[idx_start]
+            base_idx[direction, idx_start] = idx_start
+
+        for k in range(len(rows) + n - idx_from):
+            idx_start = rows[k] if k < len(rows) else idx_from + k - len(rows)
+            row_from = idx_from if k < len(rows) else idx_start + 1
+            if direction == 0:
+                _monowave_up_row(lows_arr, highs_arr, idx_start, row_from, ends, prices, open_skip, base, base_idx,
+                                 scan, scan_idx, reached)
+            else:
+                _monowave_down_row(lows_arr, highs_arr, idx_start, row_from, ends, prices, open_skip, base, base_idx,
+                                   scan, scan_idx, reached, max_highs, log2)
+            if open_skip[direction, idx_start] < ends.shape[2]:
+                open_rows[direction][n_open[direction]] = idx_start
+                n_open[direction] += 1
+
+    return open_rows[0][:n_open[0]].copy(), open_rows[1][:n_open[1]].copy()
+
+
+@njit
+def monowave_ends(lows_arr: np.array, highs_arr: np.array, up_to: int, max_highs: np.array, log2: np.array):
+    """
+    Builds the end of every MonoWaveUp / MonoWaveDown for every start index and every skip in [0, up_to).
+
+    :param lows_arr:
+    :param highs_arr:
+    :param up_to: number of skips per start
+    :param max_highs: range maximum sparse table of highs_arr, see RangeIndex
+    :param log2: see RangeIndex
+    :return: ends, prices with shape (2, n, up_to); index 0 = up, 1 = down. NO_END / nan if the wave has no end
+    """
+    n = len(lows_arr)
+    ends = np.empty((2, n, up_to), dtype=np.int64)
+    prices = np.empty((2, n, up_to))
+    empty = np.empty(0, dtype=np.int64)
+    extend_monowave_ends(lows_arr, highs_arr, 0, ends, prices, np.zeros((2, n), dtype=np.int64), np.empty((2, n)),
+                         np.empty((2, n), dtype=np.int64), np.empty((2, n)), np.empty((2, n), dtype=np.int64),
+                         np.zeros((2, n), dtype=np.bool_), empty, empty, max_highs, log2)
+
+    return ends, prices
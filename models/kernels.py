@@ -0,0 +1,517 @@
+import heapq
+from numba import njit
+import numpy as np
+from models.functions import range_min, NO_END
+
+# rule flags of impulse_search()
+IMPULSE = 1
+LEADING_DIAGONAL = 2
+
+# columns of the hits of impulse_search(): boundaries of the waves, e.g. wave2 goes from WAVE1_END to WAVE2_END
+START, OPTION, WAVE1_END, WAVE2_END, WAVE3_END, WAVE4_END, WAVE5_END, RULES = range(8)
+
+
+@njit
+def option_prefixes(options: np.array):
+    """
+    Prefix structure of sorted options
+
+    :param options: (N, 5) WaveOptions values, see WaveOptionsGenerator.to_array()
+    :return: lcp[o]: length of the common prefix of options[o] and options[o - 1],
+        skip[d, o]: index of the next option with another prefix options[o, :d + 1]
+    """
+    n, width = options.shape
+    lcp = np.zeros(n, dtype=np.int64)
+    for o in range(1, n):
+        d = 0
+        while d < width and options[o, d] == options[o - 1, d]:
+            d += 1
+        lcp[o] = d
+
+    skip = np.empty((width, max(n, 1)), dtype=np.int64)
+    skip[:, n - 1] = n
+    for o in range(n - 2, -1, -1):
+        for d in range(width):
+            skip[d, o] = o + 1 if lcp[o + 1] <= d else skip[d, o + 1]
+
+    return lcp, skip
+
+
+@njit
+def sibling_subsumed(options: np.array, order: np.array):
+    """
+    Finds blocks of sorted options which can only give waves an earlier block gives, too: if e.g. [3,1,*,*,*] and
+    [3,2,*,*,*] have the same end of wave2 (there are no more lows to skip), wave3 to wave5 of both blocks are the same
+    for the same suffix [*,*,*].
+
+    :param options: (N, 5) sorted WaveOptions values
+    :param order: original index of every option
+    :return: subsumed[d, o] is True if option o starts a block with the prefix options[o, :d + 1], the previous block
+        with the prefix options[o, :d] has every suffix options[:, d + 1:] of the block, too, and each of them at a
+        smaller original index
+    """
+    n, width = options.shape
+    lcp, skip = option_prefixes(options)
+    subsumed = np.zeros((width, n), dtype=np.bool_)
+    block_start = np.zeros(width, dtype=np.int64)
+
+    for o in range(1, n):
+        d = lcp[o]
+        if d < width:
+            # previous block [block_start[d], o), block [o, skip[d, o])
+            p = block_start[d]
+            fulfilled = True
+            for c in range(o, skip[d, o]):
+                while p < o and _suffix_less(options, p, c, d + 1):
+                    p += 1
+                if p == o or _suffix_less(options, c, p, d + 1) or order[p] > order[c]:
+                    fulfilled = False
+                    break
+            subsumed[d, o] = fulfilled
+
+        for depth in range(d, width):
+            block_start[depth] = o
+
+    return subsumed
+
+
+@njit
+def _suffix_less(options: np.array, a: int, b: int, column: int) -> bool:
+    for c in range(column, options.shape[1]):
+        if options[a, c] != options[b, c]:
+            return options[a, c] < options[b, c]
+    return False
+
+
+@njit
+def slope(x1, x2, y1, y2):
+    """
+    see LeadingDiagonal.slope()
+    """
+    delta_x = x2 - x1
+    delta_y = y2 - y1
+    return delta_y / delta_x if delta_x != 0 else 0.0
+
+
+@njit
+def impulse_stage(stage: int, ends: np.array, lows: np.array, highs: np.array, has_wave5: bool) -> bool:
+    """
+    Conditions of the Impulse rule needing the waves up to wave[stage], see WaveRules.Impulse
+
+    :param stage:
+    :param ends: boundaries of the waves, wave k goes from ends[k - 1] to ends[k]
+    :param lows: low of every wave
+    :param highs: high of every wave
+    :param has_wave5:
+    :return:
+    """
+    length = np.abs(highs - lows)
+    if stage == 2:
+        return lows[1] > lows[0] and length[1] >= 0.2 * length[0] and \
+            9 * (ends[2] - ends[1]) > (ends[1] - ends[0])
+    elif stage == 3:
+        return highs[2] > highs[0] and length[2] >= length[0] / 3.0 and length[2] > length[1] and \
+            7 * (ends[3] - ends[2]) > (ends[1] - ends[0])
+    elif stage == 4:
+        return lows[3] > highs[0] and length[3] > length[1] / 3.0
+    elif stage == 5:
+        if not has_wave5:
+            return not length[2] < length[0]
+        return not (length[2] < length[4] and length[2] < length[0]) and highs[2] < highs[4] and \
+            length[4] < 2.0 * length[0]
+    return True
+
+
+@njit
+def leading_diagonal_stage(stage: int, ends: np.array, lows: np.array, highs: np.array, has_wave5: bool) -> bool:
+    """
+    Conditions of the LeadingDiagonal rule needing the waves up to wave[stage], see WaveRules.LeadingDiagonal
+    """
+    length = np.abs(highs - lows)
+    if stage == 2:
+        return lows[1] > lows[0] and length[1] >= 0.2 * length[0] and \
+            9 * (ends[2] - ends[1]) > (ends[1] - ends[0])
+    elif stage == 3:
+        return highs[2] > highs[0] and length[2] >= length[0] / 3.0 and length[2] > length[1] and \
+            7 * (ends[3] - ends[2]) > (ends[1] - ends[0])
+    elif stage == 4:
+        slope_13 = slope(ends[1], ends[3], highs[0], highs[2])
+        return slope(ends[2], ends[4], lows[1], lows[3]) > slope_13 and slope_13 > 0 and \
+            lows[3] < highs[0] and length[3] > length[1] / 3.0
+    elif stage == 5:
+        if not has_wave5:
+            return not length[2] < length[0]
+        return not (length[2] < length[4] and length[2] < length[0]) and highs[2] < highs[4] and \
+            length[4] < 2.0 * length[0] and length[4] > 0.70 * length[0] and length[4] < length[2]
+    return True
+
+
+@njit
+def impulse_search(lows_arr: np.array,
+                   highs_arr: np.array,
+                   wave_ends: np.array,
+                   wave_prices: np.array,
+                   open_skip: np.array,
+                   min_lows: np.array,
+                   log2: np.array,
+                   starts: np.array,
+                   options: np.array,
+                   rules: int,
+                   subsumed: np.array,
+                   reach: np.array,
+                   end_min: int,
+                   end_max: int):
+    """
+    Compiled version of WaveAnalyzer.find_impulsive_waves() for the Impulse and LeadingDiagonal rules: walks the sorted
+    options for every start, reusing the waves of the common prefix with the previous option and skipping all options
+    with the same prefix as soon as a wave has no end or all rules are violated.
+
+    :param lows_arr:
+    :param highs_arr:
+    :param wave_ends: MonoWaveTable.ends
+    :param wave_prices: MonoWaveTable.prices
+    :param open_skip: MonoWaveTable.open_skip
+    :param min_lows: range minimum sparse table of lows_arr, see RangeIndex
+    :param log2: see RangeIndex
+    :param starts: start indices of wave1
+    :param options: (N, 5) sorted WaveOptions values, -1 for a missing wave5
+    :param rules: IMPULSE | LEADING_DIAGONAL, or 0 to skip the rules
+    :param subsumed: see sibling_subsumed(). A subsumed block is skipped if its MonoWave has the same end as the one of
+        the previous block, as all its waves are found with smaller option indices, too. All False to find every option.
+    :param reach: see last_wave_reach(), only used if end_min > 0
+    :param end_min: only hits whose last wave ends at end_min or later are found. A wave is dropped with all options
+        of its prefix as soon as no impulse continuing it can reach end_min.
+    :param end_max: only hits whose last wave ends at end_max or earlier are found
+    :return: (M, 8) int64 array, one row per hit with the columns START, OPTION, WAVE1_END, ..., WAVE5_END (-1 if
+        there is no wave5) and RULES (flags of the fulfilled rules), and for every start whether its search used
+        MonoWave ends which are not final (see MonoWaveTable.open_skip), i.e. whether it has to be repeated if bars
+        are appended
+    """
+    n_options = options.shape[0]
+    lcp, skip = option_prefixes(options)
+
+    hits = np.empty((1024, 8), dtype=np.int64)
+    n_hits = 0
+
+    ends = np.zeros(6, dtype=np.int64)
+    lows = np.zeros(5)
+    highs = np.zeros(5)
+    rules_left = np.zeros(6, dtype=np.int64)
+    touched = np.zeros(len(starts), dtype=np.bool_)
+    last_ends = np.zeros(5, dtype=np.int64)
+
+    for position, idx_start in enumerate(starts):
+        ends[0] = idx_start
+        rules_left[0] = rules
+        last_ends[:] = NO_END - 2
+        o = 0
+        depth_from = 0
+
+        while o < n_options:
+            failed_at = -1
+            has_wave5 = True
+
+            for depth in range(depth_from, 5):
+                wave_skip = options[o, depth]
+                if wave_skip < 0:
+                    has_wave5 = False
+                    ends[5] = -1
+                    last_ends[depth] = NO_END - 2
+                    if ends[depth] < end_min:
+                        failed_at = depth
+                        break
+                else:
+                    direction = depth % 2
+                    wave_start = ends[depth]
+                    wave_end = wave_ends[direction, wave_start, wave_skip]
+                    if wave_skip >= open_skip[direction, wave_start]:
+                        touched[position] = True
+                    if depth == depth_from and wave_end == last_ends[depth] and subsumed[depth, o]:
+                        # skip saturation: same wave as for the previous skip
+                        failed_at = depth
+                        break
+                    last_ends[depth] = wave_end
+                    if wave_end < 0:
+                        failed_at = depth
+                        break
+                    # ends only grow with the waves left, and no continuation reaches end_min
+                    if wave_end > end_max or end_min > 0 and reach[depth + 1, wave_end] < end_min:
+                        failed_at = depth
+                        break
+
+                    ends[depth + 1] = wave_end
+                    if direction == 0:
+                        lows[depth] = lows_arr[wave_start]
+                        highs[depth] = wave_prices[0, wave_start, wave_skip]
+                    else:
+                        highs[depth] = highs_arr[wave_start]
+                        lows[depth] = wave_prices[1, wave_start, wave_skip]
+
+                    # wave2 (wave4) has to be the lowest low up to the end of wave4 (wave5), see WaveAnalyzer
+                    if depth == 3 and ends[2] != ends[4] and lows[1] > range_min(min_lows, log2, ends[2], ends[4]):
+                        failed_at = depth
+                        break
+                    if depth == 4 and ends[4] != ends[5] and lows[3] > range_min(min_lows, log2, ends[4], ends[5]):
+                        failed_at = depth
+                        break
+
+                left = rules_left[depth]
+                if left & IMPULSE and not impulse_stage(depth + 1, ends, lows, highs, has_wave5):
+                    left &= ~IMPULSE
+                if left & LEADING_DIAGONAL and not leading_diagonal_stage(depth + 1, ends, lows, highs, has_wave5):
+                    left &= ~LEADING_DIAGONAL
+                rules_left[depth + 1] = left
+
+                if rules != 0 and left == 0:
+                    failed_at = depth
+                    break
+
+            if failed_at >= 0:
+                o = skip[failed_at, o]
+            else:
+                if n_hits == hits.shape[0]:
+                    hits = np.concatenate((hits, np.empty_like(hits)))
+                hits[n_hits, START] = idx_start
+                hits[n_hits, OPTION] = o
+                hits[n_hits, WAVE1_END:WAVE5_END + 1] = ends[1:]
+                hits[n_hits, RULES] = rules_left[5]
+                n_hits += 1
+                o += 1
+
+            if o < n_options:
+                depth_from = lcp[o]
+
+    return hits[:n_hits].copy(), touched
+
+
+@njit
+def impulse_wave(depth: int,
+                 wave_skip: int,
+                 ends: np.array,
+                 lows: np.array,
+                 highs: np.array,
+                 rules_left: np.array,
+                 lows_arr: np.array,
+                 highs_arr: np.array,
+                 wave_ends: np.array,
+                 wave_prices: np.array,
+                 min_lows: np.array,
+                 log2: np.array,
+                 rules: int) -> bool:
+    """
+    Adds wave[depth + 1] to the waves of an impulse, the same way as impulse_search() does
+
+    :param depth: number of waves built so far
+    :param wave_skip: skip of the wave, -1 for a missing wave5
+    :param ends: boundaries of the waves, updated
+    :param lows: updated
+    :param highs: updated
+    :param rules_left: flags of the rules fulfilled so far, rules_left[depth + 1] is updated
+    :return: False if the wave has no end, wave2 / wave4 is not the lowest low or all rules are violated
+    """
+    has_wave5 = True
+    if wave_skip < 0:
+        has_wave5 = False
+        ends[5] = -1
+    else:
+        direction = depth % 2
+        wave_start = ends[depth]
+        wave_end = wave_ends[direction, wave_start, wave_skip]
+        if wave_end < 0:
+            return False
+
+        ends[depth + 1] = wave_end
+        if direction == 0:
+            lows[depth] = lows_arr[wave_start]
+            highs[depth] = wave_prices[0, wave_start, wave_skip]
+        else:
+            highs[depth] = highs_arr[wave_start]
+            lows[depth] = wave_prices[1, wave_start, wave_skip]
+
+        if depth == 3 and ends[2] != ends[4] and lows[1] > range_min(min_lows, log2, ends[2], ends[4]):
+            return False
+        if depth == 4 and ends[4] != ends[5] and lows[3] > range_min(min_lows, log2, ends[4], ends[5]):
+            return False
+
+    left = rules_left[depth]
+    if left & IMPULSE and not impulse_stage(depth + 1, ends, lows, highs, has_wave5):
+        left &= ~IMPULSE
+    if left & LEADING_DIAGONAL and not leading_diagonal_stage(depth + 1, ends, lows, highs, has_wave5):
+        left &= ~LEADING_DIAGONAL
+    rules_left[depth + 1] = left
+
+    return rules == 0 or left != 0
+
+
+@njit(error_model='numpy')
+def proportion_bounds(lows: np.array, highs: np.array, n_waves: int):
+    """
+    WaveScore.value() of the first n_waves waves, the score of every missing wave taken as 1 (its maximum)
+
+    :param lows:
+    :param highs:
+    :param n_waves:
+    :return: bound of the score without wave5 and bound of the score with wave5, exact if all waves are known
+    """
+    length = np.abs(highs - lows)
+    scores = np.ones(4)
+    if n_waves >= 2:
+        scores[0] = length[1] / (0.618 * length[0])
+    if n_waves >= 3:
+        scores[1] = length[2] / (1.618 * length[0] / length[2])
+    if n_waves >= 4:
+        scores[2] = length[3] / (0.382 * length[2])
+    if n_waves >= 5:
+        scores[3] = length[4] / length[0]
+    for i in range(4):
+        if scores[i] > 1:
+            scores[i] = 1 / scores[i]
+
+    return (scores[0] + scores[1] + scores[2]) / 3, (scores[0] + scores[1] + scores[2] + scores[3]) / 4
+
+
+@njit
+def last_wave_reach(wave_ends: np.array, n_skips: int) -> np.array:
+    """
+    Latest end of the last wave of an impulse, over all skips of the waves left
+
+    :param wave_ends: MonoWaveTable.ends
+    :param n_skips: skips 0 to n_skips - 1 are used
+    :return: reach[d, i]: latest end of wave5 (or wave4 if there is no wave5) of the impulses whose wave[d] ends at
+        index i (wave1 starts at i for d = 0), -1 if there is none
+    """
+    n = wave_ends.shape[1]
+    reach = np.full((6, n), -1, dtype=np.int64)
+    reach[5] = np.arange(n)
+    for depth in range(4, -1, -1):
+        direction = depth % 2
+        for i in range(n):
+            latest = i if depth == 4 else -1
+            for wave_skip in range(min(n_skips, wave_ends.shape[2])):
+                wave_end = wave_ends[direction, i, wave_skip]
+                if wave_end >= 0 and reach[depth + 1, wave_end] > latest:
+                    latest = reach[depth + 1, wave_end]
+            reach[depth, i] = latest
+
+    return reach
+
+
+@njit
+def impulse_best_first(lows_arr: np.array,
+                       highs_arr: np.array,
+                       wave_ends: np.array,
+                       wave_prices: np.array,
+                       min_lows: np.array,
+                       log2: np.array,
+                       starts: np.array,
+                       options: np.array,
+                       order: np.array,
+                       rules: int,
+                       subsumed: np.array,
+                       k: int,
+                       min_proportion: float,
+                       min_age: float):
+    """
+    The k best hits of impulse_search() by proportion score (WaveScore.value()) * age score (end of the last wave /
+    number of bars), searched best first: the nodes of the prefix trees of the options (one tree per start) are
+    expanded in the order of an upper bound of the scores below them (the score of every missing wave taken as 1 and
+    the latest end the waves left can reach, see last_wave_reach(), as the end), and the search stops as soon as k
+    hits are found, as no node left can give a better one.
+
+    Hits with the same score are returned in the order of their original option index and start, of hits with the same
+    boundaries (see WaveAnalyzer.unique_hits()) only the first one is returned, so the result is the same as selecting
+    the best k of all unique hits with a stable sort.
+
+    :param lows_arr:
+    :param highs_arr:
+    :param wave_ends: MonoWaveTable.ends
+    :param wave_prices: MonoWaveTable.prices
+    :param min_lows: see impulse_search()
+    :param log2:
+    :param starts: start indices of wave1
+    :param options: (N, 5) sorted WaveOptions values, -1 for a missing wave5
+    :param order: original index of every option
+    :param rules: IMPULSE | LEADING_DIAGONAL, or 0 to skip the rules
+    :param subsumed: see sibling_subsumed(), a subsumed option is not expanded if its wave has the same end as the one
+        of the previous option with the same prefix, as all its hits are duplicates
+    :param k:
+    :param min_proportion: only hits with a higher proportion score are returned
+    :param min_age: only hits with a higher age score are returned
+    :return: (M <= k, 8) hits as impulse_search(), best first, and their scores
+    """
+    n_options = options.shape[0]
+    lcp, skip = option_prefixes(options)
+    n = len(lows_arr)
+    reach = last_wave_reach(wave_ends, options.max() + 1 if n_options > 0 else 0)
+
+    hits = np.empty((k, 8), dtype=np.int64)
+    scores = np.empty(k)
+    n_hits = 0
+
+    ends = np.zeros(6, dtype=np.int64)
+    lows = np.zeros(5)
+    highs = np.zeros(5)
+    rules_left = np.zeros(6, dtype=np.int64)
+
+    # (-bound, is_hit, option index, start, depth, option): nodes with the same bound are expanded before hits, so
+    # hits with the same score are returned in the order of option index and start
+    heap = [(-1.0, 0, 0, 0, 0, 0)]
+    heap.pop()
+    if n_options > 0 and k > 0:
+        for idx_start in starts:
+            if reach[0, idx_start] >= 0:
+                heap.append((-(reach[0, idx_start] / n), 0, 0, idx_start, 0, 0))
+    heapq.heapify(heap)
+
+    while len(heap) > 0 and n_hits < k:
+        neg_bound, is_hit, _, idx_start, depth, o = heapq.heappop(heap)
+
+        # the waves of the prefix options[o, :depth], all of them were valid when the node was pushed
+        ends[0] = idx_start
+        rules_left[0] = rules
+        for d in range(depth):
+            impulse_wave(d, options[o, d], ends, lows, highs, rules_left, lows_arr, highs_arr, wave_ends,
+                         wave_prices, min_lows, log2, rules)
+
+        if is_hit:
+            duplicate = False
+            for h in range(n_hits):
+                if hits[h, START] == idx_start and np.all(hits[h, WAVE1_END:WAVE5_END + 1] == ends[1:]):
+                    duplicate = True
+                    break
+            if not duplicate:
+                hits[n_hits, START] = idx_start
+                hits[n_hits, OPTION] = o
+                hits[n_hits, WAVE1_END:WAVE5_END + 1] = ends[1:]
+                hits[n_hits, RULES] = rules_left[5]
+                scores[n_hits] = -neg_bound
+                n_hits += 1
+            continue
+
+        c = o
+        block_end = n_options if depth == 0 else skip[depth - 1, o]
+        last_end = NO_END - 2
+        while c < block_end:
+            wave_skip = options[c, depth]
+            wave_end = -1 if wave_skip < 0 else wave_ends[depth % 2, ends[depth], wave_skip]
+            if wave_end == last_end and subsumed[depth, c]:
+                # skip saturation, see impulse_search()
+                c = skip[depth, c]
+                continue
+            last_end = wave_end
+            if impulse_wave(depth, wave_skip, ends, lows, highs, rules_left, lows_arr, highs_arr, wave_ends,
+                            wave_prices, min_lows, log2, rules):
+                bound_4, bound_5 = proportion_bounds(lows, highs, depth if wave_skip < 0 else depth + 1)
+                if depth == 4:
+                    proportion = bound_4 if wave_skip < 0 else bound_5
+                    age = (ends[4] if wave_skip < 0 else ends[5]) / n
+                    if proportion > min_proportion and age > min_age:
+                        heapq.heappush(heap, (-(proportion * age), 1, order[c], idx_start, 5, c))
+                else:
+                    bound = bound_4 if bound_4 > bound_5 else bound_5
+                    age_bound = reach[depth + 1, ends[depth + 1]] / n
+                    if bound > min_proportion and age_bound > min_age:
+                        heapq.heappush(heap, (-(bound * age_bound), 0, 0, idx_start, depth + 1, c))
+            c = skip[depth, c]
+
+    return hits[:n_hits].copy(), scores[:n_hits].copy()
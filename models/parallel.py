@@ -0,0 +1,112 @@
+from __future__ import annotations
+from multiprocessing import Pool, shared_memory
+import numpy as np
+import weakref
+from models.kernels import OPTION, RULES
+
+# state of a worker process, set by _init_worker()
+_shared = None
+_analyzer = None
+
+
+def shard_options(options: np.array, n_shards: int) -> list:
+    """
+    Splits the WaveOptions into groups with the same prefix (first skip, or the first two skips etc. until there are at
+    least n_shards groups), so the prefix tree walk of every group still shares its waves. Largest groups first.
+
+    :param options: (N, 5) values of the WaveOptions
+    :param n_shards: minimal number of groups
+    :return: list of arrays of indices into options
+    """
+    if len(options) == 0:
+        return list()
+
+    for depth in range(1, options.shape[1] + 1):
+        keys, inverse = np.unique(options[:, :depth], axis=0, return_inverse=True)
+        if len(keys) >= n_shards:
+            break
+
+    order = np.argsort(inverse.reshape(-1), kind='stable')
+    shards = np.split(order, np.flatnonzero(np.diff(inverse.reshape(-1)[order])) + 1)
+    return sorted(shards, key=len, reverse=True)
+
+
+class SearchPool:
+    """
+    Process pool searching the WaveOptions of one WaveAnalyzer in parallel, see WaveAnalyzer.search_impulsive_waves().
+    The lows / highs are put into shared memory once (in their dtype, e.g. float32 stays float32) and every worker
+    builds its WaveAnalyzer once, so the process startup and the MonoWaveTable of a worker are paid for by the first
+    search only; later searches reuse them (and the search cache of the workers).
+
+    The pool lives until close() (WaveAnalyzer.close(), or append() as the bars change), or until it is garbage
+    collected.
+    """
+    def __init__(self, lows: np.array, highs: np.array, workers: int):
+        n = len(lows)
+        dtype = np.result_type(lows.dtype, highs.dtype)
+        self.workers = workers
+        self.__shm = shared_memory.SharedMemory(create=True, size=max(2 * n * dtype.itemsize, 1))
+        prices = np.ndarray((2, n), dtype=dtype, buffer=self.__shm.buf)
+        prices[0], prices[1] = lows, highs
+        del prices
+
+        self.__pool = Pool(workers, initializer=_init_worker, initargs=(self.__shm.name, n, dtype.str))
+        self.__finalizer = weakref.finalize(self, _release, self.__pool, self.__shm)
+
+    @property
+    def closed(self) -> bool:
+        return not self.__finalizer.alive
+
+    def search(self, options: np.array, idx_starts: np.array, rules: list = None, compiled: bool = True,
+               unique: bool = False, end_window: tuple = None) -> np.array:
+        """
+        WaveAnalyzer.search_impulsive_waves() with the WaveOptions split across the workers. The rules are passed by
+        class and name, as their conditions are lambdas. The hits are the same as the ones of a single process, as the
+        shards are searched independently.
+
+        :param options: (N, 5) values of the WaveOptions
+        :param idx_starts: start indices of wave1
+        :param rules:
+        :param compiled:
+        :param unique: drop duplicate waves within every shard, see WaveAnalyzer.search_impulsive_waves()
+        :param end_window: see WaveAnalyzer.search_impulsive_waves()
+        :return: hits of all shards (unordered), see WaveAnalyzer.search_impulsive_waves()
+        """
+        rule_specs = None if rules is None else [(type(rule), rule.name) for rule in rules]
+        shards = shard_options(options, 4 * self.workers)
+        hits = list(self.__pool.imap_unordered(_search_shard, [(options[shard], shard, idx_starts, rule_specs, compiled,
+                                                                unique, end_window) for shard in shards]))
+        return np.concatenate(hits) if hits else np.empty((0, RULES + 1), dtype=np.int64)
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory
+
+        :return:
+        """
+        self.__finalizer()
+
+
+def _release(pool, shm):
+    pool.terminate()
+    pool.join()
+    shm.close()
+    shm.unlink()
+
+
+def _init_worker(shm_name: str, n: int, dtype: str):
+    from models.WaveAnalyzer import WaveAnalyzer
+
+    global _shared, _analyzer
+    _shared = shared_memory.SharedMemory(name=shm_name)
+    prices = np.ndarray((2, n), dtype=dtype, buffer=_shared.buf)
+    # the start indices are passed with every search
+    _analyzer = WaveAnalyzer.from_arrays(prices[0], prices[1], minimum=np.zeros(n, dtype=bool))
+
+
+def _search_shard(args) -> np.array:
+    options, option_indices, idx_starts, rule_specs, compiled, unique, end_window = args
+    rules = None if rule_specs is None else [rule_cls(name) for rule_cls, name in rule_specs]
+    hits = _analyzer.search_impulsive_waves(options, rules, compiled, unique, end_window, idx_starts)
+    hits[:, OPTION] = option_indices[hits[:, OPTION]]
+    return hits
@@ -1,21 +1,25 @@
-import yfinance as yf
-import requests_cache
 import numpy as np
 import os
-import MetaTrader5 as mt5
 from time import sleep
 from pandas import DataFrame, to_datetime
 from models.WavePattern import WavePattern
 from models.WaveRules import Impulse, LeadingDiagonal
 from models.WaveAnalyzer import WaveAnalyzer
 from models.WaveOptions import WaveOptionsGeneratorWithRange
-from models.helpers import plot_pattern
 from models.WaveScore import WaveScore
-from models.RoboForexData import RoboForexData
-from multiprocessing import Pool
+from models.ResultBuffer import ResultBuffer
+from models.BatchScreener import BatchScreener
+from models.BarStore import BarStore
+from models.BarSources import RoboForexSource
+from models.TimeframePipeline import TimeframePipeline
+from models.functions import local_minimums
+from models.kernels import START, OPTION, WAVE1_END, WAVE2_END, WAVE3_END, WAVE4_END, WAVE5_END, RULES
+from models.TopK import TopK
 from datetime import datetime, timedelta
 
 POOL = 1  # 1 for single process; 2 or more for multiprocessing (limited debugging)
+TIMEOUT = 300  # seconds per ticker with POOL > 1, None for no limit
+WORKERS = 1  # processes searching the wave options of one ticker; use with POOL = 1
 PERIOD = '1d'
 INTERVAL = '5m'
 VLT_WINDOW = 12  # Min/Max within VLT_WINDOW bars
@@ -24,7 +28,12 @@ WITH_RANGE = 3  # with range +/- in relation to WAVE_UP_TO, e.g. for wave option
 WAVE_PROPORTION_THRESHOLD = 0.5  # Proportion score minimum
 WAVE_AGE_THRESHOLD = 0.5  # The last wave point should be later 80%
 LIMIT = 3  # Number of the best charts to present
+SEARCH_BEST = False  # only search the LIMIT best waves of a ticker (branch and bound), instead of all of them
 COUNT = 200  # Number of bars
+TIMEFRAME = 'M5'  # MetaTrader timeframe of the bars, e.g. 'M5' for mt5.TIMEFRAME_M5
+BARS_DIR = 'data/bars'  # local store of the fetched bars
+TIMEFRAMES = None  # e.g. ['5min', '15min', '1h', '4h'] to resample the TIMEFRAME bars and scan every timeframe
+RESULTS_FILE = None  # e.g. 'data/results.parquet' or 'data/results.arrow' (needs pyarrow)
 LOOPBACK_DAYS = 1  # Number of days to loop back
 TICKERS = ['EURUSD', 'JPYUSD', 'GBPUSD', 'AUDUSD', 'NZDUSD', 'EURJPY', 'GBPJPY', 'EURGBP', 'EURCAD',
            'EURSEK', 'EURCHF', 'EURHUF', 'EURJPY', 'CNYUSD', 'HKDUSD', 'SGDUSD', 'INRUSD', 'MXNUSD', 'PHPUSD',
@@ -36,151 +45,266 @@ password = os.getenv('ROBOFOREX_PASSWORD', '')
 
 
 def main():
+    # data sources are only needed here, so find_minimums() and worker() can be used (e.g. benchmarked) without them
+    import requests_cache
+    from models.RoboForexData import RoboForexData
+
     session = requests_cache.CachedSession(cache_name='data/yfinance.cache', expire_after=300)
     session.headers['User-agent'] = 'screener.py'
-    params = []
-    report = DataFrame()
-    for ticker in TICKERS:
-        # yf_ticker = yf.Ticker(ticker, session=session)
-        # data = yf_ticker.history(period=PERIOD, interval=INTERVAL)
-
-        rf = RoboForexData(server, user, password)
-        data_rf = rf.get_bars(symbol=ticker,
-                              timeframe=mt5.TIMEFRAME_M5,
-                              date_from=datetime.now()-timedelta(LOOPBACK_DAYS),
-                              count=COUNT)
-        if data_rf is None:
-            print(f"No data for: {ticker}")
-            continue
-        rf_dataframe = DataFrame(data_rf)
-
-        rf_dataframe.loc[:, 'Date'] = [datetime.fromtimestamp(x) for x in DataFrame(rf_dataframe)["time"]]
-        rf_dataframe.rename(columns={'open': 'Open',
-                                     'high': 'High',
-                                     'low': 'Low',
-                                     'close': 'Close'}, inplace=True)
-        data = rf_dataframe[["Date", "Open", "High", "Low", "Close"]]
-        # Merging 1h into 4h dataframe
-        # ohlc_dict = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last'}
-        # data = hist_1h.resample('240T').apply(ohlc_dict).dropna(how='any')
-
-        args = {
-            'ticker': ticker,
-            'data': data
-        }
-        params.append(args)
-
-    if POOL <= 1:
-        for param in params:
-            result = worker(param)
-            if result is not None:
-                report = report.append(result)
-    else:
-        with Pool(POOL) as p:
-            # Running in parallel
-            result = p.map(worker, iter(params))
-            if result is not None:
-                report = report.append(result)
-            p.close()
-            p.join()
 
-    print(report)
+    # one connection for all tickers; the store only fetches the bars which are not on disk yet
+    rf = RoboForexData(server, user, password)
+    store = BarStore(BARS_DIR, RoboForexSource(rf))
+
+    def tasks():
+        # fetched lazily, so the first tickers are analyzed while the next ones are fetched. Every ticker once, as the
+        # bars in flight are kept by ticker (TICKERS may list a ticker twice)
+        for ticker in dict.fromkeys(TICKERS):
+            # yf_ticker = yf.Ticker(ticker, session=session)
+            # data = yf_ticker.history(period=PERIOD, interval=INTERVAL)
+
+            data = store.get(ticker, TIMEFRAME, count=COUNT, until=datetime.now()-timedelta(LOOPBACK_DAYS))
+            if data is None or len(data) == 0:
+                print(f"No data for: {ticker}")
+                continue
+            datas[ticker] = data
+            yield ticker, data
+
+    # the workers only return the results, the charts are plotted here
+    datas = dict()
+
+    def plot(ticker_result):
+        data = datas.pop(ticker_result.ticker)
+        if ticker_result.status == 'done':
+            plot_results(ticker_result.ticker, data, ticker_result.result)
+
+    # with TIMEFRAMES, the bars are fetched once in the finest timeframe and resampled in the workers
+    batch_screener = BatchScreener(analyze_timeframes if TIMEFRAMES else analyze, processes=POOL, timeout=TIMEOUT)
+    report = batch_screener.screen(tasks(), on_result=plot)
+
+    print(report.to_frame())
+    if RESULTS_FILE is not None:
+        if RESULTS_FILE.endswith('.parquet'):
+            report.write_parquet(RESULTS_FILE)
+        else:
+            report.write_arrow(RESULTS_FILE)
+
 
 def find_minimums(data: DataFrame):
     '''
-    Finds local minimal values
+    Finds local minimal values: the low is the minimum of the VLT_WINDOW bars before and after it (column Minimum)
     '''
-
-    data.loc[:, 'Lowest_Start'] = data['Low'].rolling(window=VLT_WINDOW, min_periods=VLT_WINDOW).min()
-    data.loc[:, 'Minimum_Start'] = data['Low'] == data['Lowest_Start']
-    # Reverse datafreame
-    data = data.iloc[::-1]
-    data.loc[:, 'Lowest_End'] = data['Low'].rolling(window=VLT_WINDOW, min_periods=VLT_WINDOW).min()
-    data.loc[:, 'Minimum_End'] = data['Low'] == data['Lowest_End']
-    # Reverse datafreame
-    data = data.iloc[::-1]
-    # Minimum should be from both sides
-    data['Minimum'] = np.logical_and(data['Minimum_Start'], data['Minimum_End'])
-    # Remove unnecessary columns
-    data = data.drop(['Lowest_Start', 'Minimum_Start', 'Lowest_End', 'Minimum_End'], axis=1)
+    data = data.copy()
+    data['Minimum'] = local_minimums(data['Low'].to_numpy(dtype=float), VLT_WINDOW)
     return data
 
 
-def worker(params: {}) -> {}:
-    data = params['data']
-    ticker = params['ticker']
+def age_window(data_size: int) -> tuple:
+    '''
+    Indices a wave has to end at for an age score (wave end / data_size) above WAVE_AGE_THRESHOLD, the end_window of
+    the search
+    '''
+    ends = np.arange(data_size)
+    late = ends[ends / data_size > WAVE_AGE_THRESHOLD]
+    return (int(late[0]), data_size - 1) if len(late) else (data_size, data_size - 1)
+
+
+def best_hits(wa: WaveAnalyzer, wave_options, rules: list, data_size: int) -> np.array:
+    '''
+    The hits of the LIMIT results of analyze() which plot_results() picks, searched best first with
+    WaveAnalyzer.best_impulsive_waves() instead of scoring every hit. Whether analyze() reports a hit depends on the
+    hits of the WaveOptions before it, whatever their scores: for every best hit, the hits with the same waves (searched
+    from its start) and the hits with the same WaveOptions.values[:4] (searched from every start) are decided in the
+    order of analyze(). More best hits are searched until LIMIT results beat all the hits left.
+
+    :param wa:
+    :param wave_options: the wave_options of analyze()
+    :param rules: the rules of analyze()
+    :param data_size: number of bars
+    :return: (M <= LIMIT, 8) hits as WaveAnalyzer.search_impulsive_waves(), ordered by OPTION and START
+    '''
+    options = wa.option_array(wave_options)
+    waves_columns = [START, WAVE1_END, WAVE2_END, WAVE3_END, WAVE4_END, WAVE5_END]
+
+    def scores(hits: np.array) -> np.array:
+        wave_ends = np.where(hits[:, WAVE5_END] < 0, hits[:, WAVE4_END], hits[:, WAVE5_END])
+        return WaveScore.values(wa.wave_lengths(hits, options)) * wave_ends / data_size
+
+    def search(option_rows: np.array, idx_starts: list = None, end_window: tuple = age_window(data_size)) -> np.array:
+        # the hits analyze() passes to its loop, in its order (option_rows ascending)
+        hits = wa.search_impulsive_waves(options[option_rows], rules, compiled=True, end_window=end_window,
+                                         idx_starts=None if idx_starts is None else np.array(idx_starts))
+        hits[:, OPTION] = option_rows[hits[:, OPTION]]
+        return hits[WaveScore.values(wa.wave_lengths(hits, options)) > WAVE_PROPORTION_THRESHOLD]
+
+    same_waves = dict()  # (start, end) of waves -> hits of every WaveOptions ending there
+    prefixes = dict()  # WaveOptions.values[:4] -> [hits, number of them decided, position of the first result]
+    reported = dict()  # (OPTION, START) -> the hit is a result of analyze()
+
+    def waves_of(hit: np.array) -> np.array:
+        end = int(hit[WAVE4_END] if hit[WAVE5_END] < 0 else hit[WAVE5_END])
+        if (int(hit[START]), end) not in same_waves:
+            same_waves[int(hit[START]), end] = search(np.arange(len(options)), [int(hit[START])], (end, end))
+        hits = same_waves[int(hit[START]), end]
+        return hits[(hits[:, waves_columns] == hit[waves_columns]).all(axis=1)]
+
+    def first_of_waves(hit: np.array) -> bool:
+        # no hit with the same waves is reported before
+        return not any(is_reported(other) for other in waves_of(hit) if other[OPTION] < hit[OPTION])
+
+    def prefix_reported_before(prefix: tuple, position: tuple) -> bool:
+        if prefix not in prefixes:
+            prefixes[prefix] = [search(np.flatnonzero((options[:, :4] == prefix).all(axis=1))), 0, None]
+        state = prefixes[prefix]
+        hits = state[0]
+        # until the first result, a hit with the prefix is reported if it is the first one of its waves
+        while state[2] is None and state[1] < len(hits) and (hits[state[1], OPTION], hits[state[1], START]) < position:
+            hit = hits[state[1]]
+            state[1] += 1
+            if first_of_waves(hit):
+                state[2] = (hit[OPTION], hit[START])
+        return state[2] is not None and state[2] < position
+
+    def is_reported(hit: np.array) -> bool:
+        position = (hit[OPTION], hit[START])
+        if position not in reported:
+            reported[position] = first_of_waves(hit) and (
+                    options[hit[OPTION], 4] >= 0 or not prefix_reported_before(tuple(options[hit[OPTION], :4]), position))
+        return reported[position]
 
-    data = find_minimums(data)
+    k = LIMIT
+    while True:
+        best = wa.best_impulsive_waves(options, k, rules, WAVE_PROPORTION_THRESHOLD, WAVE_AGE_THRESHOLD)
+        # the best hit is the first one of its waves, the result may be a later one (same score)
+        results = [next((other for other in waves_of(hit) if is_reported(other)), None) for hit in best]
+        results = np.array([hit for hit in results if hit is not None], dtype=np.int64).reshape(-1, 8)
+        values = scores(results)
+        if len(best) < k or (len(results) >= LIMIT and -np.sort(-values)[LIMIT - 1] > scores(best[-1:])[0]):
+            break
+        k *= 2
+    # the LIMIT best, of the same scores the first ones of analyze() as TopK in plot_results() picks them
+    results = results[np.lexsort((results[:, START], results[:, OPTION], -values))[:LIMIT]]
+    return results[np.lexsort((results[:, START], results[:, OPTION]))]
 
-    wa = WaveAnalyzer(df=data, verbose=False)
+
+def worker(params: {}) -> ResultBuffer:
+    results = analyze(params['ticker'], params['data'])
+    if params.get('plot', True):
+        plot_results(params['ticker'], params['data'], results)
+    return results
+
+
+def analyze_timeframes(ticker: str, data: DataFrame) -> ResultBuffer:
+    '''
+    analyze() for every timeframe in TIMEFRAMES, resampled from data (the finest bars)
+    '''
+    pipeline = TimeframePipeline(data, TIMEFRAMES, window=VLT_WINDOW, workers=WORKERS)
+    results = ResultBuffer()
+    try:
+        for timeframe in pipeline.timeframes:
+            results.extend(analyze(ticker, pipeline.frame(timeframe), timeframe, pipeline.analyzer(timeframe)))
+    finally:
+        pipeline.close()
+    return results
+
+
+def analyze(ticker: str, data: DataFrame, timeframe: str = '', wa: WaveAnalyzer = None) -> ResultBuffer:
+    '''
+    Finds the impulses of the bars. With WORKERS > 1, the process pool of a WaveAnalyzer built here is stopped at the
+    end; the one of a given WaveAnalyzer is kept for its next search
+    '''
+    if wa is None:
+        data = find_minimums(data)
+        wa = WaveAnalyzer(df=data, verbose=False, workers=WORKERS)
+        try:
+            return analyze(ticker, data, timeframe, wa)
+        finally:
+            wa.close()
     wave_options_impulse = WaveOptionsGeneratorWithRange(up_to=WAVE_UP_TO, with_range=WITH_RANGE)
 
     impulse = Impulse('impulse')
     leading_diagonal = LeadingDiagonal('leading diagonal')
     rules_to_check = [impulse, leading_diagonal]
 
-    idx_start = np.argmin(np.array(list(data['Low'])))
+    idx_start = np.argmin(data['Low'].to_numpy())
 
     # print(f'Start at idx: {idx_start}')
     # print(f'will run up to {wave_options_impulse.number / 1e6}M combinations.')
 
-    # set up a set to store already found wave counts
     # it can be the case, that 2 WaveOptions lead to the same WavePattern.
     # This can be seen in a chart, where for example we try to skip more maxima as there are. In such a case
     # e.g. [1,2,3,4,5] and [1,2,3,4,10] will lead to the same WavePattern (has same sub-wave structure, same begin / end,
     # same high / low etc.
-    # If we find the same WavePattern, we skip and do not plot it
-
-    wavepatterns_up = set()
-
-    # loop over all combinations of wave options [i,j,k,l,m] for impulsive waves sorted from small, e.g.  [0,1,...] to
-    # large e.g. [3,2, ...]
-    results = DataFrame()
-    wavepatterns_up_to_plot = []
-    for new_option_impulse in wave_options_impulse.options_sorted:
-        all_waves_up = wa.find_5_impulsive_waves(wave_config=new_option_impulse.values)
-        for waves_up in all_waves_up:
-            wavepattern_up = WavePattern(waves_up, verbose=False)
-            for rule in rules_to_check:
-                if wavepattern_up.check_rule(rule):
-                    if wavepattern_up in wavepatterns_up:
-                        continue
-                    else:
-                        scoring = WaveScore(waves_up)
-                        proportion_score = scoring.value()
-                        age_score = wavepattern_up.idx_end / data.index.size
-                        if proportion_score > WAVE_PROPORTION_THRESHOLD and age_score > WAVE_AGE_THRESHOLD:
-                            to_check = []
-                            if new_option_impulse.m is None and len(results) > 0:
-                                to_check = [r for r in results['new_option_impulse'] if r[0] == new_option_impulse.i and \
-                                            r[1] == new_option_impulse.j and \
-                                            r[2] == new_option_impulse.k and \
-                                            r[3] == new_option_impulse.l]
-                            if len(to_check) == 0:
-                                wavepatterns_up.add(wavepattern_up)
-                                print(f'{rule.name} found: {new_option_impulse.values}')
-                                result = {
-                                    'ticker': ticker,
-                                    'rule': rule.name,
-                                    'new_option_impulse': new_option_impulse.values,
-                                    'proportion_score': proportion_score,
-                                    'data_size': data.index.size,
-                                    'wave_end': wavepattern_up.idx_end,
-                                    'age_score': age_score
-                                }
-                                results = results.append(result, ignore_index=True)
-                                wavepatterns_up_to_plot.append({
-                                    'wave_pattern': wavepattern_up,
-                                    'result': result
-                                })
-    wavepatterns_up_to_plot = sorted(wavepatterns_up_to_plot, key=lambda w: w['result']['proportion_score'] * w['result']['age_score'], reverse=True)[:LIMIT]
-    if len(wavepatterns_up_to_plot) > 0:
-        plot_pattern(df=data, wave_patterns=wavepatterns_up_to_plot,
-                     title=ticker + ' (period: ' + PERIOD + ', interval: ' + INTERVAL + '):<BR />')
-        sleep(1)
+    # If we find the same WavePattern, we skip and do not plot it. The duplicates are dropped by their boundary
+    # indices (WavePattern.key) below, only once a WaveOptions of the pattern is reported: if the first one is dropped
+    # by the prefix rule, a later one with the same waves may still be reported.
+
+    # all combinations of wave options [i,j,k,l,m] for impulsive waves sorted from small, e.g.  [0,1,...] to
+    # large e.g. [3,2, ...]. The hits are scored at once from the wave lengths, no MonoWave is built.
+    # with SEARCH_BEST, the hits are only the ones of the LIMIT results plot_results() picks (best_hits()).
+    # Otherwise only waves ending late enough for WAVE_AGE_THRESHOLD are searched (age_window()), the starts and
+    # WaveOptions which can not reach these bars are pruned
+    if SEARCH_BEST:
+        hits = best_hits(wa, wave_options_impulse, rules_to_check, data.index.size)
+    else:
+        hits = wa.search_impulsive_waves(wave_options_impulse, rules_to_check, compiled=True,
+                                         end_window=age_window(data.index.size))
+    options = wave_options_impulse.to_array()
+    proportion_scores = WaveScore.values(wa.wave_lengths(hits, options))
+    bounds = hits[:, [START, WAVE1_END, WAVE2_END, WAVE3_END, WAVE4_END, WAVE5_END]]  # WavePattern.key
+    wave_ends = np.where(bounds[:, 5] < 0, bounds[:, 4], bounds[:, 5])  # WavePattern.idx_end
+    age_scores = wave_ends / data.index.size
+    passed = (proportion_scores > WAVE_PROPORTION_THRESHOLD) & (age_scores > WAVE_AGE_THRESHOLD)
+
+    results = ResultBuffer()
+    result_prefixes = set()  # WaveOptions.values[:4] of the results
+    result_keys = set()  # WavePattern.key of the results
+    for row in np.flatnonzero(passed).tolist():
+        waves_key = tuple(None if idx < 0 else idx for idx in bounds[row].tolist())
+        if waves_key in result_keys:
+            continue
+        new_option_impulse = [None if skip < 0 else skip for skip in options[hits[row, OPTION]].tolist()]
+        prefix = tuple(new_option_impulse[:4])
+        if new_option_impulse[4] is None and prefix in result_prefixes:
+            continue
+        result_prefixes.add(prefix)
+        result_keys.add(waves_key)
+
+        # a WavePattern is reported for the first rule it fulfills (bit r of RULES is rules_to_check[r])
+        rule = rules_to_check[(int(hits[row, RULES]) & -int(hits[row, RULES])).bit_length() - 1]
+        print(f'{rule.name} found: {new_option_impulse}')
+        results.add(ticker, rule.name, new_option_impulse, proportion_scores[row], data.index.size,
+                    int(wave_ends[row]), age_scores[row], waves_key, timeframe)
     return results
 
 
+def plot_results(ticker: str, data: DataFrame, results: ResultBuffer):
+    '''
+    Plots the LIMIT best results (proportion score * age score) of a ticker, one chart per timeframe. The waves are
+    rebuilt from the start index and the WaveOptions of the results.
+    '''
+    frame = results.to_frame()
+    if len(frame) == 0:
+        return
+    from models.helpers import plot_pattern
+
+    pipeline = TimeframePipeline(data, TIMEFRAMES, window=VLT_WINDOW) if TIMEFRAMES else None
+    for timeframe, timeframe_frame in frame.groupby('timeframe', observed=True, sort=False):
+        best_rows = TopK(LIMIT)
+        best_rows.extend((timeframe_frame['proportion_score'] * timeframe_frame['age_score']).to_numpy())
+        best = timeframe_frame.iloc[best_rows.items()]
+        bars = data if timeframe == '' else pipeline.frame(timeframe)
+        wa = WaveAnalyzer(df=bars, window=VLT_WINDOW) if timeframe == '' else pipeline.analyzer(timeframe)
+        wavepatterns_up_to_plot = [{'wave_pattern': WavePattern(wa.impulsive_waves(int(row['idx_start']),
+                                                                                    row['new_option_impulse'])),
+                                    'result': row}
+                                   for _, row in best.iterrows()]
+        interval = INTERVAL if timeframe == '' else timeframe
+        plot_pattern(df=bars, wave_patterns=wavepatterns_up_to_plot,
+                     title=ticker + ' (period: ' + PERIOD + ', interval: ' + interval + '):<BR />')
+        sleep(1)
+
+
 if __name__ == '__main__':
     main()
     pass
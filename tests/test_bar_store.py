@@ -0,0 +1,50 @@
+from models.BarStore import BarStore
+from models.BarSources import CsvSource
+import numpy as np
+import pandas as pd
+
+
+def write_bars(directory, n: int, changed_last: bool = False):
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 1, 300))
+    bars = pd.DataFrame({'Date': pd.date_range('2022-01-03', periods=300, freq='5min'),
+                         'Open': close,
+                         'High': close + 1,
+                         'Low': close - 1,
+                         'Close': close})[:n]
+    if changed_last:
+        bars.loc[n - 1, 'High'] += 1
+    bars.to_csv(directory / 'EURUSD_M5.csv', index=False)
+    return bars
+
+
+def test_store_fetches_missing_tail_only(tmp_path):
+    source = CsvSource(tmp_path)
+    store = BarStore(str(tmp_path / 'bars'), source)
+    write_bars(tmp_path, 100)
+
+    assert len(store.get('EURUSD', 'M5')) == 100
+    assert source.fetched == 100
+    store.get('EURUSD', 'M5')
+    assert source.fetched == 101  # only the last bar is fetched again
+
+    bars = write_bars(tmp_path, 150, changed_last=True)
+    stored = store.get('EURUSD', 'M5', count=120)
+    assert source.fetched == 101 + 51
+    pd.testing.assert_frame_equal(stored, bars[30:].reset_index(drop=True), check_dtype=False)
+    pd.testing.assert_frame_equal(BarStore(str(tmp_path / 'bars')).get('EURUSD', 'M5'), bars, check_dtype=False)
+
+
+def test_store_fetches_older_bars_if_needed(tmp_path):
+    source = CsvSource(tmp_path)
+    store = BarStore(str(tmp_path / 'bars'), source)
+    bars = write_bars(tmp_path, 300)
+    until = bars['Date'][250]
+
+    assert len(store.get('EURUSD', 'M5', count=50, until=until)) == 50
+    assert source.fetched == 50
+
+    stored = store.get('EURUSD', 'M5', count=80, until=bars['Date'][260])
+    pd.testing.assert_frame_equal(stored, bars[180:260].reset_index(drop=True), check_dtype=False)
+    assert source.fetched == 50 + 11 + 20
+    assert isinstance(store.load('EURUSD', 'M5')['Low'], np.memmap)
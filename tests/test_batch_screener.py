@@ -0,0 +1,47 @@
+from models.BatchScreener import BatchScreener
+from models.ResultBuffer import ResultBuffer
+import numpy as np
+import pandas as pd
+import time
+
+
+def analyze(ticker: str, data: pd.DataFrame) -> ResultBuffer:
+    if ticker == 'SLOW':
+        time.sleep(30)
+    if ticker == 'FAIL':
+        raise ValueError('no bars')
+
+    results = ResultBuffer()
+    idx = int(np.argmax(data['High'].to_numpy()))
+    results.add(ticker, 'max', [idx, 0, 0, 0, None], 1.0, len(data), idx, idx / len(data), (0, 1, 2, 3, idx, None))
+    return results
+
+
+def tasks(tickers: list):
+    for seed, ticker in enumerate(tickers):
+        rng = np.random.default_rng(seed)
+        yield ticker, pd.DataFrame({'Low': rng.random(50), 'High': 1 + rng.random(50)})
+
+
+def test_pool_streams_results_of_all_tickers():
+    tickers = [f'T{i}' for i in range(10)] + ['FAIL']
+    screener = BatchScreener(analyze, processes=3, verbose=False)
+    ticker_results = list(screener.run(tasks(tickers)))
+
+    assert sorted(result.ticker for result in ticker_results) == sorted(tickers)
+    assert screener.counts == {'done': 10, 'failed': 1, 'timeout': 0}
+    assert screener.tickers_per_second > 0
+
+    expected = BatchScreener(analyze, processes=1, verbose=False).screen(tasks(tickers[:-1])).to_frame()
+    report = screener.screen(tasks(tickers)).to_frame()
+    assert sorted(report['wave_end']) == sorted(expected['wave_end'])
+
+
+def test_slow_ticker_times_out():
+    screener = BatchScreener(analyze, processes=2, timeout=1, verbose=False)
+    started = time.perf_counter()
+    ticker_results = {result.ticker: result for result in screener.run(tasks(['SLOW', 'A', 'B', 'C']))}
+
+    assert time.perf_counter() - started < 10
+    assert ticker_results['SLOW'].status == 'timeout'
+    assert all(ticker_results[ticker].status == 'done' for ticker in 'ABC')
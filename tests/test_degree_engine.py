@@ -0,0 +1,47 @@
+from models.DegreeEngine import DegreeEngine
+from models.MonoWave import MonoWave, MonoWaveUp, MonoWaveDown
+from models.WaveAnalyzer import WaveAnalyzer
+from models.WaveOptions import WaveOptionsGenerator3, WaveOptionsGenerator5
+from models.WavePattern import WavePattern
+from models.WaveRules import Impulse, Correction
+from tests.test_wave_analyzer import random_df
+
+
+def test_wave_of_higher_degree_spans_the_pattern():
+    wa = WaveAnalyzer(random_df(seed=2))
+    _, waves = wa.find_impulsive_waves(WaveOptionsGenerator5(4), [Impulse('impulse')])[0]
+    wave = MonoWave.from_wavepattern(WavePattern(waves), '1')
+
+    assert isinstance(wave, MonoWaveUp) and wave.degree == 2 and wave.label == '1'
+    assert (wave.idx_start, wave.idx_end) == (waves[0].idx_start, waves[4].idx_end)
+    assert (wave.low, wave.high) == (waves[0].low, waves[4].high)
+    assert wave.duration == waves[4].idx_end - waves[0].idx_start
+
+
+def test_degree_engine_chains_all_patterns_of_the_degree_below():
+    wa = WaveAnalyzer(random_df(n=3000, seed=0))
+    engine = DegreeEngine.from_analyzer(wa, WaveOptionsGenerator5(5), WaveOptionsGenerator3(5))
+    patterns = engine.build(3)
+
+    # every chain of the distinct spans of the degree-1 patterns, checked with the whole rules
+    spans = {(type(MonoWave.from_wavepattern(pattern)), pattern.idx_start, pattern.idx_end): pattern
+             for pattern in patterns[1]}
+    waves = {span: MonoWave.from_wavepattern(pattern) for span, pattern in spans.items()}
+    expected = set()
+    for directions, rule in [((MonoWaveUp, MonoWaveDown) * 2 + (MonoWaveUp, ), Impulse('impulse')),
+                             ((MonoWaveDown, MonoWaveUp, MonoWaveDown), Correction('correction'))]:
+        chains = [[span] for span in waves if span[0] is directions[0]]
+        for direction in directions[1:]:
+            chains = [chain + [span] for chain in chains for span in waves
+                      if span[0] is direction and span[1] == chain[-1][2]]
+        for chain in chains:
+            if WavePattern([waves[span] for span in chain]).check_rule(rule):
+                expected.add(tuple(span[1] for span in chain) + (chain[-1][2], ))
+
+    assert len(expected) > 0
+    assert {(pattern.idx_start, ) + pattern.key[1:] for pattern in patterns[2]} == expected
+    for pattern in patterns[2]:
+        assert pattern.degree == 2
+        for wave in pattern.waves.values():
+            assert all((component.idx_start, component.idx_end) == (wave.idx_start, wave.idx_end)
+                       for component in engine.components(wave))
@@ -1,4 +1,5 @@
-from models.MonoWave import MonoWaveUp
+from models.MonoWave import MonoWaveUp, MonoWaveDown
+from models.MonoWaveTable import MonoWaveTable
 import numpy as np
 
 
@@ -9,4 +10,38 @@ def test_monowave_instance_is_created():
 
     monowave_up = MonoWaveUp(lows, highs, dates, 0)
 
-    assert isinstance(monowave_up, MonoWaveUp)
\ No newline at end of file
+    assert isinstance(monowave_up, MonoWaveUp)
+
+def test_monowaves_have_slots_and_scan_the_arrays():
+    lows = np.array([1.0, 2.0, 1.5, 3.0, 2.5, 4.0, 0.5])
+    highs = lows + 0.5
+    dates = np.arange(len(lows))
+
+    monowave_up = MonoWaveUp(lows, highs, dates, 0, skip=1)
+    assert not hasattr(monowave_up, '__dict__')
+    assert (monowave_up.low, monowave_up.high, monowave_up.idx_end) == (1.0, 3.5, 3)
+    assert monowave_up.length == 2.5 and monowave_up.duration == 3
+    assert monowave_up.find_end() == (monowave_up.high, monowave_up.high_idx)
+
+    monowave_down = MonoWaveDown(lows, highs, dates, 5)
+    assert (monowave_down.high, monowave_down.low, monowave_down.idx_end) == (4.5, 0.5, 6)
+    assert monowave_down.length == 4.0 and monowave_down.duration == 1
+    assert monowave_down.find_end() == (monowave_down.low, monowave_down.low_idx)
+
+
+def test_monowaves_of_the_table_match_scanned_monowaves():
+    rng = np.random.default_rng(0)
+    lows = 100 + np.cumsum(rng.normal(0, 1, 200))
+    highs = lows + rng.random(200)
+    dates = np.arange(200)
+    table = MonoWaveTable(lows, highs, 4)
+
+    for wave_cls in [MonoWaveUp, MonoWaveDown]:
+        for idx_start in range(0, 200, 7):
+            for skip in range(4):
+                scanned = wave_cls(lows, highs, dates, idx_start, skip)
+                looked_up = wave_cls(lows, highs, dates, idx_start, skip, table)
+                assert (scanned.idx_end, scanned.low, scanned.high) == \
+                    (looked_up.idx_end, looked_up.low, looked_up.high)
+                if scanned.idx_end is not None:
+                    assert (scanned.length, scanned.duration) == (looked_up.length, looked_up.duration)
@@ -0,0 +1,78 @@
+from models.MonoWave import MonoWaveUp, MonoWaveDown
+from models.MonoWaveTable import MonoWaveTable
+from models.RangeIndex import RangeIndex
+from models.WaveOptions import MAX_UP_TO
+import numpy as np
+import pytest
+
+
+def random_bars(n: int, seed: int = 0, decimals: int = None):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    highs = close + rng.random(n)
+    lows = close - rng.random(n)
+    if decimals is not None:
+        highs, lows = np.round(highs, decimals), np.round(lows, decimals)
+    return lows, highs, np.arange(n)
+
+
+def test_table_matches_monowaves():
+    for decimals in [None, 0]:
+        lows, highs, dates = random_bars(200, decimals=decimals)
+        table = MonoWaveTable(lows, highs, up_to=8)
+
+        for idx_start in range(len(lows)):
+            for skip in range(8):
+                up = MonoWaveUp(lows, highs, dates, idx_start, skip)
+                down = MonoWaveDown(lows, highs, dates, idx_start, skip)
+
+                assert table.end(MonoWaveTable.UP, idx_start, skip) == (up.high, up.high_idx)
+                assert table.end(MonoWaveTable.DOWN, idx_start, skip) == (down.low, down.low_idx)
+
+
+def test_table_grows_for_larger_skips():
+    lows, highs, dates = random_bars(100)
+    table = MonoWaveTable(lows, highs, up_to=2)
+    down = MonoWaveDown(lows, highs, dates, 10, 5)
+
+    assert table.end(MonoWaveTable.DOWN, 10, 5) == (down.low, down.low_idx)
+    assert table.up_to == 6
+    with pytest.raises(ValueError):
+        table.ensure(MAX_UP_TO + 1)
+
+
+def test_table_keeps_the_price_dtype():
+    lows, highs, dates = random_bars(100)
+    table = MonoWaveTable(lows.astype(np.float32), highs.astype(np.float32), up_to=4)
+    assert table.ends.dtype == np.int32 and table.prices.dtype == np.float32
+
+    up = MonoWaveUp(lows.astype(np.float32), highs.astype(np.float32), dates, 10, 3)
+    assert table.end(MonoWaveTable.UP, 10, 3) == (up.high, up.high_idx)
+
+
+def test_range_index_matches_numpy():
+    lows, highs, _ = random_bars(257)
+    range_index = RangeIndex(lows, highs)
+
+    for idx_from in range(0, 257, 3):
+        for idx_to in range(idx_from + 1, 258, 7):
+            assert range_index.min_low(idx_from, idx_to) == np.min(lows[idx_from:idx_to])
+            assert range_index.max_high(idx_from, idx_to) == np.max(highs[idx_from:idx_to])
+
+
+def test_extended_table_matches_new_table():
+    for decimals in [None, 0]:
+        lows, highs, _ = random_bars(300, seed=1, decimals=decimals)
+        range_index = RangeIndex(lows[:100], highs[:100])
+        table = MonoWaveTable(lows[:100], highs[:100], up_to=8, range_index=range_index)
+
+        for n in [101, 102, 110, 150, 151, 300]:
+            range_index.extend(lows[:n], highs[:n])
+            table.extend(lows[:n], highs[:n])
+            new_table = MonoWaveTable(lows[:n], highs[:n], up_to=8)
+
+            assert np.array_equal(table.ends, new_table.ends)
+            assert np.array_equal(table.prices, new_table.prices, equal_nan=True)
+            assert np.array_equal(table.open_skip, new_table.open_skip)
+            assert range_index.min_low(0, n) == np.min(lows[:n])
+            assert range_index.max_high(n // 3, n) == np.max(highs[n // 3:n])
@@ -0,0 +1,53 @@
+from models.ResultBuffer import ResultBuffer
+import pandas as pd
+import pytest
+
+
+def fill(buffer: ResultBuffer, ticker: str, n: int):
+    for row in range(n):
+        rule = 'impulse' if row % 2 else 'leading diagonal'
+        buffer.add(ticker, rule, [row, 1, 2, 3, None if row % 3 else 4], 0.5 + row / 100, 200, 150 + row, 0.75,
+                   (row, 10, 20, 30, 40, None if row % 3 else 50))
+
+
+def test_buffer_grows_and_converts_to_frame():
+    buffer = ResultBuffer(capacity=2)
+    fill(buffer, 'EURUSD', 10)
+
+    assert len(buffer) == 10 and buffer.capacity >= 10
+    frame = buffer.to_frame()
+    assert list(frame['ticker']) == ['EURUSD'] * 10
+    assert frame['rule'].iloc[1] == 'impulse'
+    assert frame['new_option_impulse'].iloc[1] == [1, 1, 2, 3, None]
+    assert frame['new_option_impulse'].iloc[3] == [3, 1, 2, 3, 4]
+    assert frame['wave5_end'].iloc[3] == 50 and pd.isna(frame['wave5_end'].iloc[1])
+    assert frame['wave_end'].tolist() == list(range(150, 160))
+
+
+def test_empty_buffer_grows():
+    buffer = ResultBuffer(capacity=0)
+    buffer.add('EURUSD', 'impulse', [200, 1, 2, 3, None], 0.5, 200, 150, 0.75, (0, 10, 20, 30, 40, None))
+
+    assert len(buffer) == 1
+    assert buffer.to_frame()['new_option_impulse'].iloc[0] == [200, 1, 2, 3, None]
+
+
+def test_extend_remaps_categories():
+    first, second = ResultBuffer(), ResultBuffer()
+    fill(first, 'EURUSD', 3)
+    fill(second, 'AUDUSD', 5)
+    first.extend(second)
+
+    frame = first.to_frame()
+    assert list(frame['ticker']) == ['EURUSD'] * 3 + ['AUDUSD'] * 5
+    assert frame['rule'].iloc[3] == 'leading diagonal' and frame['rule'].iloc[4] == 'impulse'
+
+
+def test_write_parquet(tmp_path):
+    pytest.importorskip('pyarrow')
+    buffer = ResultBuffer()
+    fill(buffer, 'EURUSD', 4)
+    buffer.write_parquet(str(tmp_path / 'results.parquet'))
+
+    frame = pd.read_parquet(tmp_path / 'results.parquet')
+    assert len(frame) == 4 and list(frame['ticker']) == ['EURUSD'] * 4
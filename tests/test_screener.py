@@ -0,0 +1,60 @@
+from models.WaveAnalyzer import WaveAnalyzer
+from models.WaveOptions import WaveOptionsGeneratorWithRange
+from models.WavePattern import WavePattern
+from models.WaveRules import Impulse, LeadingDiagonal
+from models.WaveScore import WaveScore
+from models.TopK import TopK
+from tests.test_wave_analyzer import random_df
+import pytest
+import screener
+
+
+def test_analyze_reports_the_same_waves_as_single_options(monkeypatch):
+    monkeypatch.setattr(screener, 'WAVE_UP_TO', 8)
+    monkeypatch.setattr(screener, 'WAVE_AGE_THRESHOLD', 0)
+    df = random_df(n=400, seed=5)
+    df[['Low', 'High']] = df[['Low', 'High']].round(0)  # equivalent WaveOptions dropped by the prefix rule
+    data = screener.find_minimums(df)
+
+    # the loop of the screener over every WaveOptions, every start and every rule, without unique search
+    wa = WaveAnalyzer(data)
+    generator = WaveOptionsGeneratorWithRange(up_to=8, with_range=screener.WITH_RANGE)
+    expected, patterns = list(), set()
+    for wave_options, waves in wa.find_impulsive_waves(generator):
+        wave_pattern = WavePattern(waves)
+        for rule in [Impulse('impulse'), LeadingDiagonal('leading diagonal')]:
+            if not wave_pattern.check_rule(rule) or wave_pattern in patterns:
+                continue
+            proportion_score, age_score = WaveScore(waves).value(), wave_pattern.idx_end / len(data)
+            if proportion_score > screener.WAVE_PROPORTION_THRESHOLD and age_score > 0:
+                if wave_options.m is None and any(values[:4] == wave_options.values[:4] for _, values in expected):
+                    continue
+                patterns.add(wave_pattern)
+                expected.append((rule.name, wave_options.values))
+
+    report = screener.analyze('TEST', df).to_frame()
+    assert len(expected) > 0
+    assert list(zip(report['rule'], report['new_option_impulse'])) == expected
+
+
+def ranked(report) -> list:
+    # the results plot_results() picks
+    best = TopK(screener.LIMIT)
+    best.extend((report['proportion_score'] * report['age_score']).to_numpy())
+    report = report.iloc[best.items()]
+    return list(zip(report['rule'], report['new_option_impulse'], report['idx_start'], report['wave_end']))
+
+
+@pytest.mark.parametrize('seed, rounded, age_threshold', [(4, False, 0), (5, True, 0), (9, True, 0.5), (11, False, 0.5)])
+def test_search_best_picks_the_results_of_the_whole_search(monkeypatch, seed, rounded, age_threshold):
+    monkeypatch.setattr(screener, 'WAVE_UP_TO', 8)
+    monkeypatch.setattr(screener, 'WAVE_AGE_THRESHOLD', age_threshold)
+    df = random_df(n=400, seed=seed)
+    if rounded:
+        df[['Low', 'High']] = df[['Low', 'High']].round(0)  # waves with the same scores
+
+    expected = ranked(screener.analyze('TEST', df).to_frame())
+    monkeypatch.setattr(screener, 'SEARCH_BEST', True)
+    report = screener.analyze('TEST', df).to_frame()
+    assert len(expected) == screener.LIMIT
+    assert ranked(report) == expected
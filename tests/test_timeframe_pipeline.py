@@ -0,0 +1,25 @@
+from models.TimeframePipeline import TimeframePipeline
+from tests.test_wave_analyzer import random_df
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_resampled_bars_match_pandas():
+    df = random_df(n=2000, seed=0)
+    pipeline = TimeframePipeline(df, ['5min', '15min', '1h', '4h'])
+
+    for timeframe in pipeline.timeframes:
+        expected = df.set_index('Date').resample(timeframe).agg({'Open': 'first', 'High': 'max', 'Low': 'min',
+                                                                 'Close': 'last'}).dropna().reset_index()
+        pd.testing.assert_frame_equal(pipeline.frame(timeframe), expected, check_dtype=False)
+
+    first = pipeline.first_index('1h')
+    assert np.array_equal(df['Date'].to_numpy()[first], pipeline.frame('1h')['Date'].to_numpy())
+    assert pipeline.analyzer('4h') is pipeline.analyzer('4h')
+    assert len(pipeline.analyzer('4h').lows) == len(pipeline.frame('4h'))
+
+
+def test_timeframes_have_to_be_multiples():
+    with pytest.raises(ValueError):
+        TimeframePipeline(random_df(n=100), ['15min', '1h', '90min'])
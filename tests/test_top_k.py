@@ -0,0 +1,29 @@
+from models.TopK import TopK
+import numpy as np
+
+
+def test_top_k_matches_stable_sort():
+    scores = np.random.default_rng(0).integers(0, 20, 500).astype(float)  # many ties
+    expected = np.argsort(-scores, kind='stable')
+
+    for k in [0, 1, 3, 50, 1000]:
+        pushed = TopK(k)
+        for position, score in enumerate(scores.tolist()):
+            pushed.push(score, position)
+        extended = TopK(k)
+        extended.extend(scores[:200])
+        extended.extend(scores[200:], list(range(200, len(scores))))
+
+        assert pushed.items() == expected[:k].tolist()
+        assert extended.items() == expected[:k].tolist()
+        assert extended.scores() == scores[expected[:k]].tolist()
+
+
+def test_top_k_keeps_k_items():
+    top_k = TopK(3)
+    assert top_k.threshold == -np.inf
+    assert [top_k.push(score, name) for score, name in [(0.5, 'a'), (0.7, 'b'), (0.6, 'c'), (0.4, 'd'), (0.8, 'e')]] \
+        == [True, True, True, False, True]
+    assert len(top_k) == 3
+    assert top_k.threshold == 0.6
+    assert top_k.items() == ['e', 'b', 'c']
@@ -0,0 +1,321 @@
+from models.WaveAnalyzer import WaveAnalyzer
+from models.MonoWave import MonoWaveUp, MonoWaveDown
+from models.WaveOptions import WaveOptionsGenerator3, WaveOptionsGenerator5, WaveOptionsGeneratorWithRange
+from models.WaveCycle import WaveCycle
+from models.WavePattern import WavePattern
+from models.WaveRules import Impulse, LeadingDiagonal, Correction
+from models.WaveScore import WaveScore
+from models.TopK import TopK
+from models.functions import local_minimums
+import numpy as np
+import pandas as pd
+
+
+def random_df(n: int = 300, seed: int = 0, window: int = 12) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    df = pd.DataFrame({'Date': pd.date_range('2022-01-01', periods=n, freq='5min'),
+                       'Open': close,
+                       'High': close + rng.random(n),
+                       'Low': close - rng.random(n),
+                       'Close': close})
+    lows = df['Low']
+    minimum_start = lows == lows.rolling(window=window, min_periods=window).min()
+    minimum_end = (lows[::-1] == lows[::-1].rolling(window=window, min_periods=window).min())[::-1]
+    df['Minimum'] = minimum_start & minimum_end
+    return df
+
+
+def test_monowaves_are_shared():
+    wa = WaveAnalyzer(random_df())
+    wave = wa.get_monowave(MonoWaveUp, 10, 2, '1')
+
+    assert wa.get_monowave(MonoWaveUp, 10, 2, '1') is wave
+    assert wa.get_monowave(MonoWaveUp, 10, 2, '3') is not wave
+    assert wa.get_monowave(MonoWaveDown, 10, 2, '2') is not wave
+    assert wave.idx_end == MonoWaveUp(wa.lows, wa.highs, wa.dates, 10, 2).idx_end
+
+
+def test_monowave_cache_is_bounded():
+    wa = WaveAnalyzer(random_df(), cache_size=5)
+    for idx_start in range(20):
+        wa.get_monowave(MonoWaveUp, idx_start, 0, '1')
+
+    assert len(wa.monowave_cache) == 5
+    assert (MonoWaveUp, 19, 0, '1') in wa.monowave_cache
+    assert (MonoWaveUp, 0, 0, '1') not in wa.monowave_cache
+
+
+def test_option_tree_finds_same_waves_as_single_options():
+    for seed in range(3):
+        wa = WaveAnalyzer(random_df(seed=seed))
+        for generator in [WaveOptionsGenerator5(5), WaveOptionsGeneratorWithRange(7, 2)]:
+            wave_options = generator.options_sorted
+            expected = [(wave_option, waves) for wave_option in wave_options
+                        for waves in wa.find_5_impulsive_waves(wave_config=wave_option.values)]
+
+            assert wa.find_impulsive_waves(wave_options) == expected
+
+
+def test_rules_are_checked_while_waves_are_built():
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+    wa = WaveAnalyzer(random_df(seed=1))
+    wave_options = WaveOptionsGeneratorWithRange(7, 2).options_sorted
+
+    expected = [(wave_option, waves) for wave_option, waves in wa.find_impulsive_waves(wave_options)
+                if any(WavePattern(waves).check_rule(rule) for rule in rules)]
+
+    assert len(expected) > 0
+    assert wa.find_impulsive_waves(wave_options, rules) == expected
+    assert [(wave_option, waves) for wave_option in wave_options
+            for waves in wa.find_5_impulsive_waves(wave_option.values, rules)] == expected
+
+
+def test_option_tree_from_generator():
+    wa = WaveAnalyzer(random_df(seed=2))
+    generator = WaveOptionsGeneratorWithRange(7, 2)
+
+    assert wa.find_impulsive_waves(generator) == wa.find_impulsive_waves(generator.options_sorted)
+
+
+def test_compiled_search_finds_same_waves():
+    impulse, leading_diagonal = Impulse('impulse'), LeadingDiagonal('leading diagonal')
+    for seed in range(4):
+        df = random_df(seed=seed)
+        if seed % 2:
+            df[['Low', 'High']] = df[['Low', 'High']].round(0)
+        wa = WaveAnalyzer(df)
+        for generator in [WaveOptionsGenerator5(5), WaveOptionsGeneratorWithRange(7, 2)]:
+            for rules in [None, [impulse], [leading_diagonal], [impulse, leading_diagonal]]:
+                expected = wa.find_impulsive_waves(generator, rules)
+
+                assert wa.find_impulsive_waves(generator, rules, compiled=True) == expected
+            assert wa.find_impulsive_waves(generator.options_sorted[::-1], [impulse], compiled=True) == \
+                wa.find_impulsive_waves(generator.options_sorted[::-1], [impulse])
+
+
+def test_parallel_search_matches_single_process():
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+    df = random_df(seed=3)
+    generator = WaveOptionsGeneratorWithRange(7, 2)
+    wa = WaveAnalyzer(df)
+    wa_parallel = WaveAnalyzer(df, workers=2)
+
+    for compiled in [True, False]:
+        for rules_to_check in [None, rules]:
+            expected = wa.search_impulsive_waves(generator, rules_to_check, compiled)
+
+            assert np.array_equal(wa_parallel.search_impulsive_waves(generator, rules_to_check, compiled), expected)
+
+    def geometry(results):
+        return [(wave_option, [None if wave is None else (wave.idx_start, wave.idx_end, wave.low, wave.high)
+                               for wave in waves]) for wave_option, waves in results]
+
+    assert geometry(wa_parallel.find_impulsive_waves(generator.options_sorted, rules)) == geometry(
+        wa.find_impulsive_waves(generator.options_sorted, rules))
+    wa_parallel.close()
+
+    # float32 prices stay float32 in the shared memory, the pool is kept for the next searches
+    lows, highs = df['Low'].to_numpy(dtype=np.float32), df['High'].to_numpy(dtype=np.float32)
+    wa32 = WaveAnalyzer.from_arrays(lows, highs, minimum=wa.minimum)
+    wa32_parallel = WaveAnalyzer.from_arrays(lows, highs, minimum=wa.minimum, workers=2)
+    expected = wa32.search_impulsive_waves(generator, rules)
+    for _ in range(2):
+        assert np.array_equal(wa32_parallel.search_impulsive_waves(generator, rules), expected)
+    wa32_parallel.close()
+    assert np.array_equal(wa32_parallel.search_impulsive_waves(generator, rules), expected)
+    wa32_parallel.close()
+
+
+def test_wave_analyzer_from_arrays():
+    df = random_df(seed=4)
+    wa = WaveAnalyzer(df)
+    wa_arrays = WaveAnalyzer.from_arrays(df['Low'].to_numpy(), df['High'].to_numpy(), minimum=df['Minimum'].to_numpy())
+    generator = WaveOptionsGenerator5(5)
+
+    assert np.array_equal(wa_arrays.search_impulsive_waves(generator), wa.search_impulsive_waves(generator))
+
+
+def test_appended_bars_give_same_waves_as_new_analyzer():
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+    df = random_df(400, seed=5)
+    lows, highs = df['Low'].to_numpy(), df['High'].to_numpy()
+    generator = WaveOptionsGeneratorWithRange(7, 2)
+
+    wa = WaveAnalyzer.from_arrays(lows[:200], highs[:200], minimum=local_minimums(lows[:200], 12))
+    wa.search_impulsive_waves(generator, rules)
+    for n in [201, 205, 230, 231, 300, 400]:
+        wa.append(lows[len(wa.lows):n], highs[len(wa.highs):n], window=12)
+        new_wa = WaveAnalyzer.from_arrays(lows[:n], highs[:n], minimum=local_minimums(lows[:n], 12))
+
+        assert np.array_equal(wa.minimum, new_wa.minimum)
+        assert np.array_equal(wa.search_impulsive_waves(generator, rules), new_wa.search_impulsive_waves(generator, rules))
+
+
+def test_unique_waves():
+    df = random_df(seed=1)
+    df[['Low', 'High']] = df[['Low', 'High']].round(0)  # tied prices give the same waves for different skips
+    wa = WaveAnalyzer(df)
+    generator = WaveOptionsGeneratorWithRange(10, 3)
+
+    all_hits = wa.find_impulsive_waves(generator)
+    expected = list()
+    patterns = set()
+    for wave_option, waves in all_hits:
+        if WavePattern(waves) not in patterns:
+            patterns.add(WavePattern(waves))
+            expected.append((wave_option, waves))
+
+    assert len(expected) < len(all_hits)
+    assert wa.find_impulsive_waves(generator, unique=True) == expected
+    assert wa.find_impulsive_waves(generator, compiled=True, unique=True) == expected
+
+
+def test_unique_search_skips_saturated_options():
+    df = random_df(n=1000, seed=2)
+    df[['Low', 'High']] = df[['Low', 'High']].round(0)
+    wa = WaveAnalyzer(df)
+    options = WaveOptionsGeneratorWithRange(15, 2).to_array()
+    options = options[np.random.default_rng(0).permutation(len(options))]
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+
+    for rule_set in [None, rules]:
+        expected = WaveAnalyzer.unique_hits(wa.search_impulsive_waves(options, rule_set))
+        assert np.array_equal(wa.search_impulsive_waves(options, rule_set, unique=True), expected)
+
+
+def test_extrema_match_rolling_windows():
+    df = random_df(n=500, seed=3)
+    df[['Low', 'High']] = df[['Low', 'High']].round(0)
+    wa = WaveAnalyzer(df.drop(columns='Minimum'))
+
+    for window, (minimums, maximums) in zip([3, 12, 30], wa.extrema(3, 12, 30)):
+        lows, highs = df['Low'], df['High']
+        minimum = (lows == lows.rolling(window).min()) & (lows == lows[::-1].rolling(window).min()[::-1])
+        maximum = (highs == highs.rolling(window).max()) & (highs == highs[::-1].rolling(window).max()[::-1])
+        assert np.array_equal(minimums, np.flatnonzero(minimum))
+        assert np.array_equal(maximums, np.flatnonzero(maximum))
+
+    assert np.array_equal(wa.start_indices(), wa.extrema(12)[0][0])
+    df = random_df(n=500, seed=4)
+    assert np.array_equal(WaveAnalyzer(df.drop(columns='Minimum')).start_indices(), WaveAnalyzer(df).start_indices())
+
+
+def test_wave_analyzer_uses_memmap_without_copy(tmp_path):
+    df = random_df(n=500, seed=5)
+    generator = WaveOptionsGeneratorWithRange(10, 3)
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+
+    columns = dict()
+    for column in ['Low', 'High']:
+        columns[column] = np.memmap(tmp_path / f'{column}.dat', dtype=np.float32, mode='w+', shape=len(df))
+        columns[column][:] = df[column].to_numpy(dtype=np.float32)
+    wa = WaveAnalyzer.from_arrays(columns['Low'], columns['High'], window=12)
+
+    assert np.shares_memory(wa.lows, columns['Low']) and wa.lows.dtype == np.float32
+    df[['Low', 'High']] = df[['Low', 'High']].astype(np.float32).astype(float)
+    expected = WaveAnalyzer.from_arrays(df['Low'].to_numpy(), df['High'].to_numpy(), window=12)
+    assert np.array_equal(wa.search_impulsive_waves(generator, rules), expected.search_impulsive_waves(generator, rules))
+    assert [waves[2].high for _, waves in wa.find_impulsive_waves(generator, rules)] == \
+        [waves[2].high for _, waves in expected.find_impulsive_waves(generator, rules)]
+
+
+def test_wave_scores_of_hits_match_wave_score():
+    wa = WaveAnalyzer(random_df(n=1000, seed=3))
+    generator = WaveOptionsGeneratorWithRange(10, 3)
+    hits = wa.search_impulsive_waves(generator)
+    options = generator.to_array()
+    expected = [WaveScore(wa.impulsive_waves(idx_start, [None if skip < 0 else skip
+                                                         for skip in options[option_idx].tolist()])).value()
+                for idx_start, option_idx in hits[:, :2].tolist()]
+
+    assert len(hits) > 0 and (hits[:, -2] < 0).any()
+    assert np.array_equal(WaveScore.values(wa.wave_lengths(hits, generator)), expected, equal_nan=True)
+
+
+def test_best_first_search_matches_top_k_of_all_hits():
+    df = random_df(n=2000, seed=4)
+    df[['Low', 'High']] = df[['Low', 'High']].round(0)  # tied scores and duplicated waves
+    wa = WaveAnalyzer(df)
+    generator = WaveOptionsGeneratorWithRange(10, 3)
+
+    for rules, k, min_proportion, min_age in [(None, 5, 0.0, 0.0), (None, 40, 0.3, 0.5),
+                                              ([Impulse('impulse'), LeadingDiagonal('leading diagonal')], 5, 0.0, 0.0)]:
+        hits = wa.search_impulsive_waves(generator, rules, unique=True)
+        wave_ends = np.where(hits[:, -2] < 0, hits[:, -3], hits[:, -2])
+        proportion_scores, age_scores = WaveScore.values(wa.wave_lengths(hits, generator)), wave_ends / len(df)
+        passed = np.flatnonzero((proportion_scores > min_proportion) & (age_scores > min_age))
+        top_k = TopK(k)
+        top_k.extend((proportion_scores * age_scores)[passed], passed.tolist())
+
+        best = wa.best_impulsive_waves(generator, k, rules, min_proportion, min_age)
+        assert len(best) == min(k, len(passed))
+        assert np.array_equal(best, hits[top_k.items()])
+
+
+def test_end_window_prunes_to_the_same_hits():
+    df = random_df(n=3000, seed=0)
+    generator = WaveOptionsGenerator5(8)
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal')]
+    hits = WaveAnalyzer(df).search_impulsive_waves(generator, rules, unique=True)
+    wave_ends = np.where(hits[:, -2] < 0, hits[:, -3], hits[:, -2])
+
+    for end_window in [(1500, 2999), (2940, 2999), (1000, 1500)]:
+        expected = hits[(wave_ends >= end_window[0]) & (wave_ends <= end_window[1])]
+        assert np.array_equal(WaveAnalyzer(df).search_impulsive_waves(generator, rules, unique=True,
+                                                                      end_window=end_window), expected)
+
+    wa = WaveAnalyzer(random_df(n=400, seed=2))
+    hits = wa.search_impulsive_waves(generator, rules, compiled=False)
+    wave_ends = np.where(hits[:, -2] < 0, hits[:, -3], hits[:, -2])
+    assert np.array_equal(wa.search_impulsive_waves(generator, rules, compiled=False, end_window=(200, 399)),
+                          hits[wave_ends >= 200])
+
+
+def test_corrective_waves_match_single_options():
+    wa = WaveAnalyzer(random_df(seed=5))
+    generator = WaveOptionsGenerator3(8)
+    correction = Correction('correction')
+
+    for idx_start in wa.extrema(12)[0][1].tolist():
+        expected = list()
+        for wave_option in generator.options_sorted:
+            waves = wa.find_corrective_wave(idx_start, wave_option.values)
+            if waves and WavePattern(waves).check_rule(correction):
+                expected.append((wave_option, waves))
+
+        corrections = wa.corrective_waves(idx_start, generator, [correction])
+        assert corrections == expected
+        assert wa.corrective_waves(idx_start, generator, [correction]) is corrections
+
+
+def test_next_cycle_combines_impulses_and_corrections():
+    wa = WaveAnalyzer(random_df(n=1000, seed=5))
+    wa.set_combinatorial_limits(6, 6)
+    impulse, correction = Impulse('impulse'), Correction('correction')
+
+    expected = list()
+    for _, waves_up in wa.find_impulsive_waves(WaveOptionsGenerator5(6), [impulse], unique=True):
+        wavepattern_up = WavePattern(waves_up)
+        for wave_option in WaveOptionsGenerator3(6).options_sorted:
+            waves = wa.find_corrective_wave(wavepattern_up.idx_end, wave_option.values)
+            if waves and WavePattern(waves).check_rule(correction) and \
+                    WaveCycle(wavepattern_up, WavePattern(waves)) not in expected:
+                expected.append(WaveCycle(wavepattern_up, WavePattern(waves)))
+
+    cycles = list(wa.next_cycle())
+    assert len(cycles) > 0 and cycles == expected
+    assert cycles[0].start_idx == cycles[0].waves[0].idx_start and cycles[0].end_idx == cycles[0].waves[-1].idx_end
+    assert list(wa.next_cycle(cycles[-1].start_idx)) == [cycle for cycle in cycles
+                                                        if cycle.start_idx == cycles[-1].start_idx]
+
+    # a start which is no local minimum gives the cycles of an analyzer with this start added
+    assert 217 not in wa.start_indices()
+    with_start = WaveAnalyzer(random_df(n=1000, seed=5))
+    with_start.set_combinatorial_limits(6, 6)
+    with_start.add_starts([217])
+    cycles_217 = list(wa.next_cycle(217))
+    assert len(cycles_217) > 0 and cycles_217 == [cycle for cycle in with_start.next_cycle() if cycle.start_idx == 217]
+
+    wave1, wave2 = wa.find_td_wave(cycles[0].start_idx)
+    assert isinstance(wave1, MonoWaveUp) and wave1.idx_start == cycles[0].start_idx and wave2.idx_start == wave1.idx_end
@@ -0,0 +1,52 @@
+from models.WaveAnalyzer import WaveAnalyzer
+from models.WaveBatch import WaveBatch
+from models.WaveOptions import WaveOptionsGeneratorWithRange
+from models.WavePattern import WavePattern
+from models.WaveRules import WaveRule, Impulse, LeadingDiagonal, Correction, TDWave
+from tests.test_wave_analyzer import random_df
+
+
+class Wave5NotLongest(WaveRule):
+    def set_conditions(self):
+        return {
+            "w5_1": {
+                "waves": ["wave3", "wave5"],
+                "function": lambda wave3, wave5: wave5 is None or not (wave5.length > wave3.length and True),
+                "message": "",
+            },
+        }
+
+
+def first_failure(waves: list, waverule: WaveRule) -> int:
+    wavepattern = WavePattern(waves)
+    for i, conditions in enumerate(waverule.conditions.values()):
+        if not conditions['function'](*[wavepattern.waves.get(wave) for wave in conditions['waves']]):
+            return i
+    return -1
+
+
+def test_batch_matches_check_rule():
+    wa = WaveAnalyzer(random_df(seed=1))
+    all_waves = [waves for _, waves in wa.find_impulsive_waves(WaveOptionsGeneratorWithRange(8, 2).options_sorted)]
+    batch = WaveBatch.from_waves(all_waves)
+    rules = [Impulse('impulse'), LeadingDiagonal('leading diagonal'), Correction('correction'), TDWave('td'),
+             Wave5NotLongest('wave5')]
+
+    assert any(waves[4] is None for waves in all_waves)
+
+    for rule in rules:
+        mask, failures = batch.check_rule(rule)
+        assert list(mask) == [WavePattern(waves).check_rule(rule) for waves in all_waves]
+        assert list(failures) == [first_failure(waves, rule) for waves in all_waves]
+
+
+def test_batch_of_corrections():
+    wa = WaveAnalyzer(random_df(seed=2))
+    all_waves = [wa.find_corrective_wave(idx_start, [i, j, 1]) for idx_start in range(0, 250, 5)
+                 for i in range(3) for j in range(3)]
+    all_waves = [waves for waves in all_waves if waves]
+    correction = Correction('correction')
+
+    mask, _ = WaveBatch.from_waves(all_waves).check_rules([correction])['correction']
+
+    assert list(mask) == [WavePattern(waves).check_rule(correction) for waves in all_waves]
@@ -0,0 +1,31 @@
+from models.WaveOptions import WaveOptions, WaveOptionsGenerator5, WaveOptionsGenerator3, \
+    WaveOptionsGeneratorWithRange
+import numpy as np
+import pytest
+
+
+def test_options_are_canonical_and_sorted():
+    generator = WaveOptionsGenerator5(4)
+    options = generator.options_sorted
+
+    assert len(options) == 1 + 3 + 3 ** 2 + 3 ** 3 + 3 ** 4 + 3 ** 5 == generator.number
+    assert len(set(options)) == len(options)
+    assert options == sorted(options)
+    assert all(wave_option.values[k:] == [0] * (5 - k)
+               for wave_option in options for k in range(5) if wave_option.values[k] == 0)
+
+
+def test_options_as_array():
+    generator = WaveOptionsGeneratorWithRange(6, 2)
+    array = generator.to_array()
+
+    assert array.dtype == np.int8 and array.shape == (generator.number, 5)
+    assert [WaveOptions(*[None if v < 0 else v for v in row]) for row in array.tolist()] == generator.options_sorted
+    assert WaveOptions(3, 2, 4, 3, None) in generator.options
+    assert WaveOptionsGenerator3(5).to_array().shape == (1 + 4 + 16 + 64, 3)
+
+
+def test_skips_have_to_fit_into_int8():
+    assert WaveOptionsGenerator3(128).to_array()[-1].tolist() == [127, 127, 127]
+    with pytest.raises(ValueError):
+        WaveOptionsGenerator3(129)